@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 from enum import Enum
 
 class ExtractionRequestModel(BaseModel):
@@ -8,6 +8,9 @@ class ExtractionRequestModel(BaseModel):
     schemas: List[Dict]
     source_type: str = "pdf"
     destination: str = None
+    execution_mode: str = "interactive"
+    document_hash: Optional[str] = None
+    batch_group: Optional[str] = None
 
 class SchemaResult(BaseModel):
     schema_id: str
@@ -19,6 +22,9 @@ class ExtractionResponseModel(BaseModel):
     pdf_key: str
     results: List[SchemaResult]
     source_type: str = "pdf"
+    execution_mode: str = "interactive"
+    document_hash: Optional[str] = None
+    batch_group: Optional[str] = None
 
 class JobStatus(str, Enum):
     PENDING = "PENDING"
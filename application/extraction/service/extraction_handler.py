@@ -1,23 +1,38 @@
 import asyncio
 import logging
+import os
 import time
 import gc
-from typing import List, Dict, NamedTuple, Optional
+import math
+from typing import List, Dict, NamedTuple, Optional, Tuple
 from io import BytesIO
 from redis.asyncio import Redis
-from common.redis.redis_config import get_redis_connection
-from common.text_extraction.text_extractor import extract_page_as_markdown, find_common_pages
+from common.redis.redis_config import get_redis_connection, get_sync_redis_connection
+from common.text_extraction.text_extractor import (
+    extract_page_as_markdown,
+    extract_pages_as_markdown,
+    find_common_pages,
+    stream_relevant_pages,
+    tag_relevant_pages,
+    tag_relevant_pages_batch
+)
+from common.text_extraction.token_counter import count_tokens, count_tokens_batch
 import base64
 from dotenv import load_dotenv
 from common.models.model_factory import ModelFactory
+from common.models.model_capabilities import get_model_capabilities
+from common.cache.example_cache import get_or_generate_example_format, get_prompt_version
+from common.metrics.pipeline_metrics import Stage, stage_timer
+from common.metrics.llm_usage import in_current_context
+from common.redis.job_timeline import current_timeline, now_ms, timeline_span
 from langsmith import Client as LangSmithClient
 from common.prompts.prompt_enums import PromptType
-import tiktoken
 from dataclasses import dataclass
-from celery import Celery
+from celery import Celery, group
+from PyPDF2 import PdfReader
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from application.extraction.service.processing_handler import (
-    get_latest_model_details,
+    get_model_details,
     preprocess_messages,
     process_web_content
 )
@@ -40,6 +55,12 @@ celery_app.conf.update(
 )
 
 MAX_WORKERS = 10
+VALIDATION_FAN_IN = int(os.getenv("VALIDATION_FAN_IN", "2"))
+PROMPT_OVERHEAD_TOKENS = 500
+DISTRIBUTED_EXTRACTION = os.getenv("DISTRIBUTED_EXTRACTION", "false").lower() == "true"
+DISTRIBUTED_POLL_INTERVAL = 0.5
+DISTRIBUTED_TIMEOUT = 3600
+MIN_BATCH_TOKENS = 1000
 thread_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
 process_pool = ProcessPoolExecutor(max_workers=MAX_WORKERS)
 
@@ -75,14 +96,111 @@ class ProcessingQueue:
 
 processing_queue = ProcessingQueue()
 
-async def get_model_client():
-    """Get model client for batch processing."""
+class StreamingSchemaExtractor:
+    """Packs a schema's relevant pages into token-bounded batches as they arrive.
+
+    Each full batch starts the extraction agent right away; ``finish`` flushes
+    the last batch and validates all batch results together.
+    """
+    def __init__(self, client, keywords: str, examples_task, schema_idx: int, job_id: str):
+        self.client = client
+        self.keywords = keywords
+        self.examples_task = examples_task
+        self.schema_idx = schema_idx
+        self.job_id = job_id
+        self.max_tokens: Optional[int] = None
+        self.current_batch = []
+        self.current_token_count = 0
+        self.batch_tasks = []
+
+    async def get_examples(self) -> str:
+        return (await self.examples_task)[self.schema_idx]
+
+    async def add_page(self, page_num: int, content: str) -> None:
+        if not content:
+            return
+
+        if self.max_tokens is None:
+            examples = await self.get_examples()
+            self.max_tokens = await calculate_optimal_batch_size(
+                self.client, estimate_tokens(examples, self.client) + estimate_tokens(self.keywords, self.client)
+            )
+            logger.info(f"Schema {self.schema_idx}: using dynamic token limit {self.max_tokens}")
+
+        token_count = estimate_tokens(content, self.client)
+        logger.info(f"Schema {self.schema_idx}, page {page_num}: {token_count} tokens")
+
+        if self.current_batch and self.current_token_count + token_count > self.max_tokens:
+            await self.flush()
+
+        self.current_batch.append((page_num, content))
+        self.current_token_count += token_count
+
+    async def flush(self) -> None:
+        if not self.current_batch:
+            return
+        batch_content = "\n=== PAGE BREAK ===\n".join([c for _, c in sorted(self.current_batch)])
+        pages = sorted(p for p, _ in self.current_batch)
+        logger.info(f"Schema {self.schema_idx}: starting batch {len(self.batch_tasks)} with pages {pages}")
+        self.batch_tasks.append(asyncio.create_task(
+            self.extract_batch(len(self.batch_tasks), pages, batch_content, await self.get_examples())
+        ))
+        self.current_batch = []
+        self.current_token_count = 0
+
+    async def extract_batch(self, batch_index: int, pages: List[int], batch_content: str, examples: str) -> str:
+        with timeline_span(Stage.AGENT_LOOP, batch_index, schema=self.schema_idx, pages=pages):
+            return await call_llm_with_file_content(batch_content, self.keywords, examples, self.client)
+
+    async def finish(self) -> str:
+        try:
+            await self.flush()
+            if not self.batch_tasks:
+                logger.warning(f"Schema {self.schema_idx}: no relevant pages found")
+                return ""
+
+            all_results = [result for result in await asyncio.gather(*self.batch_tasks) if result]
+            await track_progress(self.job_id, len(self.batch_tasks), len(self.batch_tasks), f"validating_results_{self.schema_idx}")
+            with timeline_span(Stage.VALIDATION, self.schema_idx, batches=len(self.batch_tasks)):
+                validation_result = await validate_metrics(
+                    "\n=== BATCH BREAK ===\n".join(all_results), await self.get_examples(), self.client
+                )
+            return validation_result if validation_result else ""
+        except Exception as e:
+            logger.error(f"Error extracting schema {self.schema_idx}: {e}")
+            return ""
+
+    async def cancel(self) -> None:
+        """Stop the batches already started, for when the pages stop arriving."""
+        await cancel_tasks(self.batch_tasks)
+
+async def cancel_tasks(tasks) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+async def get_model_client(task_id: str):
+    """Get the model client configured for a job."""
     redis = await get_redis_connection()
-    model_details = await get_latest_model_details(redis)
+    model_details = await get_model_details(redis, task_id)
     if not model_details:
-        raise Exception("Could not get model details")
+        raise Exception(f"Could not get model details for task {task_id}")
     
-    return ModelFactory.create_model(
+    return ModelFactory.get_model(
+        model_type=model_details.provider_type,
+        model_name=model_details.provider_model_name,
+        api_key=model_details.api_key,
+        additional_params=model_details.additional_params
+    )
+
+async def get_batch_client(task_id: str):
+    """Get the provider batch API client configured for a job, for batch execution mode."""
+    redis = await get_redis_connection()
+    model_details = await get_model_details(redis, task_id)
+    if not model_details:
+        raise Exception(f"Could not get model details for task {task_id}")
+
+    return ModelFactory.get_batch_client(
         model_type=model_details.provider_type,
         model_name=model_details.provider_model_name,
         api_key=model_details.api_key,
@@ -90,34 +208,47 @@ async def get_model_client():
     )
 
 @celery_app.task(name='process_pdf_chunk')
-def process_pdf_chunk(pdf_chunk: bytes, start_page: int, end_page: int, job_id: str):
-    """Celery task for processing a chunk of PDF pages."""
-    file_stream = BytesIO(pdf_chunk)
-    return asyncio.run(_process_pdf_chunk(file_stream, start_page, end_page, job_id))
+def process_pdf_chunk(pdf_key: str, pages: List[int], job_id: str):
+    """Celery task for processing the given pages of a document stored under pdf_key."""
+    try:
+        file_stream = load_file_stream(pdf_key)
+    except Exception as e:
+        logger.error(f"Error loading document {pdf_key} for chunk {pages}: {e}")
+        return {'success': False, 'error': str(e)}
+    return asyncio.run(_process_pdf_chunk(file_stream, pages, job_id))
 
 @celery_app.task(name='process_batch')
 def process_batch(batch_content: str, keywords: str, examples: str, job_id: str):
     """Celery task for processing a batch of content."""
     return asyncio.run(_process_batch(batch_content, keywords, examples, job_id))
 
-async def _process_pdf_chunk(file_stream: BytesIO, start_page: int, end_page: int, job_id: str) -> Dict:
+async def _process_pdf_chunk(file_stream: BytesIO, pages: List[int], job_id: str) -> Dict:
     """Process a chunk of PDF pages asynchronously."""
     try:
-        extracted_contents = []
-        for page in range(start_page, end_page + 1):
-            content = await process_page(file_stream, page)
+        reader = PdfReader(file_stream)
+        page_contents = []
+        for page in pages:
+            try:
+                content = extract_page_as_markdown(file_stream, page, reader)
+            except Exception as e:
+                logger.error(f"Error extracting page {page} as markdown: {e}")
+                continue
             if content:
-                token_count = estimate_tokens(content)
-                extracted_contents.append((page, content, token_count))
+                page_contents.append((page, content))
+        token_counts = estimate_tokens_batch([content for _, content in page_contents])
+        extracted_contents = [
+            (page, content, token_count)
+            for (page, content), token_count in zip(page_contents, token_counts)
+        ]
         return {'success': True, 'contents': extracted_contents}
     except Exception as e:
-        logger.error(f"Error processing PDF chunk {start_page}-{end_page}: {e}")
+        logger.error(f"Error processing PDF chunk {pages}: {e}")
         return {'success': False, 'error': str(e)}
 
 async def _process_batch(batch_content: str, keywords: str, examples: str, job_id: str) -> str:
     """Process a batch of content asynchronously."""
     try:
-        client = await get_model_client()  
+        client = await get_model_client(job_id)
         result = await call_llm_with_file_content(batch_content, keywords, examples, client)
         return result if result else ""
     except Exception as e:
@@ -125,7 +256,10 @@ async def _process_batch(batch_content: str, keywords: str, examples: str, job_i
         return ""
 
 async def run_extraction(pdf_key: str, schemas: List[Dict[str, str]], job_id: str = None) -> List[str]:
-    """Enhanced extraction with smart processing selection."""
+    """Extract every schema from a document in a single page-finding pass.
+
+    Returns one result per schema, in the same order as ``schemas``.
+    """
     if not job_id:
         job_id = f"job_{int(time.time())}"
     
@@ -135,64 +269,122 @@ async def run_extraction(pdf_key: str, schemas: List[Dict[str, str]], job_id: st
     redis = await get_redis_connection()
     try:
         file_stream = await get_file_stream(redis, pdf_key)
-        file_size = file_stream.getbuffer().nbytes
-        
-        client = await get_model_client()
-        examples = await get_examples(client, str(schemas))
-        formatted_keywords = "\n".join([f"{k}: {v}" for k, v in schemas[0].items()])
         
-        page_numbers = await get_relevant_page_numbers(client, file_stream, formatted_keywords)
-        total_relevant_pages = len(page_numbers.pages)
-        
-        DISTRIBUTED_THRESHOLD = 10  
-        
-        if total_relevant_pages <= DISTRIBUTED_THRESHOLD:
-            logger.info(f"Using direct processing for {total_relevant_pages} relevant pages")
-            metrics = await retrieve_multi_page_metrics(
-                page_numbers.pages, formatted_keywords, file_stream,
-                examples, client, job_id
-            )
-            await track_progress(job_id, len(schemas), len(schemas), "completed", "success")
-            return [metrics] if metrics else []
+        client = await get_model_client(job_id)
+        keyword_sets = [format_keywords(schema) for schema in schemas]
+        # Example formats only depend on the schema, so generate them while pages are being found.
+        examples_task = asyncio.gather(*[get_examples(client, keywords) for keywords in keyword_sets])
+
+        if DISTRIBUTED_EXTRACTION:
+            results = await run_two_phase_extraction(client, pdf_key, file_stream, keyword_sets, examples_task, job_id)
         else:
-            logger.info(f"Using distributed processing for {total_relevant_pages} relevant pages")
-            
-            chunk_size = max(1, total_relevant_pages // MAX_WORKERS)
-            chunks = [page_numbers.pages[i:i + chunk_size] for i in range(0, total_relevant_pages, chunk_size)]
-            
-            chunk_tasks = []
-            for chunk_pages in chunks:
-                task = process_pdf_chunk.delay(
-                    base64.b64encode(file_stream.getvalue()).decode(),
-                    min(chunk_pages),
-                    max(chunk_pages),
-                    job_id
-                )
-                chunk_tasks.append(task)
-            
-            results = []
-            for task in chunk_tasks:
-                result = task.get()
-                if result['success']:
-                    results.extend(result['contents'])
-            
-            if not results:
-                logger.error("No results from distributed processing")
-                return []
-            
-            combined_content = "\n=== BATCH BREAK ===\n".join([content for _, content, _ in sorted(results, key=lambda x: x[0])])
-            final_result = await validate_metrics(combined_content, examples, client)
-            
-            await track_progress(job_id, len(schemas), len(schemas), "completed", "success")
-            await cleanup_processed_files(redis, pdf_key)
-            
-            return [final_result] if final_result else []
+            results = await run_streaming_extraction(client, file_stream, keyword_sets, examples_task, job_id)
+
+        await track_progress(job_id, len(schemas), len(schemas), "completed", "success")
+        await cleanup_processed_files(redis, pdf_key)
+        return list(results)
             
     except Exception as e:
         logger.error(f"Error in extraction process: {e}")
         await track_progress(job_id, 0, len(schemas), "failed", "error")
         return []
 
+async def run_streaming_extraction(client, file_stream: BytesIO, keyword_sets: List[str], examples_task, job_id: str) -> List[str]:
+    """Start extraction batches while later pages are still being classified."""
+    extractors = [
+        StreamingSchemaExtractor(client, keywords, examples_task, schema_idx, job_id)
+        for schema_idx, keywords in enumerate(keyword_sets)
+    ]
+
+    classified = 0
+    try:
+        async for verdict in stream_relevant_pages(client, file_stream, keyword_sets):
+            classified += 1
+            await track_progress(job_id, classified, verdict.total_pages, "finding_relevant_pages")
+            for schema_idx in verdict.schema_indices:
+                await extractors[schema_idx].add_page(verdict.page_number, verdict.page_text)
+    except BaseException:
+        # Page finding failed or the job was cancelled: nothing will await the
+        # batches and examples started so far.
+        for extractor in extractors:
+            await extractor.cancel()
+        await cancel_tasks([examples_task])
+        raise
+
+    return list(await asyncio.gather(*[extractor.finish() for extractor in extractors]))
+
+async def run_two_phase_extraction(client, pdf_key: str, file_stream: BytesIO, keyword_sets: List[str], examples_task, job_id: str) -> List[str]:
+    """Find all relevant pages first, then extract each schema, using Celery for large page sets."""
+    loop = asyncio.get_running_loop()
+    page_texts = await loop.run_in_executor(thread_pool, in_current_context(extract_pages_as_markdown, file_stream, client))
+    await track_progress(job_id, 0, len(keyword_sets), "finding_relevant_pages")
+    page_tags = await tag_relevant_pages(client, page_texts, keyword_sets)
+    examples = await examples_task
+
+    return list(await asyncio.gather(*[
+        process_schema(
+            client, pdf_key, file_stream, page_texts,
+            [page for page in sorted(page_tags) if schema_idx in page_tags[page]],
+            keyword_sets[schema_idx], examples[schema_idx], job_id
+        )
+        for schema_idx in range(len(keyword_sets))
+    ]))
+
+async def run_batch_extraction(documents: List[Tuple[str, List[Dict[str, str]]]], job_id: str) -> List[List[str]]:
+    """Extract the documents of one batch group, sending page finding through the provider's batch API.
+
+    A batch group is a job, or every job of a bulk submission, so a nightly
+    backfill submitted in bulk is extracted together. ``documents`` holds each
+    document's blob key and schemas; ``job_id`` is the job whose model
+    configuration and progress the group uses. Page relevance checks for
+    every document go into a single batch; the multi-step extraction agent
+    then runs as usual on the tagged pages. Returns one list of per-schema
+    results per document, in input order.
+    """
+    logger.info(f"Starting batch extraction of {len(documents)} documents, job_id: {job_id}")
+    redis = await get_redis_connection()
+    client = await get_model_client(job_id)
+    batch_client = await get_batch_client(job_id)
+    loop = asyncio.get_running_loop()
+
+    file_streams = [await get_file_stream(redis, pdf_key) for pdf_key, _ in documents]
+    keyword_sets = [[format_keywords(schema) for schema in schemas] for _, schemas in documents]
+    examples_task = asyncio.gather(*[
+        asyncio.gather(*[get_examples(client, keywords) for keywords in document_keywords])
+        for document_keywords in keyword_sets
+    ])
+
+    await track_progress(job_id, 0, len(documents), "extracting_pages")
+    page_texts = await asyncio.gather(*[
+        loop.run_in_executor(thread_pool, in_current_context(extract_pages_as_markdown, file_stream, client))
+        for file_stream in file_streams
+    ])
+
+    await track_progress(job_id, 0, len(documents), "finding_relevant_pages")
+    page_tags = await tag_relevant_pages_batch(client, batch_client, list(zip(page_texts, keyword_sets)))
+    examples = await examples_task
+
+    async def extract_document(index: int) -> List[str]:
+        pdf_key = documents[index][0]
+        tags = page_tags[index]
+        results = await asyncio.gather(*[
+            process_schema(
+                client, pdf_key, file_streams[index], page_texts[index],
+                [page for page in sorted(tags) if schema_idx in tags[page]],
+                keyword_sets[index][schema_idx], examples[index][schema_idx], job_id
+            )
+            for schema_idx in range(len(keyword_sets[index]))
+        ])
+        await cleanup_processed_files(redis, pdf_key)
+        return list(results)
+
+    results = await asyncio.gather(*[extract_document(index) for index in range(len(documents))])
+    await track_progress(job_id, len(documents), len(documents), "completed", "success")
+    return list(results)
+
+def format_keywords(schema: Dict[str, str]) -> str:
+    return "\n".join([f"{k}: {v}" for k, v in schema.items()])
+
 async def process_small_pdf(file_stream: BytesIO, schemas: List[Dict[str, str]], examples: str, client, job_id: str) -> List[str]:
     """Direct processing for small PDFs."""
     try:
@@ -212,6 +404,12 @@ async def process_small_pdf(file_stream: BytesIO, schemas: List[Dict[str, str]],
         return []
 
 async def track_progress(job_id: str, current: int, total: int, stage: str, status: str = "running"):
+    """Record a job's progress and write its buffered timeline events to Redis.
+
+    Stage changes are also added to the job's timeline as zero-length
+    ``progress`` events.
+    """
+    previous = processing_queue.progress.get(job_id)
     processing_queue.progress[job_id] = ProcessingProgress(
         current=current,
         total=total,
@@ -220,6 +418,14 @@ async def track_progress(job_id: str, current: int, total: int, stage: str, stat
         status=status
     )
 
+    timeline = current_timeline()
+    if timeline is None:
+        return
+    if previous is None or previous.stage != stage:
+        timestamp = now_ms()
+        timeline.add_event("progress", timestamp, timestamp, status=status, step=stage, current=current, total=total)
+    await timeline.flush(await get_redis_connection())
+
 async def cleanup_processed_files(redis: Redis, pdf_key: str):
     """Cleanup temporary files and memory after processing."""
     try: 
@@ -228,38 +434,92 @@ async def cleanup_processed_files(redis: Redis, pdf_key: str):
     except Exception as e:
         logger.error(f"Error during cleanup: {e}")
 
-def estimate_tokens(text: str) -> int:
-    """More accurate token estimation using tiktoken."""
+def estimate_tokens(text: str, client=None) -> int:
+    """Token estimation using the cached encoder for the client's provider/model."""
+    return count_tokens(text, getattr(client, "model_type", None), getattr(client, "model_name", None))
+
+def estimate_tokens_batch(texts: List[str], client=None) -> List[int]:
+    return count_tokens_batch(texts, getattr(client, "model_type", None), getattr(client, "model_name", None))
+
+async def calculate_optimal_batch_size(client, reserved_tokens: int = 0, output_bound: bool = False) -> int:
+    """Calculate the per-request token budget from the client's model capabilities.
+
+    ``reserved_tokens`` covers prompt text sent alongside the content. When
+    ``output_bound`` is set the budget is also capped by the model's max output,
+    for calls whose response is about as long as their input.
+    """
+    capabilities = get_model_capabilities(getattr(client, "model_type", None), getattr(client, "model_name", None))
+    budget = capabilities.input_token_budget - reserved_tokens - PROMPT_OVERHEAD_TOKENS
+    if output_bound:
+        budget = min(budget, capabilities.max_output_tokens)
+    return max(MIN_BATCH_TOKENS, budget)
+
+async def process_schema(
+    client, pdf_key: str, file_stream: BytesIO, page_texts: List[str], pages: List[int],
+    formatted_keywords: str, examples: str, job_id: str
+) -> str:
+    """Extract one schema from its relevant pages, choosing direct or distributed processing."""
     try:
-        encoding = tiktoken.get_encoding("cl100k_base")
-        return len(encoding.encode(text))
-    except Exception:
-        return len(text) // 4
-
-async def calculate_optimal_batch_size(content_length: int, max_tokens: int = 3000) -> int:
-    """Calculate optimal batch size based on content length."""
-    return min(max_tokens, max(1000, content_length // 2))
+        total_relevant_pages = len(pages)
+        
+        DISTRIBUTED_THRESHOLD = 10  
+        
+        if total_relevant_pages <= DISTRIBUTED_THRESHOLD:
+            logger.info(f"Using direct processing for {total_relevant_pages} relevant pages")
+            metrics = await retrieve_multi_page_metrics(
+                pages, formatted_keywords, file_stream,
+                examples, client, job_id, page_texts
+            )
+            return metrics if metrics else ""
 
-async def process_schema(client, file_stream: BytesIO, schema: Dict[str, str], job_id: str, schema_idx: int, total_schemas: int) -> str:
-    """Enhanced schema processing with progress tracking."""
-    try:
-        await track_progress(job_id, schema_idx, total_schemas, f"processing_schema_{schema_idx}")
-        formatted_keywords = "\n".join([f"{k}: {v}" for k, v in schema.items()])
+        logger.info(f"Using distributed processing for {total_relevant_pages} relevant pages")
         
-        page_numbers = await get_relevant_page_numbers(client, file_stream, formatted_keywords)
-        examples = await get_examples(client, formatted_keywords)
+        results = await run_distributed_page_extraction(pdf_key, pages, job_id)
+        if not results:
+            logger.error("No results from distributed processing")
+            return ""
         
-        await track_progress(job_id, schema_idx + 0.5, total_schemas, f"extracting_metrics_{schema_idx}")
-        metrics = await retrieve_multi_page_metrics(
-            page_numbers.pages, formatted_keywords, file_stream, 
-            examples if examples else "", client, job_id
-        )
+        combined_content = "\n=== BATCH BREAK ===\n".join([content for _, content, _ in sorted(results, key=lambda x: x[0])])
+        final_result = await validate_metrics(combined_content, examples, client)
         
-        return metrics if metrics else ""
+        return final_result if final_result else ""
     except Exception as e:
-        logger.error(f"Error processing schema {schema_idx}: {e}")
+        logger.error(f"Error processing schema: {e}")
         return ""
 
+async def run_distributed_page_extraction(pdf_key: str, pages: List[int], job_id: str) -> List:
+    """Fan the relevant pages out to Celery workers and collect them without blocking the loop.
+
+    Tasks only carry the document's blob key and their exact page list; each
+    worker loads the document itself.
+    """
+    chunk_size = max(1, math.ceil(len(pages) / MAX_WORKERS))
+    chunks = [pages[i:i + chunk_size] for i in range(0, len(pages), chunk_size)]
+
+    group_result = group(process_pdf_chunk.s(pdf_key, chunk_pages, job_id) for chunk_pages in chunks).apply_async()
+
+    deadline = time.monotonic() + DISTRIBUTED_TIMEOUT
+    while not group_result.ready():
+        if time.monotonic() > deadline:
+            group_result.revoke()
+            raise TimeoutError(f"Distributed extraction for {pdf_key} timed out after {DISTRIBUTED_TIMEOUT}s")
+        await asyncio.sleep(DISTRIBUTED_POLL_INTERVAL)
+
+    results = []
+    for result in group_result.get(propagate=False):
+        if isinstance(result, dict) and result.get('success'):
+            results.extend(result['contents'])
+        else:
+            logger.error(f"Distributed chunk failed: {result}")
+    return results
+
+def load_file_stream(pdf_key: str) -> BytesIO:
+    """Blocking variant of get_file_stream for Celery tasks."""
+    base64_string = get_sync_redis_connection().get(pdf_key)
+    if base64_string is None:
+        raise KeyError(f"No document stored under {pdf_key}")
+    return BytesIO(base64.b64decode(base64_string))
+
 async def get_file_stream(redis: Redis, pdf_key: str) -> BytesIO:
     try:
         base64_string: str = await redis.get(pdf_key)
@@ -270,12 +530,18 @@ async def get_file_stream(redis: Redis, pdf_key: str) -> BytesIO:
         raise e
 
 async def get_examples(client, formatted_keywords: str) -> str:
-    try:
-        prompt = langsmith_client.pull_prompt(PromptType.EXAMPLE_GENERATION.value)
+    async def generate() -> str:
         messages = prompt.invoke({"first_value": formatted_keywords})
         processed_messages = preprocess_messages(messages)
-        if processed_messages:
-            return client.do_completion(processed_messages)
+        if not processed_messages:
+            return ""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(thread_pool, in_current_context(client.do_completion, processed_messages))
+
+    try:
+        prompt = langsmith_client.pull_prompt(PromptType.EXAMPLE_GENERATION.value)
+        redis = await get_redis_connection()
+        return await get_or_generate_example_format(redis, formatted_keywords, get_prompt_version(prompt), generate)
     except Exception as e:
         logger.error(f"Error generating examples: {e}")
     return ""
@@ -289,22 +555,29 @@ async def get_relevant_page_numbers(client, file_stream: BytesIO, formatted_keyw
         raise Exception("Cannot process: No common pages found or unreadable file.")
 
 async def retrieve_multi_page_metrics(
-    pages: List[int], keywords: str, file_stream: BytesIO, examples: str, client, job_id: str
+    pages: List[int], keywords: str, file_stream: BytesIO, examples: str, client, job_id: str,
+    page_texts: Optional[List[str]] = None
 ) -> str:
     try:
-        MAX_TOKENS = await calculate_optimal_batch_size(3000)
+        MAX_TOKENS = await calculate_optimal_batch_size(
+            client, estimate_tokens(examples, client) + estimate_tokens(keywords, client)
+        )
         logger.info(f"Using dynamic token limit: {MAX_TOKENS}")
         
-        extracted_contents = []
+        page_contents = []
         total_pages = len(pages)
         
         for idx, page in enumerate(pages):
             await track_progress(job_id, idx, total_pages, f"extracting_page_{page}")
-            content = await process_page(file_stream, page)
+            content = page_texts[page] if page_texts is not None else await process_page(file_stream, page)
             if content:
-                token_count = estimate_tokens(content)
-                extracted_contents.append((page, content, token_count))
-                logger.info(f"Page {page}: {token_count} tokens")
+                page_contents.append((page, content))
+
+        token_counts = estimate_tokens_batch([content for _, content in page_contents], client)
+        extracted_contents = []
+        for (page, content), token_count in zip(page_contents, token_counts):
+            extracted_contents.append((page, content, token_count))
+            logger.info(f"Page {page}: {token_count} tokens")
 
         if not extracted_contents:
             logger.error("No content extracted from pages")
@@ -313,12 +586,15 @@ async def retrieve_multi_page_metrics(
         all_results = []
         current_batch = []
         current_token_count = 0
+        batch_index = 0
         
         for page_num, content, token_count in extracted_contents:
             if current_token_count + token_count > MAX_TOKENS:
                 if current_batch:
                     batch_content = "\n=== PAGE BREAK ===\n".join([c for _, c, _ in current_batch])
-                    batch_result = await call_llm_with_file_content(batch_content, keywords, examples, client)
+                    with timeline_span(Stage.AGENT_LOOP, batch_index, pages=[p for p, _, _ in current_batch]):
+                        batch_result = await call_llm_with_file_content(batch_content, keywords, examples, client)
+                    batch_index += 1
                     if batch_result:
                         all_results.append(batch_result)
                     
@@ -333,7 +609,8 @@ async def retrieve_multi_page_metrics(
 
         if current_batch:
             batch_content = "\n=== PAGE BREAK ===\n".join([c for _, c, _ in current_batch])
-            batch_result = await call_llm_with_file_content(batch_content, keywords, examples, client)
+            with timeline_span(Stage.AGENT_LOOP, batch_index, pages=[p for p, _, _ in current_batch]):
+                batch_result = await call_llm_with_file_content(batch_content, keywords, examples, client)
             if batch_result:
                 all_results.append(batch_result)
             
@@ -343,7 +620,8 @@ async def retrieve_multi_page_metrics(
         combined_results = "\n=== BATCH BREAK ===\n".join(all_results)
         await track_progress(job_id, total_pages, total_pages, "validating_results")
         
-        validation_result = await validate_metrics(combined_results, examples, client)
+        with timeline_span(Stage.VALIDATION, batches=batch_index + 1):
+            validation_result = await validate_metrics(combined_results, examples, client)
         
         del all_results
         del combined_results
@@ -377,7 +655,8 @@ async def call_llm_with_file_content(formatted_content: str, keywords: str, exam
 
             Note: The source document may contain multiple pages separated by '=== PAGE BREAK ==='.
             Extract all relevant metrics from each page section while maintaining accuracy."""
-        return process_extraction(text, client, AgentMode.EXTRACTION)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(thread_pool, in_current_context(process_extraction, text, client, AgentMode.EXTRACTION))
     except Exception as e:
         logger.error(f"Error calling LLM with file content: {e}")
     return ""
@@ -385,94 +664,109 @@ async def call_llm_with_file_content(formatted_content: str, keywords: str, exam
 async def validate_metrics(
     llm_results: str,
     examples: str,
-    client
+    client,
+    fan_in: int = VALIDATION_FAN_IN
 ) -> str:
+    """Validate batch results as a parallel tree reduction.
+
+    Leaf chunks are validated concurrently, then merged ``fan_in`` at a time,
+    level by level, until a single consolidated result remains.
+    """
+    with stage_timer(Stage.VALIDATION, client):
+        try:
+            batched_results = [batch.strip() for batch in llm_results.split("=== BATCH BREAK ===") if batch.strip()]
+            if not batched_results:
+                return ""
+
+            MAX_VALIDATION_TOKENS = await calculate_optimal_batch_size(
+                client, estimate_tokens(examples, client), output_bound=True
+            )
+            prompt = langsmith_client.pull_prompt(PromptType.VALIDATION.value)
+
+            leaf_chunks = [
+                "\n".join(group)
+                for group in pack_validation_groups(
+                    batched_results, estimate_tokens_batch(batched_results, client), MAX_VALIDATION_TOKENS
+                )
+            ]
+            validated = await validate_chunks(leaf_chunks, examples, client, prompt)
+            # A leaf that fails validation is carried up as extracted rather than lost.
+            level = [result or chunk for chunk, result in zip(leaf_chunks, validated)]
+            logger.info(f"Validated {sum(map(bool, validated))} of {len(leaf_chunks)} leaf chunks")
+
+            fan_in = max(2, fan_in)
+            depth = 0
+            while len(level) > 1:
+                depth += 1
+                # Results can be longer than their inputs, so groups are re-packed to the budget at every level.
+                groups = pack_validation_groups(level, estimate_tokens_batch(level, client), MAX_VALIDATION_TOKENS, fan_in)
+                merge_groups = [group for group in groups if len(group) > 1]
+                merged_results = iter(await validate_chunks(
+                    ["\n".join(group) for group in merge_groups], examples, client, prompt
+                ))
+                merged = []
+                for group in groups:
+                    # Singletons have nothing to merge with, and failed merges keep their inputs unmerged.
+                    result = next(merged_results) if len(group) > 1 else None
+                    if result:
+                        merged.append(result)
+                    else:
+                        merged.extend(group)
+                logger.info(f"Consolidation level {depth}: {len(level)} -> {len(merged)} chunks")
+                if len(merged) == len(level):
+                    logger.warning("Consolidation made no progress, returning the remaining chunks unmerged")
+                    break
+                level = merged
+
+            return "\n".join(level)
+
+        except Exception as e:
+            logger.error(f"Error validating metrics: {e}")
+            return ""
+
+def pack_validation_groups(
+    chunks: List[str], token_counts: List[int], max_tokens: int, max_size: Optional[int] = None
+) -> List[List[str]]:
+    """Pack consecutive chunks into groups of at most ``max_tokens`` and ``max_size`` chunks.
+
+    A chunk over the budget on its own gets a group of its own.
+    """
+    groups = []
+    current_group = []
+    current_token_count = 0
+    for chunk, token_count in zip(chunks, token_counts):
+        if current_group and (
+            current_token_count + token_count > max_tokens
+            or (max_size and len(current_group) >= max_size)
+        ):
+            groups.append(current_group)
+            current_group = []
+            current_token_count = 0
+        current_group.append(chunk)
+        current_token_count += token_count
+    if current_group:
+        groups.append(current_group)
+    return groups
+
+async def validate_chunks(chunks: List[str], examples: str, client, prompt) -> List[Optional[str]]:
+    """Validate chunks concurrently; a chunk whose validation failed has None in its place."""
+    results = await asyncio.gather(*[validate_chunk(chunk, examples, client, prompt) for chunk in chunks])
+    return [result or None for result in results]
+
+async def validate_chunk(chunk_text: str, examples: str, client, prompt) -> Optional[str]:
     try:
-        batched_results = llm_results.split("=== BATCH BREAK ===")
-        MAX_VALIDATION_TOKENS = await calculate_optimal_batch_size(3000)
-        
-        validated_chunks = []
-        current_chunk = []
-        current_token_count = 0
-        
-        for batch in batched_results:
-            if not batch.strip():
-                continue
-                
-            batch_token_count = estimate_tokens(batch.strip())
-            
-            if current_token_count + batch_token_count > MAX_VALIDATION_TOKENS:
-                if current_chunk:
-                    try:
-                        chunk_text = "\n".join(current_chunk)
-                        prompt = langsmith_client.pull_prompt(PromptType.VALIDATION.value)
-                        messages = prompt.invoke({
-                            "first_value": chunk_text,
-                            "second_value": examples
-                        })
-                        processed_messages = preprocess_messages(messages)
-                        if processed_messages:
-                            chunk_validation = client.do_completion(processed_messages)
-                            validated_chunks.append(chunk_validation)
-                        
-                        del chunk_text
-                        del messages
-                        gc.collect()
-                    except Exception as e:
-                        logger.error(f"Error validating chunk: {e}")
-                
-                current_chunk = [batch.strip()]
-                current_token_count = batch_token_count
-            else:
-                current_chunk.append(batch.strip())
-                current_token_count += batch_token_count
-        
-        if current_chunk:
-            try:
-                chunk_text = "\n".join(current_chunk)
-                prompt = langsmith_client.pull_prompt(PromptType.VALIDATION.value)
-                messages = prompt.invoke({
-                    "first_value": chunk_text,
-                    "second_value": examples
-                })
-                processed_messages = preprocess_messages(messages)
-                if processed_messages:
-                    chunk_validation = client.do_completion(processed_messages)
-                    validated_chunks.append(chunk_validation)
-                
-                del chunk_text
-                del messages
-                gc.collect()
-            except Exception as e:
-                logger.error(f"Error validating final chunk: {e}")
-        
-        if len(validated_chunks) > 1:
-            try:
-                final_consolidation = "\n".join(validated_chunks)
-                if estimate_tokens(final_consolidation) > MAX_VALIDATION_TOKENS:
-                    logger.warning("Final consolidation exceeds token limit, will process in chunks")
-                    return await validate_metrics(final_consolidation, examples, client)
-                
-                prompt = langsmith_client.pull_prompt(PromptType.VALIDATION.value)
-                messages = prompt.invoke({
-                    "first_value": final_consolidation,
-                    "second_value": examples
-                })
-                processed_messages = preprocess_messages(messages)
-                if processed_messages:
-                    final_result = client.do_completion(processed_messages)
-                    return final_result
-            except Exception as e:
-                logger.error(f"Error in final consolidation: {e}")
-                return validated_chunks[0] if validated_chunks else ""
-        elif validated_chunks:
-            return validated_chunks[0]
-        
-        return ""
-        
+        messages = prompt.invoke({
+            "first_value": chunk_text,
+            "second_value": examples
+        })
+        processed_messages = preprocess_messages(messages)
+        if not processed_messages:
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(thread_pool, in_current_context(client.do_completion, processed_messages))
     except Exception as e:
-        logger.error(f"Error validating metrics: {e}")
-        return ""
+        logger.error(f"Error validating chunk: {e}")
+        return None
 
 async def run_web_extraction(url: str, schemas: List[Dict[str, str]], job_id: str = None) -> List[str]:
     """Handle extraction from web content using processing_handler."""
@@ -484,7 +778,7 @@ async def run_web_extraction(url: str, schemas: List[Dict[str, str]], job_id: st
     
     try:
         redis = await get_redis_connection()
-        results = await process_web_content(redis, url, schemas)
+        results = await process_web_content(redis, url, schemas, job_id)
         
         await track_progress(job_id, len(schemas), len(schemas), "completed", "success")
         return results
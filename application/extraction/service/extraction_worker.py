@@ -2,7 +2,7 @@ import os
 import asyncio
 import json
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from redis.asyncio import Redis
 from redis.exceptions import RedisError
 from datetime import datetime
@@ -11,8 +11,14 @@ from application.extraction.models.models import ( ExtractionRequestModel,
     SchemaResult,
     JobStatus
 )
-from application.extraction.service.extraction_handler import run_extraction, run_web_extraction
+from application.extraction.service.extraction_handler import run_extraction, run_web_extraction, run_batch_extraction
+from application.extraction.service.processing_handler import get_model_details
 from common.redis.redis_config import get_redis_connection
+from common.redis.batch_collector import BatchCollector
+from common.metrics.pipeline_metrics import record_stream_lag
+from common.redis.job_timeline import JobTimeline, now_ms, record_span, use_timeline, workload_index
+from common.redis.document_store import get_blob_key
+from common.cache.extraction_cache import cache_extractions
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,17 +27,19 @@ async def run_extractions() -> None:
     logger.info("Starting extraction worker")
     redis = await get_redis_connection()
     last_id = "0-0"
+    batch_collector = BatchCollector("extraction")
+    batch_tasks = set()
 
     while True:
         try:
             result = await redis.xread(
                 streams={"extraction-stream": last_id},
                 count=1,
-                block=0
+                block=batch_collector.block_ms
             )
             logger.info(f"Result: {result}")
 
-            for stream_name, messages in result:
+            for stream_name, messages in result or []:
                 for message_id, message in messages:
                     logger.info(f"Received message from stream {stream_name}: ID {message_id}")
                     payload = message.get(b"payload")
@@ -39,6 +47,13 @@ async def run_extractions() -> None:
                         try:
                             logger.info(f"Payload value: {payload}")
                             extraction_request = ExtractionRequestModel(**json.loads(payload.decode('utf-8')))
+                            await record_message_lag(redis, stream_name, message_id, extraction_request.task_id)
+                            if extraction_request.execution_mode == "batch" and extraction_request.source_type != "web":
+                                await batch_collector.add(
+                                    redis, extraction_request.batch_group or extraction_request.task_id, payload.decode('utf-8')
+                                )
+                                last_id = message_id
+                                continue
                             extraction_result = await process_extraction(extraction_request)
                             serialized_result = json.dumps(extraction_result.model_dump())
                             logger.info(f"Pushing result to transformation-stream: {serialized_result}")
@@ -52,33 +67,76 @@ async def run_extractions() -> None:
                         logger.error("Message does not contain 'payload' field")
                     last_id = message_id
 
+            for batch_group, payloads in await batch_collector.pop_ready(redis):
+                logger.info(f"Collected {len(payloads)} batch workloads for batch group {batch_group}")
+                requests = [ExtractionRequestModel(**json.loads(payload)) for payload in payloads]
+                task = asyncio.create_task(process_batch_extractions(requests))
+                batch_tasks.add(task)
+                task.add_done_callback(batch_tasks.discard)
+
         except RedisError as e:
             logger.error(f"Error reading from Redis stream: {e}")
             await asyncio.sleep(1)
 
+async def record_message_lag(redis: Redis, stream_name: bytes, message_id: bytes, task_id: str) -> None:
+    model_details = await get_model_details(redis, task_id)
+    record_stream_lag(
+        stream_name, message_id,
+        model_details.provider_type if model_details else None,
+        model_details.provider_model_name if model_details else None
+    )
+
+def get_document_key(extraction_request: ExtractionRequestModel) -> str:
+    """Key holding the document's content: its shared blob, or pdf_key for requests without a hash."""
+    return get_blob_key(extraction_request.document_hash) if extraction_request.document_hash else extraction_request.pdf_key
+
+async def cache_extraction_results(redis: Redis, extraction_request: ExtractionRequestModel, results: List[str]) -> None:
+    """Keep a document's extraction output so jobs with the same document, schema and model can skip extraction."""
+    if not extraction_request.document_hash:
+        return
+    model_details = await get_model_details(redis, extraction_request.task_id)
+    if model_details:
+        await cache_extractions(
+            redis, extraction_request.document_hash, extraction_request.schemas, results,
+            model_details.provider_type, model_details.provider_model_name
+        )
+
+def build_extraction_response(extraction_request: ExtractionRequestModel, results: List[str]) -> ExtractionResponseModel:
+    schema_results = [
+        SchemaResult(
+            schema_id=f"schema_{index}",
+            metrics={f"schema_{index}": result},
+            schema_data=schema
+        )
+        for index, (schema, result) in enumerate(zip(extraction_request.schemas, results))
+    ]
+
+    return ExtractionResponseModel(
+        task_id=extraction_request.task_id,
+        pdf_key=extraction_request.pdf_key,
+        results=schema_results,
+        source_type=extraction_request.source_type,
+        execution_mode=extraction_request.execution_mode,
+        document_hash=extraction_request.document_hash,
+        batch_group=extraction_request.batch_group
+    )
+
 async def process_extraction(extraction_request: ExtractionRequestModel) -> ExtractionResponseModel:
+    timeline = JobTimeline(extraction_request.task_id, "extraction")
     try:
-        if extraction_request.source_type == "web":
-            results = await run_web_extraction(extraction_request.pdf_key, extraction_request.schemas)
-        else:
-            results = await run_extraction(extraction_request.pdf_key, extraction_request.schemas)
-        schema_results = [
-            SchemaResult(
-                schema_id=f"schema_{index}",
-                metrics={f"schema_{index}": result},
-                schema_data=schema
-            )
-            for index, (schema, result) in enumerate(zip(extraction_request.schemas, results))
-        ]
-
-        response = ExtractionResponseModel(
-            task_id=extraction_request.task_id,
-            pdf_key=extraction_request.pdf_key,
-            results=schema_results,
-            source_type=extraction_request.source_type
-        )
+        with use_timeline(timeline), timeline.span(
+            "extraction_workload", workload_index(extraction_request.pdf_key),
+            document=extraction_request.pdf_key, source_type=extraction_request.source_type
+        ):
+            if extraction_request.source_type == "web":
+                results = await run_web_extraction(extraction_request.pdf_key, extraction_request.schemas, extraction_request.task_id)
+            else:
+                results = await run_extraction(get_document_key(extraction_request), extraction_request.schemas, extraction_request.task_id)
+        response = build_extraction_response(extraction_request, results)
 
         redis = await get_redis_connection()
+        await timeline.flush(redis)
+        await cache_extraction_results(redis, extraction_request, results)
         await update_job_status(redis, extraction_request.task_id, JobStatus.PENDING, None)
 
         return response
@@ -86,18 +144,52 @@ async def process_extraction(extraction_request: ExtractionRequestModel) -> Extr
     except Exception as e:
         logger.error(f"Error processing extraction task: {e}")
         redis = await get_redis_connection()
+        await timeline.flush(redis)
         # Log the type of the key causing the error
-        key_type = await redis.type(extraction_request.pdf_key)
-        logger.error(f"Key type for {extraction_request.pdf_key}: {key_type}")
+        document_key = get_document_key(extraction_request)
+        key_type = await redis.type(document_key)
+        logger.error(f"Key type for {document_key}: {key_type}")
 
         # Handle unexpected key types
         if key_type != b'string':
-            logger.error(f"Unexpected key type for {extraction_request.pdf_key}. Deleting the key.")
-            await redis.delete(extraction_request.pdf_key)
+            logger.error(f"Unexpected key type for {document_key}. Deleting the key.")
+            await redis.delete(document_key)
 
         await update_job_status(redis, extraction_request.task_id, JobStatus.FAILED, str(e))
         raise e
 
+async def process_batch_extractions(extraction_requests: List[ExtractionRequestModel]) -> None:
+    """Extract a batch group's collected workloads together and queue each result for transformation.
+
+    The group may span several jobs; the first one's timeline records the
+    batch in detail and the others get the batch's span.
+    """
+    redis = await get_redis_connection()
+    task_ids = list(dict.fromkeys(request.task_id for request in extraction_requests))
+    timeline = JobTimeline(task_ids[0], "extraction")
+    start_ms = now_ms()
+    try:
+        with use_timeline(timeline), timeline.span("batch_extraction", workloads=len(extraction_requests), jobs=len(task_ids)):
+            results = await run_batch_extraction(
+                [(get_document_key(request), request.schemas) for request in extraction_requests],
+                task_ids[0]
+            )
+        await record_span(redis, task_ids[1:], "extraction", "batch_extraction", start_ms, lead_task_id=task_ids[0])
+        await timeline.flush(redis)
+        for extraction_request, document_results in zip(extraction_requests, results):
+            await cache_extraction_results(redis, extraction_request, document_results)
+            serialized_result = json.dumps(build_extraction_response(extraction_request, document_results).model_dump())
+            await redis.xadd("transformation-stream", {"payload": serialized_result})
+        logger.info(f"Pushed {len(results)} batch results to transformation-stream for {len(task_ids)} tasks")
+        for task_id in task_ids:
+            await update_job_status(redis, task_id, JobStatus.PENDING, None)
+    except Exception as e:
+        logger.error(f"Error processing batch extraction for tasks {task_ids}: {e}")
+        await record_span(redis, task_ids[1:], "extraction", "batch_extraction", start_ms, "failed", lead_task_id=task_ids[0])
+        await timeline.flush(redis)
+        for task_id in task_ids:
+            await update_job_status(redis, task_id, JobStatus.FAILED, str(e))
+
 async def update_job_status(
     redis: Redis,
     task_id: str,
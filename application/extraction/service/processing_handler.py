@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from typing import List, Dict, Optional
 from redis.asyncio import Redis
@@ -11,6 +12,12 @@ from langchain_core.messages import SystemMessage, HumanMessage
 import json
 from common.agents.prs_agent import process_extraction
 from common.agents.agent_prompt_enums import AgentMode
+from common.cache.example_cache import get_or_generate_example_format, get_prompt_version
+from common.redis.redis_config import get_redis_connection
+from common.redis.model_details import load_model_details
+from common.redis.job_timeline import timeline_span
+from common.metrics.pipeline_metrics import Stage
+from common.metrics.llm_usage import in_current_context
 
 logger = logging.getLogger(__name__)
 langsmith_client = LangSmithClient()
@@ -58,21 +65,20 @@ def web_preprocessing(html_content: str) -> str:
     logger.info(f"Length of text: {len(text)}")
     return text
 
-async def get_latest_model_details(redis: Redis) -> Optional[ModelDetails]:
+async def get_model_details(redis: Redis, task_id: str) -> Optional[ModelDetails]:
     try:
-        model_details_json = await redis.get("model-details")
-        if not model_details_json:
-            logger.error("No data found for model-details")
+        model_details = await load_model_details(redis, task_id)
+        if not model_details:
+            logger.error(f"No model details found for task {task_id}")
             return None
 
-        model_details = ModelDetails(**json.loads(model_details_json))
-        return model_details
+        return ModelDetails(**model_details)
 
     except Exception as e:
         logger.error(f"Failed to get or parse model details: {e}")
         return None
 
-async def process_web_content(redis: Redis, pdf_key: str, schemas: List[Dict[str, str]]) -> List[str]:
+async def process_web_content(redis: Redis, pdf_key: str, schemas: List[Dict[str, str]], task_id: str) -> List[str]:
     logger.info(f"Starting web extraction process for pdf_key: {pdf_key}")
     
     # Retrieve the HTML content from Redis
@@ -85,14 +91,14 @@ async def process_web_content(redis: Redis, pdf_key: str, schemas: List[Dict[str
     # Preprocess the HTML content
     preprocessed_text = web_preprocessing(html_content.decode('utf-8'))
     
-    # Get the latest model details
-    model_details = await get_latest_model_details(redis)
+    # Get the job's model details
+    model_details = await get_model_details(redis, task_id)
     if not model_details:
         return []
 
-    # Create model instance
+    # Get the model instance for this configuration
     try:
-        model_instance = ModelFactory.create_model(
+        model_instance = ModelFactory.get_model(
             model_type=model_details.provider_type,
             model_name=model_details.provider_model_name,
             api_key=model_details.api_key,
@@ -102,13 +108,17 @@ async def process_web_content(redis: Redis, pdf_key: str, schemas: List[Dict[str
         logger.error(f"Model creation error: {e}")
         return []
 
+    # Get example formats for all schemas up front; cached formats return immediately
+    keyword_sets = ["\n".join([f"{k}: {v}" for k, v in schema.items()]) for schema in schemas]
+    example_formats = await asyncio.gather(*[
+        get_example_format(model_instance, formatted_keywords, redis) for formatted_keywords in keyword_sets
+    ])
+
     # Process each schema using PRS agent
+    loop = asyncio.get_running_loop()
     results = []
-    for schema in schemas:
+    for schema_idx, (formatted_keywords, example_format) in enumerate(zip(keyword_sets, example_formats)):
         try:
-            formatted_keywords = "\n".join([f"{k}: {v}" for k, v in schema.items()])
-            # Get example format from the schema
-            example_format = await get_example_format(model_instance, formatted_keywords)
             # Use PRS agent for extraction
             text = f"""SOURCE DOCUMENT:
             {preprocessed_text}
@@ -119,20 +129,29 @@ async def process_web_content(redis: Redis, pdf_key: str, schemas: List[Dict[str
             METRICS TO EXTRACT:
             {formatted_keywords}"""
 
-            result = process_extraction(text, model_instance, AgentMode.EXTRACTION)
+            with timeline_span(Stage.AGENT_LOOP, schema=schema_idx):
+                result = await loop.run_in_executor(
+                    None, in_current_context(process_extraction, text, model_instance, AgentMode.EXTRACTION)
+                )
             results.append(result)
         except Exception as e:
             logger.error(f"Error processing schema: {e}")
             
     return results
 
-async def get_example_format(client, formatted_keywords: str) -> str:
-    try:
-        prompt = langsmith_client.pull_prompt(PromptType.EXAMPLE_GENERATION.value)
+async def get_example_format(client, formatted_keywords: str, redis: Optional[Redis] = None) -> str:
+    async def generate() -> str:
         messages = prompt.invoke({"first_value": formatted_keywords})
         processed_messages = preprocess_messages(messages)
-        if processed_messages:
-            return client.do_completion(processed_messages)
+        if not processed_messages:
+            return ""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, in_current_context(client.do_completion, processed_messages))
+
+    try:
+        prompt = langsmith_client.pull_prompt(PromptType.EXAMPLE_GENERATION.value)
+        redis = redis or await get_redis_connection()
+        return await get_or_generate_example_format(redis, formatted_keywords, get_prompt_version(prompt), generate)
     except Exception as e:
         logger.error(f"Error generating example format: {e}")
     return ""
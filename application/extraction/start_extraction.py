@@ -2,6 +2,7 @@ import os
 import logging
 from dotenv import load_dotenv
 import asyncio
+from common.metrics.pipeline_metrics import start_metrics_server
 from application.extraction.service.extraction_worker import clear_extraction_stream, run_extractions
 
 load_dotenv()
@@ -9,7 +10,11 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+EXTRACTION_METRICS_PORT = 9101
+
 async def main():
+    start_metrics_server(EXTRACTION_METRICS_PORT)
+
     try:
         await clear_extraction_stream()
     except Exception as e:
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from enum import Enum
 
 class JobStatus(str, Enum):
@@ -8,8 +8,13 @@ class JobStatus(str, Enum):
     COMPLETED = "COMPLETED"
     FAILED = "FAILED"
 
+class ExecutionMode(str, Enum):
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
 class WorkloadItem(BaseModel):
     raw_data: str = Field(default=None)
+    document_id: str = Field(default=None)
     schemas: List[str]
     data_source: str = Field(default=None)
     documents_location: str = Field(default=None)
@@ -23,8 +28,32 @@ class PipelineRequestModel(BaseModel):
     provider_model_name: str
     api_key: str
     markdown_mode: bool = False
+    execution_mode: ExecutionMode = ExecutionMode.INTERACTIVE
     additional_params: Dict[str, Any] = Field(default_factory=dict)
 
+class DocumentUploadResponse(BaseModel):
+    document_id: str
+    sha256: str
+    size: int
+    pages: int
+
+class BulkPipelineRequestModel(PipelineRequestModel):
+    workloads: List[WorkloadItem] = Field(default_factory=list)
+
+class BulkPipelineResponseModel(BaseModel):
+    message: str
+    batch_id: str
+    task_ids: List[str]
+
+class BulkJobStatus(BaseModel):
+    task_id: str
+    status: JobStatus
+
+class BulkPipelineStatus(BaseModel):
+    batch_id: str
+    jobs: List[BulkJobStatus]
+    counts: Dict[str, int]
+
 class PipelineResponseModel(BaseModel):
     message: str
     task_id: str
@@ -34,9 +63,49 @@ class PipelineResult(BaseModel):
     status: JobStatus
     results: List[Dict]
     total_run_time: str
+    cursor: Optional[str] = None
+    workload_results: List[Dict] = Field(default_factory=list)
+    error_message: Optional[str] = None
+
+class TimelineEvent(BaseModel):
+    id: str
+    service: str
+    stage: str
+    status: str
+    start_ms: int
+    end_ms: int
+    duration_ms: int
+    index: Optional[int] = None
+    llm_calls: int = 0
+    cached_llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    detail: Dict[str, Any] = Field(default_factory=dict)
+
+class StageSummary(BaseModel):
+    events: int
+    failed: int
+    total_ms: int
+    max_ms: int
+    llm_calls: int
+    cached_llm_calls: int
+    prompt_tokens: int
+    completion_tokens: int
+
+class PipelineTimeline(BaseModel):
+    task_id: str
+    status: JobStatus
+    start_ms: Optional[int] = None
+    end_ms: Optional[int] = None
+    stages: Dict[str, StageSummary]
+    events: List[TimelineEvent]
 
 class ExtractionRequestModel(BaseModel):
     task_id: str
     pdf_key: str
     schemas: List[Dict]
     source_type: str = "pdf"
+    execution_mode: str = ExecutionMode.INTERACTIVE.value
+    document_hash: Optional[str] = None
+    # Batch-mode workloads are collected per group: their job, or their bulk submission.
+    batch_group: Optional[str] = None
@@ -1,14 +1,44 @@
-from fastapi import APIRouter, HTTPException, status
-from application.pipeline.models.models import PipelineRequestModel, PipelineResponseModel, PipelineResult
-from application.pipeline.service.pipeline_service import run_pipeline, get_pipeline_results
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Header, HTTPException, Request, Response, status
+from pydantic import ValidationError
+from application.pipeline.models.models import (
+    PipelineRequestModel,
+    PipelineResponseModel,
+    PipelineResult,
+    PipelineTimeline,
+    BulkPipelineRequestModel,
+    BulkPipelineResponseModel,
+    BulkPipelineStatus,
+    DocumentUploadResponse,
+    WorkloadItem
+)
+from application.pipeline.service.pipeline_service import (
+    run_pipeline,
+    run_bulk_pipeline,
+    get_bulk_pipeline_status,
+    upload_document,
+    get_pipeline_results,
+    get_pipeline_timeline,
+    pipeline_events_delivered,
+    pipeline_exists,
+    stream_pipeline_events
+)
+from fastapi.responses import JSONResponse, StreamingResponse
+import json
 import logging
+from typing import Optional
 
 api_router = APIRouter()
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# The bulk route reads its body itself to accept NDJSON; its nested models are already in the spec's components.
+BULK_REQUEST_SCHEMA = {
+    key: value
+    for key, value in BulkPipelineRequestModel.model_json_schema(ref_template="#/components/schemas/{model}").items()
+    if key != "$defs"
+}
+
 @api_router.post("/pipelines", 
                  response_model=PipelineResponseModel, 
                  status_code=status.HTTP_202_ACCEPTED,
@@ -27,20 +57,122 @@ async def run_pipeline_route(pipeline_request: PipelineRequestModel):
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+@api_router.post("/documents",
+                 response_model=DocumentUploadResponse,
+                 status_code=status.HTTP_201_CREATED,
+                 summary="Upload document",
+                 description="Stores a PDF sent as the raw request body, uncompressed and unencoded; chunked transfer encoding is supported. "
+                             "Reference the returned document_id from a workload instead of sending raw_data.",
+                 openapi_extra={
+                     "requestBody": {
+                         "required": True,
+                         "content": {"application/pdf": {"schema": {"type": "string", "format": "binary"}}}
+                     }
+                 },
+                 responses={
+                     201: {"description": "Document stored"},
+                     400: {"description": "Empty or unreadable document"},
+                     413: {"description": "Document exceeds the upload limit"},
+                     500: {"description": "Internal server error"}
+                 })
+async def upload_document_route(request: Request):
+    try:
+        response = await upload_document(request.stream())
+        if isinstance(response, tuple):
+            error, status_code = response
+            raise HTTPException(status_code=status_code, detail=error["error"])
+        return JSONResponse(content=response, status_code=status.HTTP_201_CREATED)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Unexpected error in upload_document_route: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
+
+@api_router.post("/pipelines/bulk",
+                 response_model=BulkPipelineResponseModel,
+                 status_code=status.HTTP_202_ACCEPTED,
+                 summary="Run pipelines in bulk",
+                 description="Submits every workload as its own pipeline job under one batch ID. Accepts a JSON body, "
+                             "or NDJSON whose first line holds the provider settings and every further line one workload.",
+                 openapi_extra={
+                     "requestBody": {
+                         "required": True,
+                         "content": {
+                             "application/json": {"schema": BULK_REQUEST_SCHEMA},
+                             "application/x-ndjson": {"schema": {"type": "string"}}
+                         }
+                     }
+                 },
+                 responses={
+                     202: {"description": "Pipeline processing started"},
+                     400: {"description": "Invalid request or model configuration"},
+                     500: {"description": "Internal server error"}
+                 })
+async def run_bulk_pipeline_route(request: Request):
+    try:
+        bulk_request = await parse_bulk_request(request)
+    except (ValueError, TypeError, ValidationError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    try:
+        response = await run_bulk_pipeline(bulk_request)
+        if isinstance(response, tuple):
+            error, status_code = response
+            raise HTTPException(status_code=status_code, detail=error["error"])
+        return JSONResponse(content=response, status_code=status.HTTP_202_ACCEPTED)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Unexpected error in run_bulk_pipeline_route: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
+
+async def parse_bulk_request(request: Request) -> BulkPipelineRequestModel:
+    if not request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        return BulkPipelineRequestModel(**await request.json())
+    lines = [line for line in (await request.body()).decode("utf-8").splitlines() if line.strip()]
+    if not lines:
+        raise ValueError("Empty NDJSON body")
+    bulk_request = BulkPipelineRequestModel(**json.loads(lines[0]))
+    bulk_request.workloads.extend(WorkloadItem(**json.loads(line)) for line in lines[1:])
+    return bulk_request
+
+@api_router.get("/pipelines/bulk/{batch_id}",
+                response_model=BulkPipelineStatus,
+                summary="Get bulk pipeline status",
+                description="Retrieves the current status of every job submitted under a bulk batch ID.",
+                responses={
+                    200: {"description": "Batch status retrieved successfully"},
+                    404: {"description": "Batch not found"},
+                    500: {"description": "Internal server error"}
+                })
+async def get_bulk_pipeline_status_route(batch_id: str):
+    try:
+        batch_status = await get_bulk_pipeline_status(batch_id)
+        if isinstance(batch_status, tuple):
+            error, status_code = batch_status
+            raise HTTPException(status_code=status_code, detail=error["error"])
+        return JSONResponse(content=batch_status, status_code=status.HTTP_200_OK)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Unexpected error in get_bulk_pipeline_status_route: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
+
 @api_router.get("/pipelines/{task_id}", 
                 response_model=PipelineResult,
                 summary="Get pipeline results",
-                description="Retrieves the results of a pipeline processing job.",
+                description="Retrieves the results of a pipeline processing job. Pass the cursor of the previous response to only receive what changed since.",
                 responses={
                     200: {"description": "Pipeline results retrieved successfully"},
+                    400: {"description": "Invalid cursor"},
                     404: {"description": "Task not found"},
                     500: {"description": "Internal server error"}
                 })
-async def get_pipeline_results_route(task_id: str):
+async def get_pipeline_results_route(task_id: str, cursor: Optional[str] = None):
     try:
-        results = await get_pipeline_results(task_id)
-        if isinstance(results, tuple) and results[1] == 500:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=results[0]['error'])
+        results = await get_pipeline_results(task_id, cursor)
+        if isinstance(results, tuple):
+            error, status_code = results
+            raise HTTPException(status_code=status_code, detail=error['error'])
         if not results:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
         return JSONResponse(content=results, status_code=status.HTTP_200_OK)
@@ -49,3 +181,53 @@ async def get_pipeline_results_route(task_id: str):
     except Exception as e:
         logger.error(f"Unexpected error in get_pipeline_results_route: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
+
+@api_router.get("/pipelines/{task_id}/timeline",
+                response_model=PipelineTimeline,
+                summary="Get pipeline timeline",
+                description="Retrieves the per-stage event timeline of a pipeline processing job.",
+                responses={
+                    200: {"description": "Pipeline timeline retrieved successfully"},
+                    404: {"description": "Task not found"},
+                    500: {"description": "Internal server error"}
+                })
+async def get_pipeline_timeline_route(task_id: str):
+    try:
+        timeline = await get_pipeline_timeline(task_id)
+        if isinstance(timeline, tuple):
+            error, status_code = timeline
+            raise HTTPException(status_code=status_code, detail=error["error"])
+        return JSONResponse(content=timeline, status_code=status.HTTP_200_OK)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Unexpected error in get_pipeline_timeline_route: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
+
+@api_router.get("/pipelines/{task_id}/events",
+                summary="Stream pipeline events",
+                description="Streams status changes, stage progress and per-workload results of a pipeline job as server-sent events until the job completes or fails. "
+                            "A reconnecting client sending Last-Event-ID resumes after the last event it received.",
+                responses={
+                    200: {"description": "Event stream", "content": {"text/event-stream": {}}},
+                    204: {"description": "The job has finished and every event was already delivered"},
+                    404: {"description": "Task not found"},
+                    500: {"description": "Internal server error"}
+                })
+async def stream_pipeline_events_route(task_id: str, last_event_id: Optional[str] = Header(default=None)):
+    try:
+        if not await pipeline_exists(task_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+        # 204 tells an EventSource to stop reconnecting.
+        if last_event_id and await pipeline_events_delivered(task_id, last_event_id):
+            return Response(status_code=status.HTTP_204_NO_CONTENT)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Unexpected error in stream_pipeline_events_route: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
+    return StreamingResponse(
+        stream_pipeline_events(task_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,10 +1,13 @@
+import os
 import json
 import uuid
 import base64
 import zlib
 import hashlib
+import re
+import tempfile
 from io import BytesIO
-from typing import List, Dict, Optional
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
 import redis.asyncio as redis
 import logging
 import time
@@ -16,13 +19,38 @@ from application.pipeline.models.models import (
     PipelineRequestModel,
     PipelineResponseModel,
     JobStatus,
+    ExecutionMode,
     PipelineResult,
     ExtractionRequestModel,
-    WorkloadItem
+    WorkloadItem,
+    PipelineTimeline,
+    BulkPipelineRequestModel
 )
 from common.text_extraction.text_extractor import get_pdf_page_count
 from common.models.model_factory import ModelFactory
 from common.sources.source_factory import SourceFactory
+from common.redis.batch_collector import get_batch_workload_count_key
+from common.metrics.pipeline_metrics import Stage, observe_stage
+from common.metrics.llm_usage import in_current_context
+from common.redis.job_results import add_workload_result, load_job_result, store_job_result
+from common.redis.model_details import store_model_details
+from common.redis.document_store import (
+    BLOB_TTL,
+    get_blob_key,
+    get_document_hash,
+    load_document_info,
+    store_blob,
+    write_document
+)
+from common.cache.extraction_cache import get_cached_extractions
+from common.cache.result_cache import get_cached_results
+from common.redis.job_timeline import (
+    JobTimeline,
+    get_job_timeline_key,
+    parse_timeline_event,
+    read_timeline,
+    summarize_timeline
+)
 from langsmith import Client as LangSmithClient
 from langchain.schema import SystemMessage, HumanMessage
 
@@ -31,11 +59,24 @@ logger = logging.getLogger(__name__)
 
 langsmith_client = LangSmithClient()
 
+REDIS_URL = f"redis://{os.getenv('REDIS_HOST', 'redis')}:{os.getenv('REDIS_PORT', 6379)}/0"
+EVENT_STREAM_BLOCK_MS = 15000
+# Timeline stages pushed to event stream clients; page-level events stay on /timeline.
+PROGRESS_STAGES = (
+    "progress", "ingestion", "extraction_workload", "transformation_workload",
+    "batch_extraction", "batch_transformation"
+)
+# Bulk submissions are written to Redis in pipelines of this many documents.
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "100"))
+BULK_BATCH_TTL = 86400
+STREAM_ID_PATTERN = re.compile(r"\d+-\d+")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(256 * 1024 * 1024)))
+
 async def run_pipeline(customer_input: PipelineRequestModel):
     logger.info("Starting Pipeline Run...")
 
     try:
-        con = await redis.from_url("redis://redis:6379/0", encoding="utf-8", decode_responses=True)
+        con = await redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
     except Exception as e:
         logger.error(f"Redis connection error: {e}")
         return {
@@ -51,6 +92,20 @@ async def run_pipeline(customer_input: PipelineRequestModel):
         {"status": json.dumps(JobStatus.PENDING.value), "start_time": str(start_time)}
     )
 
+    error = validate_model_config(customer_input)
+    if error:
+        return error
+    model_details = get_model_details(customer_input)
+    await store_model_details(con, task_id, model_details)
+
+    if is_transformation_only_job(customer_input.workloads):
+        logger.info("Transformation-only job detected")
+        return await handle_transformation(customer_input, con, task_id)
+    else:
+        logger.info("Full pipeline job detected")
+        return await handle_full_pipeline(customer_input, con, task_id, model_details, start_time)
+
+def validate_model_config(customer_input: PipelineRequestModel) -> Optional[Dict[str, str]]:
     try:
         ModelFactory.create_model(
             model_type=customer_input.provider_type,
@@ -58,32 +113,41 @@ async def run_pipeline(customer_input: PipelineRequestModel):
             api_key=customer_input.api_key,
             additional_params=customer_input.additional_params
         )
+        if customer_input.execution_mode == ExecutionMode.BATCH:
+            ModelFactory.create_batch_client(
+                model_type=customer_input.provider_type,
+                model_name=customer_input.provider_model_name,
+                api_key=customer_input.api_key,
+                additional_params=customer_input.additional_params
+            )
     except ValueError as e:
         logger.error(f"Model creation error: {e}")
         return {
             "error": "Invalid model configuration",
             "details": str(e)
         }
-    
-    # Publish details to be used by other workers
-    model_details_json = json.dumps({
+    return None
+
+def get_model_details(customer_input: PipelineRequestModel) -> Dict[str, Any]:
+    """The model configuration workers use for a job, stored under the job's task ID."""
+    return {
         "provider_type": customer_input.provider_type,
         "provider_model_name": customer_input.provider_model_name,
         "api_key": customer_input.api_key,
         "markdown_mode": customer_input.markdown_mode,
         "additional_params": customer_input.additional_params
-    })
-    await con.set("model-details", model_details_json)
-
-    if is_transformation_only_job(customer_input.workloads):
-        logger.info("Transformation-only job detected")
-        return await handle_transformation(customer_input, con, task_id)
-    else:
-        logger.info("Full pipeline job detected")
-        return await handle_full_pipeline(customer_input, con, task_id)
+    }
 
 async def handle_transformation(customer_input: PipelineRequestModel, con: redis.Redis, task_id: str):
-    workload = customer_input.workloads[0]
+    await queue_transformation(customer_input.workloads[0], con, task_id)
+
+    response = PipelineResponseModel(
+        message="Transformation task submitted successfully",
+        task_id=task_id
+    )
+    return {"task_id": response.task_id, "message": response.message}
+
+async def queue_transformation(workload: WorkloadItem, con: redis.Redis, task_id: str) -> None:
     transformation_payload = {
         "task_id": task_id,
         "data_location_key": workload.documents_location,
@@ -92,67 +156,230 @@ async def handle_transformation(customer_input: PipelineRequestModel, con: redis
         "raw_data": workload.raw_data
     }
     await con.xadd("transformation-only-stream", {"payload": json.dumps(transformation_payload)})
-    
-    response = PipelineResponseModel(
-        message="Transformation task submitted successfully",
-        task_id=task_id
-    )
-    return {"task_id": response.task_id, "message": response.message}
 
-async def handle_full_pipeline(customer_input: PipelineRequestModel, con: redis.Redis, task_id: str):
+async def handle_full_pipeline(
+    customer_input: PipelineRequestModel, con: redis.Redis, task_id: str, model_details: Dict[str, Any], start_time: int
+):
     await con.set(f"workload-count:{task_id}", len(customer_input.workloads))
-    
-    pdf_hash = hashlib.sha256(json.dumps([w.dict() for w in customer_input.workloads]).encode()).hexdigest()
-    cache_key = f"cache:{pdf_hash}"
-    cached_hash = await con.get(cache_key)
-    if cached_hash:
-        logger.info(f"Cache hit for key: {cache_key}")
-        cached_response = await con.get(cached_hash)
-        if cached_response:
-            return json.loads(cached_response)
-
-    async def process_workload(index: int, workload_combo: WorkloadItem) -> int:
-        try:
-            if workload_combo.raw_data and workload_combo.data_source:
-                logger.error(f"Workload {index} cannot have both raw_data and data_source.")
-                raise ValueError("Workload cannot have both raw_data and data_source.")
-            if workload_combo.raw_data:
-                return await handle_raw_data(index, workload_combo, con, task_id)
-            elif workload_combo.data_source == "web":
-                return await handle_web_source(index, workload_combo, con, task_id)
-            elif workload_combo.data_source:
-                return await handle_data_source(index, workload_combo, con, task_id)
-            else:
-                logger.error(f"Workload {index} must have either raw_data or data_source.")
-                return 0
-        except Exception as e:
-            logger.error(f"Error processing workload {index}: {e}")
-            return 0
 
-    workload_results = await asyncio.gather(
+    execution_mode = customer_input.execution_mode.value
+    timeline = JobTimeline(task_id, "pipeline")
+
+    async def process_workload(index: int, workload_combo: WorkloadItem) -> Tuple[int, Optional[ExtractionRequestModel]]:
+        with observe_stage(Stage.INGESTION, customer_input.provider_type, customer_input.provider_model_name), \
+                timeline.span(Stage.INGESTION, index, data_source=workload_source(workload_combo)):
+            return await ingest_workload(index, workload_combo, con, con, task_id, model_details, execution_mode)
+
+    ingested = await asyncio.gather(
         *[process_workload(index, workload_combo) for index, workload_combo in enumerate(customer_input.workloads)],
         return_exceptions=False
     )
 
-    total_pages = sum(workload_results)
+    total_pages = sum(page_count for page_count, _ in ingested)
     logger.info(f"Total pages processed: {total_pages}")
+    await timeline.flush(con)
+
+    extraction_requests = [extraction_request for _, extraction_request in ingested if extraction_request]
+    cached_results = await asyncio.gather(
+        *[get_cached_workload_result(con, extraction_request, model_details) for extraction_request in extraction_requests]
+    )
+
+    if extraction_requests and len(extraction_requests) == len(customer_input.workloads) and all(cached_results):
+        logger.info(f"Completing task {task_id} from the result cache")
+        await complete_from_result_cache(con, task_id, cached_results, start_time)
+        return {"task_id": task_id, "message": "Results served from cache"}
+
+    if customer_input.execution_mode == ExecutionMode.BATCH:
+        # Web workloads always run interactively; only queued documents join the batch.
+        batch_workloads = sum(
+            1 for extraction_request, cached_result in zip(extraction_requests, cached_results)
+            if not cached_result and extraction_request.source_type != "web"
+        )
+        await con.set(get_batch_workload_count_key(task_id), batch_workloads, ex=86400)
 
     await con.xadd(
         f"job-status:{task_id}",
         {"status": json.dumps(JobStatus.IN_PROGRESS.value)}
     )
 
+    # Cached workloads are recorded before anything is queued, so the worker completing
+    # the job after its last queued workload always finds them.
+    for cached_result in filter(None, cached_results):
+        workload_result = json.dumps(cached_result)
+        await add_workload_result(con, task_id, cached_result["pdf_key"], workload_result)
+        await con.xadd(
+            f"job-status:{task_id}",
+            {"status": json.dumps(JobStatus.IN_PROGRESS.value), "workload_result": workload_result}
+        )
+    for extraction_request, cached_result in zip(extraction_requests, cached_results):
+        if not cached_result:
+            await queue_extraction(con, con, extraction_request, model_details)
+
     response = PipelineResponseModel(
         message="Tasks submitted successfully",
         task_id=task_id
     )
 
-    response_hash = hashlib.sha256(json.dumps(response.dict()).encode()).hexdigest()
-    await con.setex(cache_key, 3600, response_hash)
-    await con.setex(response_hash, 3600, json.dumps(response.dict()))
-
     return {"task_id": response.task_id, "message": response.message}
 
+async def run_bulk_pipeline(customer_input: BulkPipelineRequestModel):
+    """Submit every workload as its own job, validating the model configuration once."""
+    logger.info(f"Starting bulk pipeline run with {len(customer_input.workloads)} workloads...")
+    if not customer_input.workloads:
+        return {"error": "No workloads submitted"}, 400
+
+    try:
+        con = await redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+    except Exception as e:
+        logger.error(f"Redis connection error: {e}")
+        return {"error": "Service temporarily unavailable"}, 503
+
+    error = validate_model_config(customer_input)
+    if error:
+        return error, 400
+
+    batch_id = str(uuid.uuid4())
+    task_ids: List[str] = []
+    batch_workloads = 0
+    for offset in range(0, len(customer_input.workloads), BULK_CHUNK_SIZE):
+        chunk = customer_input.workloads[offset:offset + BULK_CHUNK_SIZE]
+        chunk_task_ids, chunk_batch_workloads = await submit_bulk_chunk(con, customer_input, batch_id, chunk)
+        task_ids.extend(chunk_task_ids)
+        batch_workloads += chunk_batch_workloads
+    if batch_workloads:
+        # Written once every chunk is queued, so workers collect the whole submission into one batch.
+        await con.set(get_batch_workload_count_key(batch_id), batch_workloads, ex=86400)
+    logger.info(f"Submitted {len(task_ids)} jobs for batch {batch_id}")
+
+    return {"batch_id": batch_id, "task_ids": task_ids, "message": "Pipeline processing started"}
+
+async def submit_bulk_chunk(
+    con: redis.Redis, customer_input: BulkPipelineRequestModel, batch_id: str, workloads: List[WorkloadItem]
+) -> Tuple[List[str], int]:
+    """Ingest a chunk of workloads and write all of their keys and stream entries in one round trip.
+
+    Returns the chunk's task IDs and how many of its workloads were queued
+    in batch mode; those all belong to the batch group ``batch_id``.
+    """
+    execution_mode = customer_input.execution_mode.value
+    model_details = get_model_details(customer_input)
+    start_time = int(time.time())
+    task_ids = [str(uuid.uuid4()) for _ in workloads]
+    timelines = [JobTimeline(task_id, "pipeline") for task_id in task_ids]
+    batched_task_ids: List[str] = []
+
+    # The ingestion handlers await their writes; on a pipeline those only queue the command.
+    pipe = con.pipeline(transaction=False)
+    for task_id in task_ids:
+        pipe.set(f"job-start-time:{task_id}", start_time)
+        pipe.xadd(
+            f"job-status:{task_id}",
+            {"status": json.dumps(JobStatus.PENDING.value), "start_time": str(start_time)}
+        )
+        await store_model_details(pipe, task_id, model_details)
+    pipe.rpush(get_bulk_batch_key(batch_id), *task_ids)
+    pipe.expire(get_bulk_batch_key(batch_id), BULK_BATCH_TTL)
+
+    async def process_workload(task_id: str, timeline: JobTimeline, workload_combo: WorkloadItem) -> int:
+        if is_transformation_only_job([workload_combo]):
+            await queue_transformation(workload_combo, pipe, task_id)
+            return 0
+        pipe.set(f"workload-count:{task_id}", 1)
+        with observe_stage(Stage.INGESTION, customer_input.provider_type, customer_input.provider_model_name), \
+                timeline.span(Stage.INGESTION, 0, data_source=workload_source(workload_combo)):
+            page_count, extraction_request = await ingest_workload(
+                0, workload_combo, pipe, con, task_id, model_details, execution_mode
+            )
+        if not page_count:
+            pipe.xadd(
+                f"job-status:{task_id}",
+                {"status": json.dumps(JobStatus.FAILED.value), "error_message": "Workload could not be ingested"}
+            )
+            return 0
+        # Cache lookups need their replies now, so they go through the connection itself.
+        cached_result = await get_cached_workload_result(con, extraction_request, model_details)
+        if cached_result:
+            await complete_from_result_cache(pipe, task_id, [cached_result], start_time)
+            return page_count
+        # Web workloads always run interactively; only queued documents join the batch.
+        if customer_input.execution_mode == ExecutionMode.BATCH and extraction_request.source_type != "web":
+            extraction_request.batch_group = batch_id
+            batched_task_ids.append(task_id)
+        pipe.xadd(f"job-status:{task_id}", {"status": json.dumps(JobStatus.IN_PROGRESS.value)})
+        await queue_extraction(pipe, con, extraction_request, model_details)
+        return page_count
+
+    page_counts = await asyncio.gather(
+        *[process_workload(task_id, timeline, workload_combo)
+          for task_id, timeline, workload_combo in zip(task_ids, timelines, workloads)]
+    )
+    for timeline in timelines:
+        timeline.queue_events(pipe)
+    await pipe.execute()
+    logger.info(f"Submitted {len(task_ids)} jobs ({sum(page_counts)} pages) for batch {batch_id}")
+
+    return task_ids, len(batched_task_ids)
+
+def get_bulk_batch_key(batch_id: str) -> str:
+    return f"pipeline-batch:{batch_id}"
+
+async def get_bulk_pipeline_status(batch_id: str):
+    try:
+        con = await redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+        task_ids = await con.lrange(get_bulk_batch_key(batch_id), 0, -1)
+        if not task_ids:
+            return {"error": "Batch not found"}, 404
+
+        pipe = con.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipe.xrevrange(f"job-status:{task_id}", count=1)
+        latest_entries = await pipe.execute()
+
+        jobs = []
+        counts: Dict[str, int] = {}
+        for task_id, entries in zip(task_ids, latest_entries):
+            job_status = json.loads(entries[0][1]["status"]) if entries else JobStatus.PENDING.value
+            jobs.append({"task_id": task_id, "status": job_status})
+            counts[job_status] = counts.get(job_status, 0) + 1
+
+        return {"batch_id": batch_id, "jobs": jobs, "counts": counts}
+    except Exception as e:
+        logger.error(f"Error retrieving bulk pipeline status: {e}")
+        return {"error": "An unexpected error occurred"}, 500
+
+async def ingest_workload(
+    index: int, workload_combo: WorkloadItem, con: redis.Redis, reader: redis.Redis, task_id: str,
+    model_details: Dict[str, Any], execution_mode: str = ExecutionMode.INTERACTIVE.value
+) -> Tuple[int, Optional[ExtractionRequestModel]]:
+    """Store a workload's document and build its extraction request; (0, None) if it could not be ingested.
+
+    ``con`` may be a pipeline that only queues commands; reads whose replies
+    are needed right away go through ``reader``.
+    """
+    try:
+        if sum(bool(source) for source in (workload_combo.raw_data, workload_combo.document_id, workload_combo.data_source)) > 1:
+            logger.error(f"Workload {index} can only have one of raw_data, document_id and data_source.")
+            raise ValueError("Workload can only have one of raw_data, document_id and data_source.")
+        if workload_combo.raw_data:
+            return await handle_raw_data(index, workload_combo, con, task_id, execution_mode)
+        elif workload_combo.document_id:
+            return await handle_uploaded_document(index, workload_combo, con, reader, task_id, execution_mode)
+        elif workload_combo.data_source == "web":
+            return await handle_web_source(index, workload_combo, con, task_id)
+        elif workload_combo.data_source:
+            return await handle_data_source(index, workload_combo, con, task_id, model_details, execution_mode)
+        else:
+            logger.error(f"Workload {index} must have raw_data, document_id or data_source.")
+            return 0, None
+    except Exception as e:
+        logger.error(f"Error processing workload {index}: {e}")
+        return 0, None
+
+def workload_source(workload_combo: WorkloadItem) -> str:
+    if workload_combo.data_source:
+        return workload_combo.data_source
+    return "document" if workload_combo.document_id else "raw_data"
+
 def is_transformation_only_job(workloads: List[WorkloadItem]) -> bool:
     if len(workloads) != 1:
         return False
@@ -165,14 +392,17 @@ def is_transformation_only_job(workloads: List[WorkloadItem]) -> bool:
         workload.data_source is None
     )
 
-async def handle_raw_data(index: int, workload_combo: WorkloadItem, con: redis.Redis, task_id: str) -> int:
+async def handle_raw_data(
+    index: int, workload_combo: WorkloadItem, con: redis.Redis, task_id: str,
+    execution_mode: str = ExecutionMode.INTERACTIVE.value
+) -> Tuple[int, Optional[ExtractionRequestModel]]:
     logger.info(f"Processing workload {index} with raw_data.")
     # Decode the base64 encoded data stream
     try:
         decompressed_data = zlib.decompress(base64.b64decode(workload_combo.raw_data))
     except zlib.error as e:
         logger.error(f"Decompression failed for workload {index}: {e}")
-        return 0
+        return 0, None
 
     data_cursor = BytesIO(decompressed_data)
     logger.info(f"Decompressed data for workload {index}")
@@ -182,23 +412,161 @@ async def handle_raw_data(index: int, workload_combo: WorkloadItem, con: redis.R
         logger.debug(f"Page count for workload {index}: {page_count}")
     except Exception as e:
         logger.error(f"Error getting page count for workload {index}: {e}")
-        return 0
+        return 0, None
+
+    document_hash = get_document_hash(decompressed_data)
+    blob_key = await store_blob(con, document_hash, base64.b64encode(decompressed_data).decode())
+    logger.info(f"Data stored in Redis with key: {blob_key} as base64 string")
+
+    schemas = [json.loads(schema) for schema in workload_combo.schemas]
+
+    task_payload = ExtractionRequestModel(
+        task_id=task_id,
+        pdf_key=f"data:{task_id}:{index}",
+        schemas=schemas,
+        execution_mode=execution_mode,
+        document_hash=document_hash
+    )
 
-    data_key = f"data:{task_id}:{index}"
-    await con.set(data_key, base64.b64encode(decompressed_data).decode())
-    logger.info(f"Data stored in Redis with key: {data_key} as base64 string")
+    return page_count, task_payload
+
+async def handle_uploaded_document(
+    index: int, workload_combo: WorkloadItem, con: redis.Redis, reader: redis.Redis, task_id: str,
+    execution_mode: str = ExecutionMode.INTERACTIVE.value
+) -> Tuple[int, Optional[ExtractionRequestModel]]:
+    logger.info(f"Processing workload {index} with uploaded document {workload_combo.document_id}.")
+    document_info = await load_document_info(reader, workload_combo.document_id)
+    if not document_info or not await reader.exists(get_blob_key(document_info["sha256"])):
+        logger.error(f"No uploaded document {workload_combo.document_id} for workload {index}")
+        return 0, None
+    await con.expire(get_blob_key(document_info["sha256"]), BLOB_TTL)
 
     schemas = [json.loads(schema) for schema in workload_combo.schemas]
 
     task_payload = ExtractionRequestModel(
         task_id=task_id,
-        pdf_key=data_key,
-        schemas=schemas
+        pdf_key=f"data:{task_id}:{index}",
+        schemas=schemas,
+        execution_mode=execution_mode,
+        document_hash=document_info["sha256"]
     )
 
+    return int(document_info["pages"]), task_payload
+
+async def queue_extraction(
+    con: redis.Redis, reader: redis.Redis, task_payload: ExtractionRequestModel, model_details: Dict[str, Any]
+) -> None:
+    """Queue a document for extraction, or straight for transformation when its extraction output is cached.
+
+    Only interactive jobs reuse cached output: in batch mode the extraction
+    worker waits for every workload of the job before it starts.
+    """
+    if task_payload.document_hash and task_payload.execution_mode == ExecutionMode.INTERACTIVE.value:
+        cached_results = await get_cached_extractions(
+            reader, task_payload.document_hash, task_payload.schemas,
+            model_details["provider_type"], model_details["provider_model_name"]
+        )
+        if cached_results is not None:
+            logger.info(f"Reusing cached extraction output for {task_payload.pdf_key}")
+            # Same shape as the extraction worker's response for this workload.
+            extraction_response = {
+                "task_id": task_payload.task_id,
+                "pdf_key": task_payload.pdf_key,
+                "results": [
+                    {"schema_id": f"schema_{index}", "metrics": {f"schema_{index}": result}, "schema_data": schema}
+                    for index, (schema, result) in enumerate(zip(task_payload.schemas, cached_results))
+                ],
+                "source_type": task_payload.source_type,
+                "execution_mode": task_payload.execution_mode,
+                "document_hash": task_payload.document_hash
+            }
+            await con.xadd("transformation-stream", {"payload": json.dumps(extraction_response)})
+            return
+
     await con.xadd("extraction-stream", {"payload": json.dumps(task_payload.dict())})
 
-    return page_count
+async def get_cached_workload_result(
+    reader: redis.Redis, extraction_request: ExtractionRequestModel, model_details: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """A workload's final result from the result cache, shaped like the transformation worker's, or None."""
+    if not extraction_request.document_hash:
+        return None
+    cached_results = await get_cached_results(
+        reader, extraction_request.document_hash, extraction_request.schemas,
+        model_details["provider_type"], model_details["provider_model_name"], model_details["markdown_mode"]
+    )
+    if cached_results is None:
+        return None
+    return {
+        "task_id": extraction_request.task_id,
+        "pdf_key": extraction_request.pdf_key,
+        "results": [
+            {"schema_id": f"schema_{index}", "metrics": json.loads(result), "schema_data": schema}
+            for index, (schema, result) in enumerate(zip(extraction_request.schemas, cached_results))
+        ]
+    }
+
+async def complete_from_result_cache(
+    con: redis.Redis, task_id: str, workload_results: List[Dict[str, Any]], start_time: int
+) -> None:
+    """Complete a job whose every workload result was cached, writing what the transformation worker would."""
+    merged_result = {
+        "task_id": task_id,
+        "pdf_key": workload_results[-1]["pdf_key"],
+        "results": [schema_result for workload in workload_results for schema_result in workload["results"]]
+    }
+    await store_job_result(con, task_id, json.dumps(merged_result))
+
+    total_run_time = format_run_time(int(time.time()) - start_time)
+    for index, workload_result in enumerate(workload_results):
+        job_status = JobStatus.COMPLETED if index == len(workload_results) - 1 else JobStatus.IN_PROGRESS
+        await con.xadd(
+            f"job-status:{task_id}",
+            {
+                "status": json.dumps(job_status.value),
+                "workload_result": json.dumps(workload_result),
+                "total_run_time": total_run_time
+            }
+        )
+
+async def upload_document(chunks: AsyncIterator[bytes]):
+    """Store a PDF sent as a stream of chunks, returning its document ID for later workloads.
+
+    The body is spooled to a temporary file while it is hashed, so memory use
+    does not grow with the document; the page count is read from the file and
+    the content is then appended to Redis in fixed-size chunks.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.TemporaryFile() as spool:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                return {"error": f"Document exceeds the upload limit of {MAX_UPLOAD_BYTES} bytes"}, 413
+            digest.update(chunk)
+            spool.write(chunk)
+        if not size:
+            return {"error": "Empty document"}, 400
+
+        spool.seek(0)
+        try:
+            page_count = await asyncio.get_running_loop().run_in_executor(None, get_pdf_page_count, spool)
+        except Exception as e:
+            logger.error(f"Uploaded document is not a readable PDF: {e}")
+            return {"error": "Document is not a readable PDF"}, 400
+
+        document_id = str(uuid.uuid4())
+        document_info = {"sha256": digest.hexdigest(), "size": size, "pages": page_count}
+        spool.seek(0)
+        try:
+            con = await redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+            await write_document(con, document_id, spool, {key: str(value) for key, value in document_info.items()})
+        except Exception as e:
+            logger.error(f"Failed to store uploaded document: {e}")
+            return {"error": "Failed to store document"}, 500
+
+    logger.info(f"Stored uploaded document {document_id}: {size} bytes, {page_count} pages")
+    return {"document_id": document_id, **document_info}
 
 async def fetch_document(session, workload_combo):
     try:
@@ -211,7 +579,9 @@ async def fetch_document(session, workload_combo):
         raise
 
 
-async def handle_web_source(index: int, workload_combo: WorkloadItem, con: redis.Redis, task_id: str) -> int:
+async def handle_web_source(
+    index: int, workload_combo: WorkloadItem, con: redis.Redis, task_id: str
+) -> Tuple[int, Optional[ExtractionRequestModel]]:
     logger.info(f"Processing workload {index} with web source: {workload_combo.documents_location}")
     
     # Fetch the web content
@@ -222,10 +592,10 @@ async def handle_web_source(index: int, workload_combo: WorkloadItem, con: redis
         result = urlparse(workload_combo.documents_location)
         if not all([result.scheme, result.netloc]):
             logger.error(f"Invalid URL: {workload_combo.documents_location}")
-            return 0
+            return 0, None
     except ValueError:
         logger.error(f"Invalid URL format: {workload_combo.documents_location}")
-        return 0
+        return 0, None
     logger.info("URL is valid")
     logger.info("Fetching document content")
     async with aiohttp.ClientSession() as session:
@@ -233,7 +603,7 @@ async def handle_web_source(index: int, workload_combo: WorkloadItem, con: redis
             document_content = await fetch_document(session, workload_combo)
         except aiohttp.ClientError as e:
             logger.error(f"Failed to connect to URL: {str(e)}")
-            return 0
+            return 0, None
     
     # Process the HTML content as needed
     # For example, you might want to extract text or specific elements
@@ -250,12 +620,13 @@ async def handle_web_source(index: int, workload_combo: WorkloadItem, con: redis
         schemas=schemas,
         source_type="web"
     )
-    await con.xadd("extraction-stream", {"payload": json.dumps(task_payload.dict())})
+    return 1, task_payload
 
-    return 1
 
-
-async def handle_data_source(index: int, workload_combo: WorkloadItem, con: redis.Redis, task_id: str) -> int:
+async def handle_data_source(
+    index: int, workload_combo: WorkloadItem, con: redis.Redis, task_id: str, model_details: Dict[str, Any],
+    execution_mode: str = ExecutionMode.INTERACTIVE.value
+) -> Tuple[int, Optional[ExtractionRequestModel]]:
     logger.info(f"Processing workload {index} with data_source: {workload_combo.data_source}")
     logger.info(f"Documents location: {workload_combo.documents_location}")
     source = SourceFactory.create_source (
@@ -269,19 +640,19 @@ async def handle_data_source(index: int, workload_combo: WorkloadItem, con: redi
     logger.info(f"List of all files: {all_files}")
     if not all_files:
         logger.warning(f"No files found in data source: {workload_combo.data_source}")
-        return 0
+        return 0, None
 
-    relevant_file = await get_relevant_file_via_llm(all_files, workload_combo.file_name)
+    relevant_file = await get_relevant_file_via_llm(all_files, workload_combo.file_name, model_details)
     if not relevant_file:
         logger.warning(f"LLM did not return a valid file for workload {index}")
-        return 0
+        return 0, None
 
     logger.info(f"Selected relevant file: {relevant_file}")
 
     file_stream = source.read({"file_key": relevant_file})
     if not file_stream:
         logger.warning(f"Failed to read the selected file: {relevant_file}")
-        return 0
+        return 0, None
 
     compressed_data = base64.b64encode(zlib.compress(file_stream.getvalue())).decode('utf-8')
 
@@ -289,7 +660,7 @@ async def handle_data_source(index: int, workload_combo: WorkloadItem, con: redi
         decompressed_pdf = zlib.decompress(base64.b64decode(compressed_data))
     except zlib.error as e:
         logger.error(f"Decompression failed for workload {index}: {e}")
-        return 0
+        return 0, None
 
     pdf_cursor = BytesIO(decompressed_pdf)
     logger.info(f"Decompressed PDF for workload {index}")
@@ -299,23 +670,23 @@ async def handle_data_source(index: int, workload_combo: WorkloadItem, con: redi
         logger.debug(f"Page count for workload {index}: {page_count}")
     except Exception as e:
         logger.error(f"Error getting page count for workload {index}: {e}")
-        return 0
+        return 0, None
 
-    pdf_key = f"pdf:{task_id}:{index}"
-    await con.set(pdf_key, base64.b64encode(decompressed_pdf).decode())
-    logger.info(f"PDF stored in Redis with key: {pdf_key} as base64 string")
+    document_hash = get_document_hash(decompressed_pdf)
+    blob_key = await store_blob(con, document_hash, base64.b64encode(decompressed_pdf).decode())
+    logger.info(f"PDF stored in Redis with key: {blob_key} as base64 string")
 
     schemas = [json.loads(schema) for schema in workload_combo.schemas]
 
     task_payload = ExtractionRequestModel(
         task_id=task_id,
-        pdf_key=pdf_key,
-        schemas=schemas
+        pdf_key=f"pdf:{task_id}:{index}",
+        schemas=schemas,
+        execution_mode=execution_mode,
+        document_hash=document_hash
     )
 
-    await con.xadd("extraction-stream", {"payload": json.dumps(task_payload.dict())})
-
-    return page_count
+    return page_count, task_payload
 
 def preprocess_messages(raw_payload):
     messages = []
@@ -331,26 +702,17 @@ def preprocess_messages(raw_payload):
         logger.warning(f"Unexpected raw_payload format: {type(raw_payload)}")
     return messages
 
-async def get_relevant_file_via_llm(filenames: List[str], file_name: str) -> Optional[str]:
+async def get_relevant_file_via_llm(filenames: List[str], file_name: str, model_details: Dict[str, Any]) -> Optional[str]:
     if not filenames:
         logger.error("No filenames provided to determine relevance.")
         return None
 
     try:
-        con = await redis.from_url("redis://redis:6379/0", encoding="utf-8", decode_responses=True)
-        customer_input_str = await con.get("model-details")
-        logger.info(f"Model details JSON: {customer_input_str}")
-        if not customer_input_str:
-            logger.error("Model details not found in Redis.")
-            return None
-
-        customer_input = json.loads(customer_input_str)
-
-        model_instance = ModelFactory.create_model(
-            model_type=customer_input["provider_type"],
-            model_name=customer_input["provider_model_name"],
-            api_key=customer_input["api_key"],
-            additional_params=customer_input["additional_params"]
+        model_instance = ModelFactory.get_model(
+            model_type=model_details["provider_type"],
+            model_name=model_details["provider_model_name"],
+            api_key=model_details["api_key"],
+            additional_params=model_details["additional_params"]
         )
 
         prompt = langsmith_client.pull_prompt("marly/get-relevant-file")
@@ -366,7 +728,8 @@ async def get_relevant_file_via_llm(filenames: List[str], file_name: str) -> Opt
             logger.error("No messages to process for determining relevant file.")
             return None
 
-        relevant_file = model_instance.do_completion(processed_messages)
+        loop = asyncio.get_running_loop()
+        relevant_file = await loop.run_in_executor(None, in_current_context(model_instance.do_completion, processed_messages))
 
         if relevant_file in filenames:
             return relevant_file
@@ -378,63 +741,204 @@ async def get_relevant_file_via_llm(filenames: List[str], file_name: str) -> Opt
         logger.exception("An error occurred while determining the relevant file via LLM.")
         return None
 
-async def get_results_from_stream(con: redis.Redis, task_id: str) -> List[Dict]:
-    entries = await con.xrange(f"job-status:{task_id}")
-    results = []
-    for _, entry in entries:
-        if b'result' in entry:
-            result = json.loads(entry[b'result'])
-            if 'results' in result:
-                results.extend(result['results'])
-    return results
-
-async def get_pipeline_results(task_id: str):
+def format_run_time(seconds: int) -> str:
+    return f"{seconds // 60} minutes" if seconds >= 60 else f"{seconds} seconds"
+
+async def get_pipeline_results(task_id: str, cursor: Optional[str] = None):
+    """Status of a job plus what happened since ``cursor``, the last ``job-status`` entry ID a client saw.
+
+    Without a cursor every entry is read. Per-workload results come from the
+    entries after the cursor; the merged result is read from its own key
+    once the completion entry is among them. The returned ``cursor`` is the
+    ID to pass on the next call.
+    """
     try:
-        con = await redis.from_url("redis://redis:6379/0", encoding="utf-8", decode_responses=True)
+        con = await redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
     except Exception as e:
         logger.error(f"Failed to connect to Redis: {e}")
         return {"error": "Failed to connect to Redis"}, 500
 
+    status_key = f"job-status:{task_id}"
     try:
-        status_stream = await con.xrange(f"job-status:{task_id}")
+        latest_entries = await con.xrevrange(status_key, count=1)
+        new_entries = await con.xrange(status_key, min=f"({cursor}" if cursor else "-")
+    except redis.ResponseError as e:
+        logger.error(f"Invalid cursor {cursor} for task {task_id}: {e}")
+        return {"error": "Invalid cursor"}, 400
     except Exception as e:
         logger.error(f"Failed to fetch job status: {e}")
         return {"error": "Failed to fetch job status"}, 500
 
-    if not status_stream:
+    if not latest_entries:
         return {"error": "Task not found"}, 404
 
-    latest_status = JobStatus.PENDING
-    total_run_time = 'N/A'
-    all_results = []
-
-    for _, entry in status_stream:
-        try:
-            entry_status = JobStatus(json.loads(entry['status']))
-            latest_status = entry_status
-        except (json.JSONDecodeError, ValueError):
-            logger.error(f"Invalid status value: {entry['status']}")
+    latest_id, latest_entry = latest_entries[0]
+    try:
+        latest_status = JobStatus(json.loads(latest_entry['status']))
+    except (json.JSONDecodeError, ValueError):
+        logger.error(f"Invalid status value: {latest_entry['status']}")
+        latest_status = JobStatus.PENDING
 
-        if 'total_run_time' in entry:
-            total_run_time = entry['total_run_time']
+    total_run_time = 'N/A'
+    start_time = await con.get(f"job-start-time:{task_id}")
+    if start_time:
+        total_run_time = format_run_time(max(0, int(latest_id.split("-")[0]) // 1000 - int(start_time)))
 
-        if 'result' in entry:
-            try:
-                result_data = json.loads(entry['result'])
-                all_results.append(result_data)
-            except json.JSONDecodeError:
-                logger.error(f"Failed to parse result JSON: {entry['result']}")
+    all_results = []
+    workload_results = []
+    error_message = None
+    for _, entry in new_entries:
+        if 'workload_result' in entry:
+            workload_results.append(json.loads(entry['workload_result']))
+        if 'error_message' in entry:
+            error_message = entry['error_message']
+        if entry.get('status') == json.dumps(JobStatus.COMPLETED.value):
+            job_result = await load_job_result(con, task_id)
+            if job_result:
+                all_results.append(job_result)
 
     response = PipelineResult(
         task_id=task_id,
         status=latest_status,
         results=all_results,
-        total_run_time=total_run_time
+        total_run_time=total_run_time,
+        cursor=new_entries[-1][0] if new_entries else cursor,
+        workload_results=workload_results,
+        error_message=error_message
     )
 
     return response.dict()
 
+async def get_pipeline_timeline(task_id: str):
+    try:
+        con = await redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+        latest_entries = await con.xrevrange(f"job-status:{task_id}", count=1)
+        events = await read_timeline(con, task_id)
+    except Exception as e:
+        logger.error(f"Failed to fetch job timeline: {e}")
+        return {"error": "Failed to fetch job timeline"}, 500
+
+    if not latest_entries:
+        return {"error": "Task not found"}, 404
 
+    _, latest_entry = latest_entries[0]
+    try:
+        latest_status = JobStatus(json.loads(latest_entry['status']))
+    except (json.JSONDecodeError, ValueError):
+        logger.error(f"Invalid status value: {latest_entry['status']}")
+        latest_status = JobStatus.PENDING
 
+    response = PipelineTimeline(
+        task_id=task_id,
+        status=latest_status,
+        start_ms=min((event["start_ms"] for event in events), default=None),
+        end_ms=max((event["end_ms"] for event in events), default=None),
+        stages=summarize_timeline(events),
+        events=events
+    )
 
+    return response.dict()
 
+async def pipeline_exists(task_id: str) -> bool:
+    con = await redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+    return bool(await con.exists(f"job-status:{task_id}"))
+
+def format_server_sent_event(event: str, data: Dict, event_id: Optional[str] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+def format_event_id(status_id: str, timeline_id: str) -> str:
+    """Event IDs carry the position in both streams, so a reconnecting client resumes each where it left off."""
+    return f"{status_id}/{timeline_id}"
+
+def parse_event_id(event_id: Optional[str]) -> Tuple[str, str]:
+    """Stream positions of a ``Last-Event-ID``; the start of both streams when it is missing or malformed."""
+    positions = (event_id or "").split("/")
+    if len(positions) == 2 and all(STREAM_ID_PATTERN.fullmatch(position) for position in positions):
+        return positions[0], positions[1]
+    if event_id:
+        logger.warning(f"Ignoring malformed Last-Event-ID: {event_id}")
+    return "0-0", "0-0"
+
+def stream_id_order(stream_id: str) -> Tuple[int, int]:
+    milliseconds, sequence = stream_id.split("-")
+    return int(milliseconds), int(sequence)
+
+async def pipeline_events_delivered(task_id: str, last_event_id: Optional[str]) -> bool:
+    """Whether a client that saw ``last_event_id`` already has every event of a finished job."""
+    status_id, _ = parse_event_id(last_event_id)
+    con = await redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+    try:
+        latest_entries = await con.xrevrange(f"job-status:{task_id}", count=1)
+    finally:
+        await con.aclose()
+    if not latest_entries:
+        return False
+    latest_id, latest_entry = latest_entries[0]
+    finished = latest_entry.get("status") in (json.dumps(JobStatus.COMPLETED.value), json.dumps(JobStatus.FAILED.value))
+    return finished and stream_id_order(status_id) >= stream_id_order(latest_id)
+
+async def stream_pipeline_events(task_id: str, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+    """Server-sent events for a job, from its first status entry until it completes or fails.
+
+    Tails ``job-status:{task_id}`` and ``job-timeline:{task_id}`` with one
+    blocking XREAD. Status entries become ``status`` events, followed by a
+    ``workload_result`` event when a workload finished and a ``result`` event
+    with the merged results on completion; workload-level timeline events
+    become ``stage`` events. A comment is sent whenever nothing happened for
+    ``EVENT_STREAM_BLOCK_MS`` so that proxies keep the connection open.
+
+    The last event of each entry carries the position in both streams as
+    its ID; given one as ``last_event_id``, the stream resumes after it.
+    """
+    status_key = f"job-status:{task_id}"
+    timeline_key = get_job_timeline_key(task_id)
+    con = redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+    status_id, timeline_id = parse_event_id(last_event_id)
+    last_ids = {status_key: status_id, timeline_key: timeline_id}
+    try:
+        while True:
+            entries = await con.xread(last_ids, block=EVENT_STREAM_BLOCK_MS)
+            if not entries:
+                yield ": keep-alive\n\n"
+                continue
+
+            finished = False
+            for stream_name, messages in entries:
+                for message_id, entry in messages:
+                    last_ids[stream_name] = message_id
+                    event_id = format_event_id(last_ids[status_key], last_ids[timeline_key])
+                    if stream_name == timeline_key:
+                        if entry.get("stage") in PROGRESS_STAGES:
+                            yield format_server_sent_event("stage", parse_timeline_event(message_id, entry), event_id)
+                        continue
+
+                    try:
+                        job_status = JobStatus(json.loads(entry["status"]))
+                    except (KeyError, json.JSONDecodeError, ValueError):
+                        logger.error(f"Invalid status entry for task {task_id}: {entry}")
+                        continue
+                    status_data = {"task_id": task_id, "status": job_status.value}
+                    if "total_run_time" in entry:
+                        status_data["total_run_time"] = entry["total_run_time"]
+                    if "error_message" in entry:
+                        status_data["error_message"] = entry["error_message"]
+                    events = [("status", status_data)]
+
+                    if "workload_result" in entry:
+                        events.append(("workload_result", json.loads(entry["workload_result"])))
+                    if job_status == JobStatus.COMPLETED:
+                        job_result = await load_job_result(con, task_id)
+                        if job_result:
+                            events.append(("result", job_result))
+                    # Only the entry's last event moves the client's position, so a
+                    # reconnect in between repeats the entry rather than losing part of it.
+                    for index, (event, data) in enumerate(events):
+                        yield format_server_sent_event(event, data, event_id if index == len(events) - 1 else None)
+                    finished = finished or job_status in (JobStatus.COMPLETED, JobStatus.FAILED)
+
+            if finished:
+                return
+    finally:
+        await con.aclose()
@@ -7,6 +7,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from application.pipeline.routes.pipeline_routes import api_router as pipeline_api_router
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import uvicorn
 
 app = FastAPI(
@@ -28,5 +30,9 @@ app.add_middleware(
 
 app.include_router(pipeline_api_router, prefix="", tags=["Pipeline Execution"])
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8100)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 from enum import Enum
 
 class TransformationRequestModel(BaseModel):
@@ -8,6 +8,9 @@ class TransformationRequestModel(BaseModel):
     results: List['SchemaResult']
     source_type: str = "pdf"
     destination: str = None
+    execution_mode: str = "interactive"
+    document_hash: Optional[str] = None
+    batch_group: Optional[str] = None
 
 class TransformationOnlyRequestModel(BaseModel):
     task_id: str
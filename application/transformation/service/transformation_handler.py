@@ -1,15 +1,20 @@
 import asyncio
 import logging
-from typing import Dict, List
+from typing import Any, Dict, List, Optional
 from redis.asyncio import Redis
 from common.redis.redis_config import get_redis_connection
+from common.redis.model_details import load_model_details
 from common.models.model_factory import ModelFactory
-from application.transformation.models.models import ModelDetails
+from application.transformation.models.models import ModelDetails, TransformationRequestModel
+from common.models.batch_client import BatchRequest
 from langsmith import Client as LangSmithClient
 from common.prompts.prompt_enums import PromptType
 from langchain.schema import SystemMessage, HumanMessage
 from common.destinations.destination_factory import DestinationFactory
 from common.destinations.enums.destination_enums import DestinationType
+from common.metrics.pipeline_metrics import Stage, stage_timer
+from common.metrics.llm_usage import in_current_context
+from common.redis.job_timeline import timeline_span
 import json
 
 logging.basicConfig(level=logging.INFO)
@@ -31,30 +36,29 @@ def preprocess_messages(raw_payload):
         logger.warning(f"Unexpected raw_payload format: {type(raw_payload)}")
     return messages
 
-async def get_latest_model_details(redis: Redis) -> ModelDetails:
+async def get_model_details(redis: Redis, task_id: str) -> Optional[ModelDetails]:
     try:
-        model_details_json = await redis.get("model-details")
-        if not model_details_json:
-            logger.error("No data found for model-details")
+        model_details = await load_model_details(redis, task_id)
+        if not model_details:
+            logger.error(f"No model details found for task {task_id}")
             return None
 
-        model_details = ModelDetails(**json.loads(model_details_json))
-        return model_details
+        return ModelDetails(**model_details)
 
     except Exception as e:
         logger.error(f"Failed to get or parse model details: {e}")
         return None
 
-async def run_transformation(metrics: Dict[str, str], schema: Dict[str, str], source_type: str) -> Dict[str, str]:
-    logger.info("Starting transformation process")
+async def run_transformation(task_id: str, metrics: Dict[str, str], schema: Dict[str, str], source_type: str) -> Dict[str, str]:
+    logger.info(f"Starting transformation process for task_id: {task_id}")
 
     redis: Redis = await get_redis_connection()
-    model_details = await get_latest_model_details(redis)
+    model_details = await get_model_details(redis, task_id)
     if not model_details:
         return {}
 
     try:
-        model_instance = ModelFactory.create_model(
+        model_instance = ModelFactory.get_model(
             model_type=model_details.provider_type,
             model_name=model_details.provider_model_name,
             api_key=model_details.api_key,
@@ -79,43 +83,127 @@ async def run_transformation(metrics: Dict[str, str], schema: Dict[str, str], so
 
     return transformed_metrics
 
+def get_transformation_prompt(markdown_mode: bool, source_type: str):
+    if source_type == 'web':
+        return langsmith_client.pull_prompt(PromptType.TRANSFORMATION_WEB.value)
+    elif markdown_mode:
+        return langsmith_client.pull_prompt(PromptType.TRANSFORMATION_MARKDOWN.value)
+    else:
+        return langsmith_client.pull_prompt(PromptType.TRANSFORMATION.value)
+
+def get_transformation_params(markdown_mode: bool) -> Dict[str, Any]:
+    return {} if markdown_mode else {"response_format": {"type": "json_object"}}
+
+def build_transformation_messages(prompt, metric_value: str, schema_keys: str) -> List[Dict[str, str]]:
+    messages = prompt.invoke({
+        "first_value": metric_value,
+        "second_value": schema_keys
+    })
+    return preprocess_messages(messages)
+
 async def process_schema(client, schema_id: str, metric_value: str, schema_keys: str, markdown_mode: bool, source_type: str) -> str:
     try:
-        if source_type == 'web':
-            prompt = langsmith_client.pull_prompt(PromptType.TRANSFORMATION_WEB.value)
-        elif markdown_mode:
-            prompt = langsmith_client.pull_prompt(PromptType.TRANSFORMATION_MARKDOWN.value)
-        else:
-            prompt = langsmith_client.pull_prompt(PromptType.TRANSFORMATION.value)
-        
-        messages = prompt.invoke({
-            "first_value": metric_value,
-            "second_value": schema_keys
-        })
-        processed_messages = preprocess_messages(messages)
+        prompt = get_transformation_prompt(markdown_mode, source_type)
+        processed_messages = build_transformation_messages(prompt, metric_value, schema_keys)
         if not processed_messages:
             logger.error("No messages to process for transformation")
             return ""
-        if markdown_mode:
-            transformed_metric = client.do_completion(processed_messages)
-        else:
-            transformed_metric = client.do_completion(processed_messages, response_format={"type": "json_object"})
+        loop = asyncio.get_running_loop()
+        with stage_timer(Stage.TRANSFORMATION, client), timeline_span(Stage.TRANSFORMATION, schema=schema_id):
+            transformed_metric = await loop.run_in_executor(
+                None, in_current_context(client.do_completion, processed_messages, **get_transformation_params(markdown_mode))
+            )
         return transformed_metric
     except Exception as e:
         logger.error(f"Error transforming metric for schema {schema_id}: {e}")
         return ""
 
+async def run_batch_transformation(requests: List[TransformationRequestModel]) -> List[List[Dict[str, str]]]:
+    """Transform a batch group's collected workloads with one provider batch run.
+
+    Returns, for each request, the transformed metrics of each of its schema
+    results in order. Metrics the batch could not answer are transformed
+    interactively.
+    """
+    logger.info(f"Starting batch transformation of {len(requests)} workloads")
+
+    redis: Redis = await get_redis_connection()
+    model_details = await get_model_details(redis, requests[0].task_id)
+    if not model_details:
+        return [[{} for _ in request.results] for request in requests]
+
+    model_instance = ModelFactory.get_model(
+        model_type=model_details.provider_type,
+        model_name=model_details.provider_model_name,
+        api_key=model_details.api_key,
+        additional_params=model_details.additional_params
+    )
+    batch_client = ModelFactory.get_batch_client(
+        model_type=model_details.provider_type,
+        model_name=model_details.provider_model_name,
+        api_key=model_details.api_key,
+        additional_params=model_details.additional_params
+    )
+    markdown_mode = model_details.markdown_mode
+    params = get_transformation_params(markdown_mode)
+
+    prompts = {}
+    batch_requests = []
+    for request_index, request in enumerate(requests):
+        if request.source_type not in prompts:
+            prompts[request.source_type] = get_transformation_prompt(markdown_mode, request.source_type)
+        for result_index, schema_result in enumerate(request.results):
+            schema_keys = ",".join(schema_result.schema_data.keys())
+            for schema_id, metric_value in schema_result.metrics.items():
+                processed_messages = build_transformation_messages(prompts[request.source_type], metric_value, schema_keys)
+                if not processed_messages:
+                    logger.error(f"No messages to process for transformation of {schema_id}")
+                    continue
+                batch_requests.append(BatchRequest(
+                    custom_id=f"{request_index}:{result_index}:{schema_id}",
+                    messages=processed_messages,
+                    params=params
+                ))
+
+    loop = asyncio.get_running_loop()
+    with timeline_span(Stage.TRANSFORMATION, metrics=len(batch_requests), mode="batch"):
+        responses = await loop.run_in_executor(None, in_current_context(batch_client.run, batch_requests))
+
+    missing = [batch_request for batch_request in batch_requests if batch_request.custom_id not in responses]
+    if missing:
+        logger.warning(f"Batch returned no result for {len(missing)} transformations, retrying them interactively")
+        retried = await asyncio.gather(*[
+            loop.run_in_executor(None, in_current_context(model_instance.do_completion, batch_request.messages, **batch_request.params))
+            for batch_request in missing
+        ], return_exceptions=True)
+        for batch_request, response in zip(missing, retried):
+            if isinstance(response, str):
+                responses[batch_request.custom_id] = response
+            else:
+                logger.error(f"Error transforming metric {batch_request.custom_id}: {response}")
+
+    transformed = [[{} for _ in request.results] for request in requests]
+    for batch_request in batch_requests:
+        response = responses.get(batch_request.custom_id)
+        if response is None:
+            continue
+        request_index, result_index, schema_id = batch_request.custom_id.split(":", 2)
+        transformed[int(request_index)][int(result_index)][schema_id] = response
+
+    logger.info(f"Batch transformed {len(responses)} of {len(batch_requests)} metrics")
+    return transformed
+
 async def run_transformation_only(task_id: str, data_location_key: str, schemas: List[str], destination: str, raw_data: str) -> Dict[str, str]:
     # eventually we will want to do destination writes here
     logger.info(f"Starting transformation-only process for task_id: {task_id}")
 
     redis: Redis = await get_redis_connection()
-    model_details = await get_latest_model_details(redis)
+    model_details = await get_model_details(redis, task_id)
     if not model_details:
         return {}
 
     try:
-        model_instance = ModelFactory.create_model(
+        model_instance = ModelFactory.get_model(
             model_type=model_details.provider_type,
             model_name=model_details.provider_model_name,
             api_key=model_details.api_key,
@@ -131,14 +219,16 @@ async def run_transformation_only(task_id: str, data_location_key: str, schemas:
         "db_path": destination,  
         "additional_params": {} 
     }
-    destination_instance = DestinationFactory.create_destination(DestinationType.SQLITE.value, destination_config)
-    
-    try:
-        database_schema = destination_instance.get_table_structure(data_location_key)
-    except AttributeError:
-        logger.error("The destination does not support get_table_structure method")
-        database_schema = {}
+    with stage_timer(Stage.DESTINATION_WRITE, model_instance), timeline_span(Stage.DESTINATION_WRITE):
+        destination_instance = DestinationFactory.create_destination(DestinationType.SQLITE.value, destination_config)
 
+        try:
+            database_schema = destination_instance.get_table_structure(data_location_key)
+        except AttributeError:
+            logger.error("The destination does not support get_table_structure method")
+            database_schema = {}
+
+    loop = asyncio.get_running_loop()
     transformed_metrics = {}
     for schema in schemas:
         try:
@@ -153,11 +243,12 @@ async def run_transformation_only(task_id: str, data_location_key: str, schemas:
             if not processed_messages:
                 logger.error(f"No messages to process for transformation of schema: {schema}")
                 continue
-            if markdown_mode:
-                result = model_instance.do_completion(processed_messages)
-            else:
+            if not markdown_mode:
                 logger.info(f"Transforming schema: {schema} with JSON response format")
-                result = model_instance.do_completion(processed_messages, response_format={"type": "json_object"})
+            with stage_timer(Stage.TRANSFORMATION, model_instance), timeline_span(Stage.TRANSFORMATION, schema=schema):
+                result = await loop.run_in_executor(
+                    None, in_current_context(model_instance.do_completion, processed_messages, **get_transformation_params(markdown_mode))
+                )
             transformed_metrics[schema] = result
         except Exception as e:
             logger.error(f"Error transforming metric for schema {schema}: {e}")
@@ -1,7 +1,7 @@
 import asyncio
 import json
 import logging
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, List, Union
 from redis.asyncio import Redis
 from redis.exceptions import RedisError
 from datetime import datetime
@@ -12,8 +12,18 @@ from application.transformation.models.models import (
     JobStatus,
     TransformationOnlyRequestModel
 )
-from application.transformation.service.transformation_handler import run_transformation, run_transformation_only
+from application.transformation.service.transformation_handler import (
+    get_model_details,
+    run_transformation,
+    run_transformation_only,
+    run_batch_transformation
+)
 from common.redis.redis_config import get_redis_connection
+from common.redis.batch_collector import BatchCollector
+from common.metrics.pipeline_metrics import record_stream_lag
+from common.redis.job_timeline import JobTimeline, now_ms, record_span, use_timeline, workload_index
+from common.redis.job_results import add_workload_result, pop_workload_results, store_job_result
+from common.cache.result_cache import cache_results, serialize_result
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,7 +34,8 @@ async def run_transformations() -> None:
     last_id_transformation = "0-0"
     last_id_transformation_only = "0-0"
     
-    task_workloads = {}
+    batch_collector = BatchCollector("transformation")
+    batch_tasks = set()
 
     while True:
         try:
@@ -34,10 +45,10 @@ async def run_transformations() -> None:
                     "transformation-only-stream": last_id_transformation_only
                 },
                 count=1,
-                block=0
+                block=batch_collector.block_ms
             )
             
-            for stream_name, messages in result:
+            for stream_name, messages in result or []:
                 for message_id, message in messages:
                     logger.info(f"Received message from stream {stream_name}: ID {message_id}")
                     payload = message.get(b"payload")
@@ -49,45 +60,155 @@ async def run_transformations() -> None:
                                 request = TransformationRequestModel(**payload_dict)
                             else:
                                 request = TransformationOnlyRequestModel(**payload_dict)
+                            await record_message_lag(redis, stream_name, message_id, request.task_id)
                             
-                            if request.task_id not in task_workloads:
-                                total_workloads = await get_total_workloads(redis, request.task_id)
-                                task_workloads[request.task_id] = {
-                                    'total': total_workloads,
-                                    'completed': 0
-                                }
-                            
-                            existing_results = await get_existing_results(redis, request.task_id)
-                            transformation_result = await process_transformation(request)
-                            merged_results = merge_results(existing_results, transformation_result)
-                            
-                            serialized_result = json.dumps(merged_results.dict())
-                            await redis.xadd(f"results-stream:{request.task_id}", {"payload": serialized_result})
-                            
-                            task_workloads[request.task_id]['completed'] += 1
-                            
-                            if task_workloads[request.task_id]['completed'] == task_workloads[request.task_id]['total']:
-                                logger.info(f"All workloads completed for task {request.task_id}")
-                                await update_job_status(redis, request.task_id, JobStatus.COMPLETED, serialized_result)
-                                del task_workloads[request.task_id]  # Cleanup
+                            if isinstance(request, TransformationRequestModel) and request.execution_mode == "batch":
+                                await batch_collector.add(redis, request.batch_group or request.task_id, payload.decode('utf-8'))
                             else:
-                                await update_job_status(redis, request.task_id, JobStatus.IN_PROGRESS, None)
+                                transformation_result = await run_traced_transformation(redis, request)
+                                if isinstance(request, TransformationRequestModel):
+                                    await cache_transformation_results(redis, request, transformation_result)
+                                await record_transformation_result(redis, request.task_id, transformation_result)
                             
                         except Exception as e:
                             logger.error(f"Error processing transformation task: {e}")
                             await update_job_status(redis, request.task_id, JobStatus.FAILED, str(e))
-                            if request.task_id in task_workloads:
-                                del task_workloads[request.task_id]
                     
                     if stream_name == b"transformation-stream":
                         last_id_transformation = message_id
                     elif stream_name == b"transformation-only-stream":
                         last_id_transformation_only = message_id
 
+            for batch_group, payloads in await batch_collector.pop_ready(redis):
+                logger.info(f"Collected {len(payloads)} batch workloads for batch group {batch_group}")
+                requests = [TransformationRequestModel(**json.loads(payload)) for payload in payloads]
+                task = asyncio.create_task(process_batch_transformations(requests))
+                batch_tasks.add(task)
+                task.add_done_callback(batch_tasks.discard)
+
         except RedisError as e:
             logger.error(f"Error reading from Redis stream: {e}")
             await asyncio.sleep(1)
 
+async def record_message_lag(redis: Redis, stream_name: bytes, message_id: bytes, task_id: str) -> None:
+    model_details = await get_model_details(redis, task_id)
+    record_stream_lag(
+        stream_name, message_id,
+        model_details.provider_type if model_details else None,
+        model_details.provider_model_name if model_details else None
+    )
+
+async def run_traced_transformation(
+    redis: Redis,
+    transformation_request: Union[TransformationRequestModel, TransformationOnlyRequestModel]
+) -> TransformationResponseModel:
+    """Run ``process_transformation`` with the workload recorded on the job's timeline."""
+    timeline = JobTimeline(transformation_request.task_id, "transformation")
+    document_key = (
+        transformation_request.data_location_key
+        if isinstance(transformation_request, TransformationOnlyRequestModel)
+        else transformation_request.pdf_key
+    )
+    try:
+        with use_timeline(timeline), timeline.span(
+            "transformation_workload", workload_index(document_key), document=document_key
+        ):
+            return await process_transformation(transformation_request)
+    finally:
+        await timeline.flush(redis)
+
+async def cache_transformation_results(
+    redis: Redis,
+    transformation_request: TransformationRequestModel,
+    transformation_result: TransformationResponseModel
+) -> None:
+    """Keep a document's final results so jobs with the same document, schema and model complete on submission."""
+    if not transformation_request.document_hash:
+        return
+    model_details = await get_model_details(redis, transformation_request.task_id)
+    if model_details:
+        await cache_results(
+            redis, transformation_request.document_hash,
+            [schema_result.schema_data for schema_result in transformation_result.results],
+            [
+                serialize_result(extracted.metrics, transformed.metrics)
+                for extracted, transformed in zip(transformation_request.results, transformation_result.results)
+            ],
+            model_details.provider_type, model_details.provider_model_name, model_details.markdown_mode
+        )
+
+async def record_transformation_result(
+    redis: Redis,
+    task_id: str,
+    transformation_result: TransformationResponseModel
+) -> None:
+    """Store a workload's result and complete the job after its last workload.
+
+    Workload results are only merged once, when the last one arrives.
+    """
+    workload_result = json.dumps(transformation_result.dict())
+    added, completed_workloads = await add_workload_result(redis, task_id, transformation_result.pdf_key, workload_result)
+    if not added:
+        logger.warning(f"Ignoring repeated result for workload {transformation_result.pdf_key} of task {task_id}")
+        return
+
+    if completed_workloads >= await get_total_workloads(redis, task_id):
+        logger.info(f"All workloads completed for task {task_id}")
+        merged_result = TransformationResponseModel(
+            task_id=task_id,
+            pdf_key=transformation_result.pdf_key,
+            results=[
+                schema_result
+                for workload in await pop_workload_results(redis, task_id)
+                for schema_result in workload["results"]
+            ]
+        )
+        await store_job_result(redis, task_id, json.dumps(merged_result.dict()))
+        await update_job_status(redis, task_id, JobStatus.COMPLETED, None, workload_result)
+    else:
+        await update_job_status(redis, task_id, JobStatus.IN_PROGRESS, None, workload_result)
+
+async def process_batch_transformations(transformation_requests: List[TransformationRequestModel]) -> None:
+    """Transform a batch group's collected workloads together and record each workload's result.
+
+    The group may span several jobs; the first one's timeline records the
+    batch in detail and the others get the batch's span.
+    """
+    redis = await get_redis_connection()
+    task_ids = list(dict.fromkeys(request.task_id for request in transformation_requests))
+    timeline = JobTimeline(task_ids[0], "transformation")
+    start_ms = now_ms()
+    try:
+        with use_timeline(timeline), timeline.span(
+            "batch_transformation", workloads=len(transformation_requests), jobs=len(task_ids)
+        ):
+            transformed = await run_batch_transformation(transformation_requests)
+        await record_span(redis, task_ids[1:], "transformation", "batch_transformation", start_ms, lead_task_id=task_ids[0])
+        await timeline.flush(redis)
+        for transformation_request, transformed_metrics in zip(transformation_requests, transformed):
+            transformation_result = TransformationResponseModel(
+                task_id=transformation_request.task_id,
+                pdf_key=transformation_request.pdf_key,
+                results=[
+                    SchemaResult(
+                        schema_id=schema_result.schema_id,
+                        schema_data=schema_result.schema_data,
+                        metrics=metrics
+                    )
+                    for schema_result, metrics in zip(transformation_request.results, transformed_metrics)
+                ]
+            )
+            await cache_transformation_results(redis, transformation_request, transformation_result)
+            await record_transformation_result(redis, transformation_request.task_id, transformation_result)
+    except Exception as e:
+        logger.error(f"Error processing batch transformation for tasks {task_ids}: {e}")
+        await record_span(
+            redis, task_ids[1:], "transformation", "batch_transformation", start_ms, "failed", lead_task_id=task_ids[0]
+        )
+        await timeline.flush(redis)
+        for task_id in task_ids:
+            await update_job_status(redis, task_id, JobStatus.FAILED, str(e))
+
 async def process_transformation(
     transformation_request: Union[TransformationRequestModel, TransformationOnlyRequestModel]
 ) -> TransformationResponseModel:
@@ -114,6 +235,7 @@ async def process_transformation(
         else:
             for schema_result in transformation_request.results:
                 transformed_metrics = await run_transformation(
+                    task_id=transformation_request.task_id,
                     metrics=schema_result.metrics,
                     schema=schema_result.schema_data,
                     source_type=transformation_request.source_type
@@ -143,11 +265,18 @@ async def update_job_status(
     redis: Redis,
     task_id: str,
     status: JobStatus,
-    result: Optional[str]
+    error_message: Optional[str],
+    workload_result: Optional[str] = None
 ) -> None:
+    """Append a status entry; ``workload_result`` carries the result of the workload that just finished.
+
+    The merged result of a completed job is stored separately, see ``store_job_result``.
+    """
     fields: Dict[str, Any] = {"status": json.dumps(status.value)}
-    if result:
-        fields["result"] = result
+    if error_message:
+        fields["error_message"] = error_message
+    if workload_result:
+        fields["workload_result"] = workload_result
 
     start_time_str = await redis.get(f"job-start-time:{task_id}")
     start_time = int(start_time_str) if start_time_str else 0
@@ -158,28 +287,6 @@ async def update_job_status(
 
     await redis.xadd(f"job-status:{task_id}", fields)
 
-async def get_existing_results(redis: Redis, task_id: str) -> Optional[TransformationResponseModel]:
-    try:
-        entries = await redis.xrevrange(f"results-stream:{task_id}", count=1)
-        if entries:
-            _, message = entries[0]
-            payload = message.get(b"payload")
-            if payload:
-                return TransformationResponseModel(**json.loads(payload.decode('utf-8')))
-    except Exception as e:
-        logger.error(f"Error getting existing results: {e}")
-    return None
-
-def merge_results(existing: Optional[TransformationResponseModel], new: TransformationResponseModel) -> TransformationResponseModel:
-    if not existing:
-        return new
-    
-    return TransformationResponseModel(
-        task_id=new.task_id,
-        pdf_key=new.pdf_key,
-        results=existing.results + new.results
-    )
-
 async def get_total_workloads(redis: Redis, task_id: str) -> int:
     """Get the total number of workloads for a task from Redis."""
     try:
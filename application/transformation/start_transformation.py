@@ -2,6 +2,7 @@ import os
 import logging
 from dotenv import load_dotenv
 import asyncio
+from common.metrics.pipeline_metrics import start_metrics_server
 from application.transformation.service.transformation_worker import clear_transformation_streams, run_transformations
 
 load_dotenv()
@@ -9,7 +10,11 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+TRANSFORMATION_METRICS_PORT = 9102
+
 async def main():
+    start_metrics_server(TRANSFORMATION_METRICS_PORT)
+
     try:
         await clear_transformation_streams()
     except Exception as e:
@@ -0,0 +1,188 @@
+"""Micro-benchmarks for the text extraction hot path.
+
+Covers ``get_pdf_page_count`` and per-page ``extract_page_as_markdown`` (with
+the shared reader, as ``extract_pages_as_markdown`` runs it) on the example
+PDFs and a synthetic 500-page PDF, and ``web_preprocessing`` on large
+synthetic HTML pages. No services or LLM calls are involved.
+
+    python -m benchmarks.extraction_benchmark run --output extraction-results.json
+    python -m benchmarks.extraction_benchmark compare baseline.json extraction-results.json
+
+Each case runs in a fresh process, so ``max_rss_bytes`` is that case's memory
+high-water mark and ``rss_growth_bytes`` what it added on top of the imports.
+Throughput per core is work done per CPU second of the measuring process.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from multiprocessing import get_context
+from typing import Any, Dict, Optional
+
+from benchmarks.results import REPO_ROOT, distribution, results_document, run_compare
+
+logger = logging.getLogger(__name__)
+
+EXAMPLE_FILES = os.path.join(REPO_ROOT, "examples", "example_files")
+DEFAULT_CASES = [
+    {"name": "pdf-small", "kind": "pdf", "path": os.path.join(EXAMPLE_FILES, "lacers_reduced.pdf")},
+    {"name": "pdf-medium", "kind": "pdf", "path": os.path.join(EXAMPLE_FILES, "lacers.pdf")},
+    {"name": "pdf-500p", "kind": "pdf", "synthetic_pages": 500},
+    {"name": "html-1mb", "kind": "html", "sections": 1000},
+    {"name": "html-5mb", "kind": "html", "sections": 5000},
+]
+HTML_REPEAT = 5
+
+def max_rss_bytes() -> int:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+def load_pdf(case: Dict[str, Any]) -> bytes:
+    if "path" in case:
+        with open(case["path"], "rb") as pdf_file:
+            return pdf_file.read()
+    from benchmarks.synthetic_documents import make_pdf
+    return make_pdf(case["synthetic_pages"], label=case["name"])
+
+def run_pdf_case(case: Dict[str, Any], max_pages: Optional[int]) -> Dict[str, Any]:
+    import PyPDF2
+    from common.text_extraction.text_extractor import extract_page_as_markdown, get_pdf_page_count
+
+    data = load_pdf(case)
+    rss_before = max_rss_bytes()
+
+    started = time.perf_counter()
+    total_pages = get_pdf_page_count(BytesIO(data))
+    page_count_s = time.perf_counter() - started
+
+    file_stream = BytesIO(data)
+    reader = PyPDF2.PdfReader(file_stream)
+    pages = min(total_pages, max_pages) if max_pages else total_pages
+    page_times, characters = [], 0
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    for page_number in range(pages):
+        page_started = time.perf_counter()
+        characters += len(extract_page_as_markdown(file_stream, page_number, reader))
+        page_times.append(time.perf_counter() - page_started)
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+
+    peak = max_rss_bytes()
+    return {
+        "name": case["name"],
+        "kind": "pdf",
+        "params": {
+            key: os.path.relpath(value, REPO_ROOT) if key == "path" else value
+            for key, value in case.items() if key not in ("name", "kind")
+        },
+        "size_bytes": len(data),
+        "total_pages": total_pages,
+        "pages": pages,
+        "page_count_s": page_count_s,
+        "per_page_s": distribution(page_times),
+        "pages_per_s": pages / wall if wall else None,
+        "pages_per_cpu_s": pages / cpu if cpu else None,
+        "characters": characters,
+        "max_rss_bytes": peak,
+        "rss_growth_bytes": peak - rss_before,
+    }
+
+def run_html_case(case: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    from application.extraction.service.processing_handler import web_preprocessing
+    from benchmarks.synthetic_documents import make_html
+
+    logging.getLogger("application.extraction.service.processing_handler").setLevel(logging.WARNING)
+    html = make_html(case["sections"], label=case["name"])
+    megabytes = len(html.encode("utf-8")) / 2 ** 20
+    rss_before = max_rss_bytes()
+
+    call_times, characters = [], 0
+    cpu_started = time.process_time()
+    for _ in range(repeat):
+        call_started = time.perf_counter()
+        characters = len(web_preprocessing(html))
+        call_times.append(time.perf_counter() - call_started)
+    cpu = time.process_time() - cpu_started
+
+    peak = max_rss_bytes()
+    return {
+        "name": case["name"],
+        "kind": "html",
+        "params": {key: value for key, value in case.items() if key not in ("name", "kind")},
+        "size_bytes": len(html.encode("utf-8")),
+        "repeat": repeat,
+        "per_call_s": distribution(call_times),
+        "mb_per_s": megabytes * repeat / sum(call_times) if call_times else None,
+        "mb_per_cpu_s": megabytes * repeat / cpu if cpu else None,
+        "characters": characters,
+        "max_rss_bytes": peak,
+        "rss_growth_bytes": peak - rss_before,
+    }
+
+def run_case(case: Dict[str, Any], max_pages: Optional[int], repeat: int) -> Dict[str, Any]:
+    if case["kind"] == "pdf":
+        return run_pdf_case(case, max_pages)
+    if case["kind"] == "html":
+        return run_html_case(case, repeat)
+    raise ValueError(f"Unsupported benchmark case kind: {case['kind']}")
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    cases = [case for case in DEFAULT_CASES if not args.only or case["name"] in args.only]
+    if not cases:
+        raise ValueError("No cases selected")
+    results = []
+    for case in cases:
+        logger.info(f"Running case {case['name']}")
+        # A fresh interpreter per case keeps the RSS high-water marks independent.
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            results.append(executor.submit(run_case, case, args.max_pages, args.repeat).result())
+    return results_document("extraction", results, max_pages=args.max_pages)
+
+def print_summary(results: Dict[str, Any]) -> None:
+    print(f"{'case':<14} {'p50 ms':>9} {'p95 ms':>9} {'per core':>14} {'max RSS MB':>11}")
+    for case in results["scenarios"]:
+        timings = case.get("per_page_s") or case["per_call_s"]
+        throughput = (
+            f"{case['pages_per_cpu_s'] or 0:.1f} pages/s" if case["kind"] == "pdf"
+            else f"{case['mb_per_cpu_s'] or 0:.2f} MB/s"
+        )
+        print(
+            f"{case['name']:<14} {(timings['p50'] or 0) * 1000:>9.1f} {(timings['p95'] or 0) * 1000:>9.1f} "
+            f"{throughput:>14} {case['max_rss_bytes'] / 2 ** 20:>11.1f}"
+        )
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for PDF page conversion and web preprocessing")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the extraction micro-benchmarks")
+    run_parser.add_argument("--only", nargs="+", help="Names of the cases to run")
+    run_parser.add_argument("--output", default="extraction-results.json")
+    run_parser.add_argument("--max-pages", type=int, help="Convert at most this many pages per PDF")
+    run_parser.add_argument("--repeat", type=int, default=HTML_REPEAT, help="web_preprocessing calls per HTML case")
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files and flag regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="Relative change that counts as a regression")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_benchmarks(args)
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+        print_summary(results)
+        print(f"Results written to {args.output}")
+        return
+
+    run_compare(args.baseline, args.current, args.threshold)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+"""End-to-end throughput benchmark for the pipeline, extraction and transformation services.
+
+Boots the three services against a local Redis and the mock provider in
+tools/mock_provider, submits the workloads described in a scenarios file and
+writes one JSON document with, per scenario: jobs/min, p50/p95/p99 job
+latency, LLM calls per page, peak Redis memory and CPU seconds per stage.
+
+    python -m benchmarks.pipeline_benchmark run --output benchmark-results.json
+    python -m benchmarks.pipeline_benchmark compare baseline.json benchmark-results.json
+
+A ``redis-server`` binary must be on PATH unless ``--redis-url`` points at a
+running instance; the database is only flushed between scenarios when the
+benchmark started Redis itself. Per-stage CPU is read from /proc and is
+reported as null on other platforms. ``compare`` exits non-zero when any
+metric of any scenario is worse than the baseline by more than the threshold.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+import redis.asyncio as redis
+from aiohttp import web
+
+from benchmarks.results import REPO_ROOT, distribution, results_document, run_compare
+from benchmarks.synthetic_documents import make_html, make_pdf
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCENARIOS_PATH = os.path.join(REPO_ROOT, "benchmarks", "scenarios.json")
+DEFAULT_MOCK_CONFIG_PATH = os.path.join(REPO_ROOT, "tools", "mock_provider", "mock_config.json")
+LOCAL_FS_FILE_NAME = "benchmark.pdf"
+POLL_INTERVAL = 0.5
+MEMORY_SAMPLE_INTERVAL = 0.25
+FINAL_STATUSES = {"COMPLETED", "FAILED"}
+SCENARIO_DEFAULTS = {
+    "source": "raw_data",
+    "pages": 10,
+    "schemas": 1,
+    "documents": 1,
+    "jobs": 4,
+    "concurrency": None,
+    "execution_mode": "interactive",
+    "markdown_mode": False,
+    "html_sections": 20,
+    "timeout": 900,
+}
+SCHEMA_FIELDS = {
+    "Firm": "The name of the firm",
+    "Number of Funds": "The number of funds managed by the firm",
+    "Commitment": "The commitment amount in millions of dollars",
+    "Exposure (FMV + Unfunded)": "The exposure including fair market value and unfunded commitments in millions of dollars",
+    "TVPI": "Total Value to Paid-In multiple",
+    "Net IRR": "Net Internal Rate of Return as a percentage",
+}
+def process_tree_cpu_seconds(pid: int) -> Optional[float]:
+    """User plus system CPU of a process, its live descendants and its reaped children."""
+    if not os.path.isdir("/proc"):
+        return None
+    ticks = os.sysconf("SC_CLK_TCK")
+    stats = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat_file:
+                # The command name may contain spaces; the fields after it are fixed.
+                fields = stat_file.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        stats[int(entry)] = fields
+    if pid not in stats:
+        return None
+    children: Dict[int, List[int]] = {}
+    for child_pid, fields in stats.items():
+        children.setdefault(int(fields[1]), []).append(child_pid)
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        fields = stats[current]
+        total += int(fields[11]) + int(fields[12])
+        if current == pid:
+            total += int(fields[13]) + int(fields[14])
+        pending.extend(children.get(current, []))
+    return total / ticks
+
+class ServiceProcess:
+    def __init__(self, name: str, command: List[str], env: Dict[str, str], log_dir: str):
+        self.name = name
+        self.log_path = os.path.join(log_dir, f"{name}.log")
+        self.log_file = open(self.log_path, "w")
+        self.process = subprocess.Popen(
+            command, cwd=REPO_ROOT, env=env, stdout=self.log_file, stderr=subprocess.STDOUT
+        )
+
+    def check_running(self) -> None:
+        if self.process.poll() is not None:
+            raise RuntimeError(f"{self.name} exited with code {self.process.returncode}, see {self.log_path}")
+
+    def cpu_seconds(self) -> Optional[float]:
+        return process_tree_cpu_seconds(self.process.pid)
+
+    def stop(self) -> None:
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.log_file.close()
+
+class BenchmarkStack:
+    """Redis, the mock provider and the three services, started as local processes."""
+    STAGES = ("pipeline", "extraction", "transformation")
+
+    def __init__(self, args: argparse.Namespace, work_dir: str):
+        self.args = args
+        self.work_dir = work_dir
+        self.processes: Dict[str, ServiceProcess] = {}
+        self.owns_redis = args.redis_url is None
+        self.redis_url = args.redis_url or f"redis://127.0.0.1:{args.redis_port}/0"
+        self.pipeline_url = f"http://127.0.0.1:{args.pipeline_port}"
+        self.mock_url = f"http://127.0.0.1:{args.mock_port}"
+        self.web_url = f"http://127.0.0.1:{args.web_port}"
+
+    def service_env(self) -> Dict[str, str]:
+        redis_location = urlparse(self.redis_url)
+        env = dict(os.environ)
+        env.update({
+            "PYTHONPATH": REPO_ROOT,
+            "REDIS_HOST": redis_location.hostname or "127.0.0.1",
+            "REDIS_PORT": str(redis_location.port or 6379),
+            "OPENAI_BASE_URL": f"{self.mock_url}/v1",
+            "GROQ_BASE_URL": self.mock_url,
+            "CEREBRAS_BASE_URL": self.mock_url,
+            "LANGCHAIN_ENDPOINT": f"{self.mock_url}/langsmith",
+            "LANGSMITH_ENDPOINT": f"{self.mock_url}/langsmith",
+            "LANGCHAIN_API_KEY": "mock",
+            "LANGCHAIN_TRACING_V2": "false",
+            "BATCH_POLL_INTERVAL": "1",
+        })
+        return env
+
+    def mock_config_path(self) -> str:
+        """The mock config, with the local_fs file picker answering with the benchmark's file name."""
+        with open(self.args.mock_config) as config_file:
+            config = json.load(config_file)
+        config.setdefault("responses", {}).setdefault("marly/get-relevant-file", LOCAL_FS_FILE_NAME)
+        path = os.path.join(self.work_dir, "mock_config.json")
+        with open(path, "w") as config_file:
+            json.dump(config, config_file)
+        return path
+
+    def start_process(self, name: str, command: List[str]) -> ServiceProcess:
+        process = ServiceProcess(name, command, self.service_env(), self.work_dir)
+        self.processes[name] = process
+        return process
+
+    async def wait_for_http(self, process: ServiceProcess, url: str, timeout: float = 60) -> None:
+        deadline = time.monotonic() + timeout
+        async with aiohttp.ClientSession() as session:
+            while time.monotonic() < deadline:
+                process.check_running()
+                try:
+                    async with session.get(url) as response:
+                        if response.status < 500:
+                            return
+                except aiohttp.ClientError:
+                    pass
+                await asyncio.sleep(0.2)
+        raise RuntimeError(f"{process.name} did not answer on {url} within {timeout}s")
+
+    async def wait_for_log(self, process: ServiceProcess, text: str, timeout: float = 60) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            process.check_running()
+            with open(process.log_path) as log_file:
+                if text in log_file.read():
+                    return
+            await asyncio.sleep(0.2)
+        raise RuntimeError(f"{process.name} did not log {text!r} within {timeout}s")
+
+    async def wait_for_redis(self, timeout: float = 30) -> None:
+        deadline = time.monotonic() + timeout
+        client = redis.from_url(self.redis_url)
+        try:
+            while True:
+                try:
+                    await client.ping()
+                    return
+                except (redis.ConnectionError, OSError):
+                    if time.monotonic() > deadline:
+                        raise
+                    await asyncio.sleep(0.2)
+        finally:
+            await client.aclose()
+
+    async def start(self) -> None:
+        python = sys.executable
+        if self.owns_redis:
+            redis_server = shutil.which("redis-server")
+            if not redis_server:
+                raise RuntimeError("redis-server was not found on PATH; pass --redis-url to use a running Redis")
+            self.start_process("redis", [
+                redis_server, "--port", str(self.args.redis_port), "--save", "", "--appendonly", "no"
+            ])
+        await self.wait_for_redis()
+
+        mock = self.start_process("mock-provider", [
+            python, "-m", "tools.mock_provider.server", "--host", "127.0.0.1",
+            "--port", str(self.args.mock_port), "--config", self.mock_config_path()
+        ])
+        await self.wait_for_http(mock, f"{self.mock_url}/mock/stats")
+
+        pipeline = self.start_process("pipeline", [
+            python, "-m", "uvicorn", "application.pipeline.start_pipeline:app",
+            "--host", "127.0.0.1", "--port", str(self.args.pipeline_port), "--log-level", "warning"
+        ])
+        extraction = self.start_process("extraction", [python, "application/extraction/start_extraction.py"])
+        transformation = self.start_process("transformation", [python, "application/transformation/start_transformation.py"])
+        await self.wait_for_http(pipeline, f"{self.pipeline_url}/openapi.json")
+        await self.wait_for_log(extraction, "Started extraction service")
+        await self.wait_for_log(transformation, "Started transformation service")
+
+    def cpu_snapshot(self) -> Dict[str, Optional[float]]:
+        return {stage: self.processes[stage].cpu_seconds() for stage in self.STAGES}
+
+    def stop(self) -> None:
+        for process in reversed(list(self.processes.values())):
+            process.stop()
+
+def web_page_app() -> web.Application:
+    """Serves synthetic article pages for web workloads: /pages/<label>?sections=N."""
+    async def page(request: web.Request) -> web.Response:
+        sections = int(request.query.get("sections", SCENARIO_DEFAULTS["html_sections"]))
+        return web.Response(text=make_html(sections, label=request.match_info["label"]), content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/pages/{label}", page)
+    return app
+
+class ScenarioRunner:
+    def __init__(self, stack: BenchmarkStack, run_id: str, seed: int):
+        self.stack = stack
+        self.run_id = run_id
+        self.seed = seed
+
+    def build_workloads(self, scenario: Dict[str, Any], job_index: int) -> List[Dict[str, Any]]:
+        schemas = [
+            json.dumps(dict(list(SCHEMA_FIELDS.items())[:2 + schema_index % (len(SCHEMA_FIELDS) - 1)]))
+            for schema_index in range(scenario["schemas"])
+        ]
+        workloads = []
+        for document_index in range(scenario["documents"]):
+            # Unique per document, so that repeated submissions do not hit the pipeline's request cache.
+            label = f"{self.run_id}-{scenario['name']}-{job_index}-{document_index}"
+            source = scenario["source"]
+            if source == "web":
+                workloads.append({
+                    "data_source": "web",
+                    "documents_location": f"{self.stack.web_url}/pages/{label}?sections={scenario['html_sections']}",
+                    "schemas": schemas,
+                })
+                continue
+            pdf = make_pdf(scenario["pages"], label=label, seed=self.seed)
+            if source == "raw_data":
+                workloads.append({"raw_data": base64.b64encode(zlib.compress(pdf)).decode("utf-8"), "schemas": schemas})
+            elif source == "local_fs":
+                directory = os.path.join(self.stack.work_dir, "documents", label)
+                os.makedirs(directory, exist_ok=True)
+                with open(os.path.join(directory, LOCAL_FS_FILE_NAME), "wb") as pdf_file:
+                    pdf_file.write(pdf)
+                workloads.append({
+                    "data_source": "local_fs",
+                    "documents_location": directory,
+                    "file_name": LOCAL_FS_FILE_NAME,
+                    "schemas": schemas,
+                })
+            else:
+                raise ValueError(f"Unsupported benchmark source: {source}")
+        return workloads
+
+    def pages_per_job(self, scenario: Dict[str, Any]) -> int:
+        pages_per_document = 1 if scenario["source"] == "web" else scenario["pages"]
+        return pages_per_document * scenario["documents"]
+
+    async def run_job(self, session: aiohttp.ClientSession, scenario: Dict[str, Any], job_index: int) -> Dict[str, Any]:
+        request = {
+            "workloads": self.build_workloads(scenario, job_index),
+            "provider_type": "openai",
+            "provider_model_name": "gpt-4o",
+            "api_key": "mock",
+            "markdown_mode": scenario["markdown_mode"],
+            "execution_mode": scenario["execution_mode"],
+        }
+        started = time.monotonic()
+        async with session.post(f"{self.stack.pipeline_url}/pipelines", json=request) as response:
+            if response.status != 202:
+                return {"status": "REJECTED", "latency": time.monotonic() - started, "detail": await response.text()}
+            task_id = (await response.json())["task_id"]
+
+        deadline = started + scenario["timeout"]
+        status = "PENDING"
+        while time.monotonic() < deadline:
+            async with session.get(f"{self.stack.pipeline_url}/pipelines/{task_id}") as response:
+                if response.status == 200:
+                    status = (await response.json()).get("status", status)
+            if status in FINAL_STATUSES:
+                return {"status": status, "latency": time.monotonic() - started, "task_id": task_id}
+            await asyncio.sleep(POLL_INTERVAL)
+        return {"status": "TIMED_OUT", "latency": time.monotonic() - started, "task_id": task_id}
+
+    async def sample_redis_memory(self, client: redis.Redis, samples: List[int], stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            try:
+                samples.append(int((await client.info("memory"))["used_memory"]))
+            except redis.ResponseError as e:
+                logger.warning(f"Redis memory is not reported: {e}")
+                return
+            try:
+                await asyncio.wait_for(stop.wait(), MEMORY_SAMPLE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def llm_stats(self, session: aiohttp.ClientSession) -> Dict[str, int]:
+        async with session.get(f"{self.stack.mock_url}/mock/stats") as response:
+            return await response.json()
+
+    async def run(self, scenario: Dict[str, Any]) -> Dict[str, Any]:
+        logger.info(f"Running scenario {scenario['name']}")
+        redis_client = redis.from_url(self.stack.redis_url)
+        try:
+            if self.stack.owns_redis:
+                await redis_client.flushdb()
+            async with aiohttp.ClientSession() as session:
+                await session.post(f"{self.stack.mock_url}/mock/stats/reset")
+                memory_samples: List[int] = []
+                stop_sampling = asyncio.Event()
+                sampler = asyncio.create_task(self.sample_redis_memory(redis_client, memory_samples, stop_sampling))
+                cpu_before = self.stack.cpu_snapshot()
+                semaphore = asyncio.Semaphore(scenario["concurrency"] or scenario["jobs"])
+
+                async def bounded_job(job_index: int) -> Dict[str, Any]:
+                    async with semaphore:
+                        return await self.run_job(session, scenario, job_index)
+
+                started = time.monotonic()
+                jobs = await asyncio.gather(*[bounded_job(index) for index in range(scenario["jobs"])])
+                duration = time.monotonic() - started
+                cpu_after = self.stack.cpu_snapshot()
+                stop_sampling.set()
+                await sampler
+                stats = await self.llm_stats(session)
+        finally:
+            await redis_client.aclose()
+
+        return self.summarize(scenario, jobs, duration, stats, memory_samples, cpu_before, cpu_after)
+
+    def summarize(
+        self, scenario: Dict[str, Any], jobs: List[Dict[str, Any]], duration: float, stats: Dict[str, int],
+        memory_samples: List[int], cpu_before: Dict[str, Optional[float]], cpu_after: Dict[str, Optional[float]]
+    ) -> Dict[str, Any]:
+        completed = [job for job in jobs if job["status"] == "COMPLETED"]
+        latencies = [job["latency"] for job in completed]
+        interactive_calls = stats.get("requests", 0)
+        batched_calls = sum(count for name, count in stats.items() if name.startswith("batch:"))
+        llm_calls = interactive_calls + batched_calls
+        pages = self.pages_per_job(scenario) * len(completed)
+        cpu_seconds = {
+            stage: round(cpu_after[stage] - cpu_before[stage], 3)
+            if cpu_after[stage] is not None and cpu_before[stage] is not None else None
+            for stage in BenchmarkStack.STAGES
+        }
+        return {
+            "name": scenario["name"],
+            "params": {key: scenario[key] for key in SCENARIO_DEFAULTS},
+            "jobs": {
+                "submitted": len(jobs),
+                "completed": len(completed),
+                "failed": sum(1 for job in jobs if job["status"] in ("FAILED", "REJECTED")),
+                "timed_out": sum(1 for job in jobs if job["status"] == "TIMED_OUT"),
+            },
+            "duration_s": duration,
+            "jobs_per_min": len(completed) / duration * 60 if duration else None,
+            "latency_s": distribution(latencies),
+            "pages": pages,
+            "llm_calls": llm_calls,
+            "llm_calls_per_page": llm_calls / pages if pages else None,
+            "llm_calls_by_prompt": {
+                name: count for name, count in sorted(stats.items())
+                if name not in ("requests", "errors", "rate_limited", "streams_cancelled")
+            },
+            "llm_errors": {name: stats.get(name, 0) for name in ("errors", "rate_limited", "streams_cancelled")},
+            "redis": {
+                "used_memory_start_bytes": memory_samples[0] if memory_samples else None,
+                "used_memory_peak_bytes": max(memory_samples) if memory_samples else None,
+            },
+            "cpu_seconds": cpu_seconds,
+            "cpu_seconds_per_job": {
+                stage: seconds / len(completed) if seconds is not None and completed else None
+                for stage, seconds in cpu_seconds.items()
+            },
+        }
+
+def load_scenarios(path: str, only: Optional[List[str]]) -> List[Dict[str, Any]]:
+    with open(path) as scenarios_file:
+        scenarios = json.load(scenarios_file)["scenarios"]
+    if only:
+        scenarios = [scenario for scenario in scenarios if scenario["name"] in only]
+    return [{**SCENARIO_DEFAULTS, **scenario} for scenario in scenarios]
+
+async def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    scenarios = load_scenarios(args.scenarios, args.only)
+    if not scenarios:
+        raise ValueError("No scenarios selected")
+    work_dir = tempfile.mkdtemp(prefix="marly-benchmark-")
+    logger.info(f"Service logs and documents are in {work_dir}")
+
+    web_runner = web.AppRunner(web_page_app(), access_log=None)
+    await web_runner.setup()
+    await web.TCPSite(web_runner, "127.0.0.1", args.web_port).start()
+    stack = BenchmarkStack(args, work_dir)
+    try:
+        await stack.start()
+        runner = ScenarioRunner(stack, run_id=uuid.uuid4().hex[:8], seed=args.seed)
+        results = [await runner.run(scenario) for scenario in scenarios]
+    finally:
+        stack.stop()
+        await web_runner.cleanup()
+
+    return results_document("pipeline", results, mock_config=os.path.relpath(args.mock_config, REPO_ROOT))
+
+def print_summary(results: Dict[str, Any]) -> None:
+    print(f"{'scenario':<28} {'jobs/min':>9} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'calls/page':>10} {'redis MB':>9}")
+    for scenario in results["scenarios"]:
+        latency = scenario["latency_s"]
+        peak = scenario["redis"]["used_memory_peak_bytes"]
+        print(
+            f"{scenario['name']:<28} {scenario['jobs_per_min'] or 0:>9.2f} {latency['p50'] or 0:>8.2f} "
+            f"{latency['p95'] or 0:>8.2f} {latency['p99'] or 0:>8.2f} {scenario['llm_calls_per_page'] or 0:>10.2f} "
+            f"{(peak or 0) / 2 ** 20:>9.1f}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end throughput benchmark for the Marly services")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Boot the services and run the benchmark scenarios")
+    run_parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS_PATH, help="JSON file with a 'scenarios' list")
+    run_parser.add_argument("--only", nargs="+", help="Names of the scenarios to run")
+    run_parser.add_argument("--output", default="benchmark-results.json")
+    run_parser.add_argument("--mock-config", default=DEFAULT_MOCK_CONFIG_PATH)
+    run_parser.add_argument("--redis-url", help="Use a running Redis instead of starting redis-server")
+    run_parser.add_argument("--redis-port", type=int, default=6390)
+    run_parser.add_argument("--mock-port", type=int, default=8089)
+    run_parser.add_argument("--pipeline-port", type=int, default=8100)
+    run_parser.add_argument("--web-port", type=int, default=8091)
+    run_parser.add_argument("--seed", type=int, default=0)
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files and flag regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="Relative change that counts as a regression")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = asyncio.run(run_benchmarks(args))
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+        print_summary(results)
+        print(f"Results written to {args.output}")
+        return
+
+    run_compare(args.baseline, args.current, args.threshold)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Result files shared by the benchmarks: metadata, percentiles and regression checks.
+
+Every result file names the benchmark that wrote it and holds a list of
+``scenarios``; ``compare_results`` matches scenarios by name and checks the
+metrics registered for that benchmark in ``COMPARED_METRICS``.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_VERSION = 1
+
+# Benchmark -> metric path -> True when higher is better.
+COMPARED_METRICS = {
+    "pipeline": {
+        "jobs_per_min": True,
+        "latency_s.p50": False,
+        "latency_s.p95": False,
+        "latency_s.p99": False,
+        "llm_calls_per_page": False,
+        "redis.used_memory_peak_bytes": False,
+        "cpu_seconds_per_job.pipeline": False,
+        "cpu_seconds_per_job.extraction": False,
+        "cpu_seconds_per_job.transformation": False,
+    },
+    "extraction": {
+        "page_count_s": False,
+        "per_page_s.p50": False,
+        "per_page_s.p95": False,
+        "pages_per_cpu_s": True,
+        "per_call_s.p50": False,
+        "per_call_s.p95": False,
+        "mb_per_cpu_s": True,
+        "max_rss_bytes": False,
+    },
+}
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile, q in [0, 100]."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+def distribution(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def results_document(benchmark: str, scenarios: List[Dict[str, Any]], **extra: Any) -> Dict[str, Any]:
+    return {
+        "version": RESULTS_VERSION,
+        "benchmark": benchmark,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": git_commit(),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        **extra,
+        "scenarios": scenarios,
+    }
+
+def metric_value(result: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = result
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """One row per scenario metric present in both runs; ``regression`` marks changes beyond the threshold."""
+    if baseline.get("benchmark") != current.get("benchmark"):
+        raise ValueError(f"Cannot compare {baseline.get('benchmark')} results with {current.get('benchmark')} results")
+    metrics = COMPARED_METRICS[current["benchmark"]]
+    baseline_scenarios = {scenario["name"]: scenario for scenario in baseline["scenarios"]}
+    rows = []
+    for scenario in current["scenarios"]:
+        previous = baseline_scenarios.get(scenario["name"])
+        if previous is None:
+            continue
+        for path, higher_is_better in metrics.items():
+            old, new = metric_value(previous, path), metric_value(scenario, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            rows.append({
+                "scenario": scenario["name"], "metric": path, "baseline": old, "current": new,
+                "change": change, "regression": worse > threshold,
+            })
+        old_completed, new_completed = metric_value(previous, "jobs.completed"), metric_value(scenario, "jobs.completed")
+        if old_completed is not None and new_completed is not None and new_completed < old_completed:
+            rows.append({
+                "scenario": scenario["name"], "metric": "jobs.completed",
+                "baseline": old_completed, "current": new_completed, "change": None, "regression": True,
+            })
+    return rows
+
+def run_compare(baseline_path: str, current_path: str, threshold: float) -> None:
+    """Print the comparison and exit non-zero when any metric regressed."""
+    with open(baseline_path) as baseline_file, open(current_path) as current_file:
+        rows = compare_results(json.load(baseline_file), json.load(current_file), threshold)
+    for row in rows:
+        change = "n/a" if row["change"] is None else f"{row['change']:+.1%}"
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['scenario']:<28} {row['metric']:<36} {row['baseline']:>12.4g} {row['current']:>12.4g} {change:>8} {flag}")
+    if any(row["regression"] for row in rows):
+        sys.exit(1)
@@ -0,0 +1,95 @@
+"""Deterministic PDF and HTML documents for the benchmarks.
+
+The PDFs are written directly in PDF syntax (one Helvetica text stream per
+page), so no PDF authoring library is needed. ``label`` is printed on every
+page; give each benchmark job its own label so that identical submissions do
+not hit the pipeline's request cache.
+"""
+import random
+from typing import List
+
+FIRMS = [
+    "Northwind Capital Partners", "Blue Harbor Ventures", "Granite Peak Equity",
+    "Silver Fern Investments", "Cedar Ridge Growth", "Meridian Buyout Fund",
+]
+FILLER = [
+    "The partnership continued to deploy capital in line with its stated strategy.",
+    "Valuations reflect the most recent audited statements of the portfolio companies.",
+    "Distributions during the period were made from realised proceeds only.",
+    "Unfunded commitments are shown at their nominal amount.",
+    "Management fees are charged on committed capital during the investment period.",
+    "Figures are unaudited and subject to change in the final report.",
+]
+LINES_PER_PAGE = 40
+
+def page_lines(rng: random.Random, page_number: int, label: str) -> List[str]:
+    lines = [f"{label} - Portfolio Review - Page {page_number}", ""]
+    if page_number % 3 == 1:
+        lines.append("Firm | Funds | Commitment ($M) | Exposure ($M) | TVPI | Net IRR")
+        for firm in rng.sample(FIRMS, 4):
+            lines.append(
+                f"{firm} | {rng.randint(1, 9)} | {rng.uniform(5, 400):.1f} | "
+                f"{rng.uniform(5, 500):.1f} | {rng.uniform(0.8, 2.9):.2f}x | {rng.uniform(-4, 31):.1f}%"
+            )
+        lines.append("")
+    while len(lines) < LINES_PER_PAGE:
+        lines.append(rng.choice(FILLER))
+    return lines
+
+def escape_pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_pdf(pages: int, label: str = "Benchmark", seed: int = 0) -> bytes:
+    """A text PDF with ``pages`` pages; every third page carries a metrics table."""
+    rng = random.Random(f"{seed}:{pages}")
+    page_ids = [4 + 2 * index for index in range(pages)]
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: f"<< /Type /Pages /Kids [{' '.join(f'{page_id} 0 R' for page_id in page_ids)}] /Count {pages} >>".encode("ascii"),
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for index, page_id in enumerate(page_ids):
+        text = "\n".join(f"({escape_pdf_text(line)}) '" for line in page_lines(rng, index + 1, label))
+        stream = f"BT /F1 9 Tf 12 TL 40 800 Td\n{text}\nET".encode("latin-1", "replace")
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        ).encode("ascii")
+        objects[page_id + 1] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(output)
+        output += b"%d 0 obj\n%s\nendobj\n" % (object_id, objects[object_id])
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for object_id in sorted(objects):
+        output += b"%010d 00000 n \n" % offsets[object_id]
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(output)
+
+def make_html(sections: int, label: str = "Benchmark", seed: int = 0) -> str:
+    """An article page with ``sections`` sections plus the navigation, script and style noise real pages carry."""
+    rng = random.Random(f"{seed}:{sections}")
+    parts = [
+        "<!DOCTYPE html><html><head>",
+        f"<title>{label}</title>",
+        "<style>body { font-family: sans-serif; } .nav a { margin: 0 4px; }</style>",
+        "<script>window.analytics = window.analytics || []; analytics.push(['page']);</script>",
+        "</head><body>",
+        "<nav class=\"nav\">" + "".join(f"<a href=\"/section/{index}\">Section {index}</a>" for index in range(12)) + "</nav>",
+        f"<main><article><h1>{label}</h1>",
+    ]
+    for section in range(sections):
+        parts.append(f"<section><h2>Section {section + 1}</h2>")
+        parts.extend(f"<p>{' '.join(rng.choice(FILLER) for _ in range(4))}</p>" for _ in range(3))
+        if section % 2 == 0:
+            rows = "".join(
+                f"<tr><td>{firm}</td><td>{rng.uniform(0.8, 2.9):.2f}x</td><td>{rng.uniform(-4, 31):.1f}%</td></tr>"
+                for firm in rng.sample(FIRMS, 3)
+            )
+            parts.append(f"<table><tr><th>Firm</th><th>TVPI</th><th>Net IRR</th></tr>{rows}</table>")
+        parts.append("</section>")
+    parts.append("</article></main><footer><p>&copy; Benchmark Media</p><script>analytics.push(['end']);</script></footer></body></html>")
+    return "\n".join(parts)
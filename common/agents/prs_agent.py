@@ -5,15 +5,24 @@ from langchain_core.messages import BaseMessage, AIMessage, HumanMessage
 from langgraph.graph import StateGraph, END
 import functools
 import logging
+import os
 import redis
 import json
 import uuid
+import re
 from .agent_prompt_enums import AgentMode, ExtractionPrompts, PageFinderPrompts
+from common.metrics.pipeline_metrics import Stage, stage_timer
 
 load_dotenv()
 
-redis_client = redis.Redis(host='redis', port=6379, db=0)
+redis_client = redis.Redis(host=os.getenv('REDIS_HOST', 'redis'), port=int(os.getenv('REDIS_PORT', 6379)), db=0)
 REDIS_EXPIRE = 60 * 60
+CONFIDENCE_MAX_TOKENS = 8
+SCORE_PATTERN = re.compile(r"\s*\d*\.?\d+\s")
+
+def score_complete(text: str) -> bool:
+    """A score is complete once the number is followed by whitespace."""
+    return SCORE_PATTERN.match(text) is not None
 
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], operator.add]
@@ -209,7 +218,12 @@ def confidence_node(state, agent, name, prompts):
         {"role": "user", "content": f"Analysis to score:\n{last_message}"}
     ]
     
-    score = agent.do_completion(confidence_messages, temperature=0.0)
+    score = agent.stream_completion(
+        confidence_messages,
+        stop_predicate=score_complete,
+        max_tokens=CONFIDENCE_MAX_TOKENS,
+        temperature=0.0
+    )
     
     try:
         confidence = float(score.strip())
@@ -392,13 +406,14 @@ def process_extraction(text: str, client, mode: AgentMode) -> str:
         
         graph = create_graph(client, mode)
         
-        result = graph.invoke({
-            "messages": [HumanMessage(content=text)],
-            "sender": "user",
-            "confidence_score": 0.0,
-            "session_id": session_id,
-            "iterations": 0
-        })
+        with stage_timer(Stage.AGENT_LOOP, client):
+            result = graph.invoke({
+                "messages": [HumanMessage(content=text)],
+                "sender": "user",
+                "confidence_score": 0.0,
+                "session_id": session_id,
+                "iterations": 0
+            })
         
         logger.info("\n" + "="*50)
         logger.info(f"AGENT MODE: {mode.value}")
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from common.redis.redis_config import get_sync_redis_connection
+
+logger = logging.getLogger(__name__)
+
+COMPLETION_CACHE_BACKEND = os.getenv("COMPLETION_CACHE_BACKEND", "none").lower()
+COMPLETION_CACHE_SCOPE = os.getenv("COMPLETION_CACHE_SCOPE", "deterministic").lower()
+COMPLETION_CACHE_PATH = os.getenv("COMPLETION_CACHE_PATH", "/tmp/marly_completion_cache.sqlite")
+COMPLETION_CACHE_MAX_BYTES = int(os.getenv("COMPLETION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+COMPLETION_CACHE_TTL = int(os.getenv("COMPLETION_CACHE_TTL", str(7 * 24 * 60 * 60)))
+COMPLETION_CACHE_PREFIX = "completion-cache"
+
+SAMPLING_PARAMS = ("temperature", "top_p", "max_tokens", "stop", "response_format", "n", "stream")
+
+def normalize_messages(messages) -> list:
+    """Strip whitespace differences that do not change what the model sees."""
+    normalized = []
+    for message in messages or []:
+        content = message.get("content", "")
+        if isinstance(content, str):
+            content = "\n".join(re.sub(r"[ \t]+", " ", line).strip() for line in content.strip().splitlines())
+        normalized.append({"role": message.get("role"), "content": content})
+    return normalized
+
+def is_cacheable(params: Dict[str, Any], scope: str = COMPLETION_CACHE_SCOPE) -> bool:
+    """Only single-choice calls are cached; by default only deterministic ones."""
+    if params.get("n") not in (None, 1):
+        return False
+    if scope == "all":
+        return True
+    return params.get("temperature") == 0 or params.get("response_format") is not None
+
+def make_cache_key(provider: str, params: Dict[str, Any]) -> str:
+    payload = {
+        "provider": provider,
+        "model": params.get("model"),
+        "messages": normalize_messages(params.get("messages")),
+        "params": {name: params.get(name) for name in SAMPLING_PARAMS if params.get(name) is not None},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class SQLiteCompletionCache:
+    """Local on-disk cache with a byte budget and least-recently-used eviction."""
+    def __init__(self, path: str = COMPLETION_CACHE_PATH, max_bytes: int = COMPLETION_CACHE_MAX_BYTES, ttl: int = COMPLETION_CACHE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS completions_accessed_at ON completions (accessed_at)")
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT value, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl and now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self.conn.commit()
+                return None
+            self.conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self.evict()
+            self.conn.commit()
+
+    def evict(self) -> None:
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.conn.execute("SELECT key, size FROM completions ORDER BY accessed_at ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            total -= size
+
+class RedisCompletionCache:
+    """Cache shared by every worker, with a byte budget enforced by LRU eviction."""
+    def __init__(self, max_bytes: int = COMPLETION_CACHE_MAX_BYTES, ttl: int = COMPLETION_CACHE_TTL, prefix: str = COMPLETION_CACHE_PREFIX):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.prefix = prefix
+        self.lru_key = f"{prefix}:lru"
+        self.bytes_key = f"{prefix}:bytes"
+
+    def entry_key(self, key: str) -> str:
+        return f"{self.prefix}:entry:{key}"
+
+    def get(self, key: str) -> Optional[str]:
+        redis = get_sync_redis_connection()
+        value = redis.get(self.entry_key(key))
+        if value is None:
+            # Expired entries still count against the budget until evicted.
+            return None
+        redis.zadd(self.lru_key, {key: time.time()})
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        redis = get_sync_redis_connection()
+        previous_size = redis.strlen(self.entry_key(key))
+        pipe = redis.pipeline()
+        pipe.set(self.entry_key(key), value, ex=self.ttl or None)
+        pipe.zadd(self.lru_key, {key: time.time()})
+        pipe.incrby(self.bytes_key, size - previous_size)
+        total = pipe.execute()[-1]
+        if total > self.max_bytes:
+            self.evict(redis, total)
+
+    def evict(self, redis, total: int) -> None:
+        while total > self.max_bytes:
+            oldest = redis.zpopmin(self.lru_key, count=16)
+            if not oldest:
+                redis.set(self.bytes_key, 0)
+                return
+            freed = 0
+            for member, _ in oldest:
+                member = member.decode("utf-8") if isinstance(member, bytes) else member
+                freed += redis.strlen(self.entry_key(member))
+                redis.delete(self.entry_key(member))
+            total = redis.decrby(self.bytes_key, freed)
+            if not freed and total > self.max_bytes:
+                # Remaining budget belongs to expired entries; start counting again.
+                redis.set(self.bytes_key, 0)
+                return
+
+_caches: Dict[str, Any] = {}
+_caches_lock = threading.Lock()
+
+def get_completion_cache(additional_params: Optional[Dict[str, Any]] = None):
+    """Configured cache backend, or None when completion caching is off."""
+    backend = str((additional_params or {}).get("completion_cache") or COMPLETION_CACHE_BACKEND).lower()
+    if backend not in ("sqlite", "redis"):
+        return None
+    with _caches_lock:
+        if backend not in _caches:
+            _caches[backend] = SQLiteCompletionCache() if backend == "sqlite" else RedisCompletionCache()
+            logger.info(f"Completion cache enabled with {backend} backend")
+        return _caches[backend]
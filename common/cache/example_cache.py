@@ -0,0 +1,69 @@
+import hashlib
+import logging
+import os
+import re
+from typing import Any, Awaitable, Callable, Optional
+from redis.asyncio import Redis
+from common.metrics.pipeline_metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+EXAMPLE_CACHE_PREFIX = "example-format"
+EXAMPLE_CACHE_TTL = int(os.getenv("EXAMPLE_CACHE_TTL", str(7 * 24 * 60 * 60)))
+
+def normalize_schema(formatted_keywords: str) -> str:
+    """Normalize schema text so formatting-only differences share a cache entry."""
+    lines = [re.sub(r"\s+", " ", line).strip() for line in formatted_keywords.splitlines()]
+    return "\n".join(line for line in lines if line)
+
+def get_schema_hash(formatted_keywords: str) -> str:
+    return hashlib.sha256(normalize_schema(formatted_keywords).encode("utf-8")).hexdigest()
+
+def get_prompt_version(prompt: Any) -> str:
+    """Revision of a pulled prompt: its LangSmith commit, or a digest of the prompt itself."""
+    template = getattr(prompt, "first", prompt)
+    metadata = getattr(template, "metadata", None) or {}
+    if metadata.get("lc_hub_commit_hash"):
+        return metadata["lc_hub_commit_hash"]
+    return hashlib.sha256(repr(template).encode("utf-8")).hexdigest()[:16]
+
+def get_example_cache_key(formatted_keywords: str, prompt_version: str) -> str:
+    """Key of a schema's example format; a new revision of the generation prompt starts fresh entries."""
+    return f"{EXAMPLE_CACHE_PREFIX}:{prompt_version}:{get_schema_hash(formatted_keywords)}"
+
+async def get_cached_example_format(redis: Redis, formatted_keywords: str, prompt_version: str) -> Optional[str]:
+    try:
+        cached = await redis.get(get_example_cache_key(formatted_keywords, prompt_version))
+        if cached is None:
+            return None
+        return cached.decode("utf-8") if isinstance(cached, bytes) else cached
+    except Exception as e:
+        logger.error(f"Error reading example format cache: {e}")
+        return None
+
+async def cache_example_format(
+    redis: Redis, formatted_keywords: str, prompt_version: str, example_format: str, ttl: int = EXAMPLE_CACHE_TTL
+) -> None:
+    try:
+        await redis.set(get_example_cache_key(formatted_keywords, prompt_version), example_format, ex=ttl)
+    except Exception as e:
+        logger.error(f"Error writing example format cache: {e}")
+
+async def get_or_generate_example_format(
+    redis: Redis,
+    formatted_keywords: str,
+    prompt_version: str,
+    generate: Callable[[], Awaitable[str]],
+    ttl: int = EXAMPLE_CACHE_TTL
+) -> str:
+    cached = await get_cached_example_format(redis, formatted_keywords, prompt_version)
+    # Example formats depend only on the schema, so lookups carry no provider or model.
+    record_cache_lookup("example_format", cached is not None)
+    if cached is not None:
+        logger.info("Example format cache hit")
+        return cached
+
+    example_format = await generate()
+    if example_format:
+        await cache_example_format(redis, formatted_keywords, prompt_version, example_format, ttl)
+    return example_format
@@ -0,0 +1,48 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+from redis.asyncio import Redis
+from common.cache.example_cache import get_schema_hash
+from common.metrics.pipeline_metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_CACHE_PREFIX = "extraction-result"
+EXTRACTION_CACHE_TTL = int(os.getenv("EXTRACTION_CACHE_TTL", str(7 * 24 * 60 * 60)))
+
+def get_extraction_cache_key(document_hash: str, schema: Dict[str, str], provider: str, model: str) -> str:
+    """Key of one schema's extraction output; markdown_mode is left out as only transformation uses it."""
+    schema_hash = get_schema_hash("\n".join(f"{key}: {value}" for key, value in schema.items()))
+    payload = json.dumps([document_hash, schema_hash, provider, model])
+    return f"{EXTRACTION_CACHE_PREFIX}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+async def get_cached_extractions(
+    redis: Redis, document_hash: str, schemas: List[Dict[str, str]], provider: str, model: str
+) -> Optional[List[str]]:
+    """Prior extraction output for every schema of a document, or None unless all of them are cached."""
+    try:
+        cached = await redis.mget([get_extraction_cache_key(document_hash, schema, provider, model) for schema in schemas])
+    except Exception as e:
+        logger.error(f"Error reading extraction cache: {e}")
+        return None
+    hit = bool(cached) and all(result is not None for result in cached)
+    record_cache_lookup("extraction", hit, provider, model)
+    if not hit:
+        return None
+    return [result.decode("utf-8") if isinstance(result, bytes) else result for result in cached]
+
+async def cache_extractions(
+    redis: Redis, document_hash: str, schemas: List[Dict[str, str]], results: List[str],
+    provider: str, model: str, ttl: int = EXTRACTION_CACHE_TTL
+) -> None:
+    """Store each schema's extraction output; empty results are failures and are not kept."""
+    try:
+        pipe = redis.pipeline(transaction=False)
+        for schema, result in zip(schemas, results):
+            if result:
+                pipe.set(get_extraction_cache_key(document_hash, schema, provider, model), result, ex=ttl)
+        await pipe.execute()
+    except Exception as e:
+        logger.error(f"Error writing extraction cache: {e}")
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+from redis.asyncio import Redis
+from common.cache.example_cache import get_schema_hash
+from common.metrics.pipeline_metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_PREFIX = "result-cache"
+RESULT_CACHE_INDEX = "result-cache-index"
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 60 * 60)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "100000"))
+
+def get_result_cache_key(
+    document_hash: str, schema: Dict[str, str], provider: str, model: str, markdown_mode: bool
+) -> str:
+    """Key of one schema's final, transformed result for a document."""
+    schema_hash = get_schema_hash("\n".join(f"{key}: {value}" for key, value in schema.items()))
+    payload = json.dumps([document_hash, schema_hash, provider, model, bool(markdown_mode)])
+    return f"{RESULT_CACHE_PREFIX}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+def serialize_result(extracted_metrics: Dict[str, str], transformed_metrics: Dict[str, str]) -> str:
+    """A schema's transformed metrics as they are cached, or "" when they must not be.
+
+    Failed extraction and transformation calls both leave empty values behind;
+    caching those would serve the failure to every later job.
+    """
+    if not extracted_metrics or not all(extracted_metrics.values()):
+        return ""
+    if not transformed_metrics or not all(transformed_metrics.values()):
+        return ""
+    return json.dumps(transformed_metrics)
+
+async def get_cached_results(
+    redis: Redis, document_hash: str, schemas: List[Dict[str, str]], provider: str, model: str, markdown_mode: bool
+) -> Optional[List[str]]:
+    """Transformed result of every schema of a document, or None unless all of them are cached."""
+    keys = [get_result_cache_key(document_hash, schema, provider, model, markdown_mode) for schema in schemas]
+    try:
+        cached = await redis.mget(keys)
+    except Exception as e:
+        logger.error(f"Error reading result cache: {e}")
+        return None
+    hit = bool(cached) and all(result is not None for result in cached)
+    record_cache_lookup("result", hit, provider, model)
+    if not hit:
+        return None
+
+    try:
+        # Entries that keep being hit stay clear of eviction; their keys must outlive
+        # their index scores, or the index would keep counting expired entries.
+        pipe = redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.expire(key, RESULT_CACHE_TTL)
+        pipe.zadd(RESULT_CACHE_INDEX, {key: time.time() for key in keys})
+        await pipe.execute()
+    except Exception as e:
+        logger.error(f"Error updating result cache index: {e}")
+    return [result.decode("utf-8") if isinstance(result, bytes) else result for result in cached]
+
+async def cache_results(
+    redis: Redis, document_hash: str, schemas: List[Dict[str, str]], results: List[str],
+    provider: str, model: str, markdown_mode: bool, ttl: int = RESULT_CACHE_TTL
+) -> None:
+    """Store each schema's transformed result, evicting the least recently used entries beyond the size bound.
+
+    Empty results are failures and are not kept.
+    """
+    now = time.time()
+    entries = {
+        get_result_cache_key(document_hash, schema, provider, model, markdown_mode): result
+        for schema, result in zip(schemas, results) if result
+    }
+    if not entries:
+        return
+    try:
+        pipe = redis.pipeline(transaction=False)
+        for key, result in entries.items():
+            pipe.set(key, result, ex=ttl)
+        pipe.zadd(RESULT_CACHE_INDEX, {key: now for key in entries})
+        pipe.zremrangebyscore(RESULT_CACHE_INDEX, "-inf", now - ttl)
+        pipe.zcard(RESULT_CACHE_INDEX)
+        size = (await pipe.execute())[-1]
+        if size > RESULT_CACHE_MAX_ENTRIES:
+            evicted = [
+                key.decode("utf-8") if isinstance(key, bytes) else key
+                for key, _ in await redis.zpopmin(RESULT_CACHE_INDEX, size - RESULT_CACHE_MAX_ENTRIES)
+            ]
+            await redis.delete(*evicted)
+            logger.info(f"Evicted {len(evicted)} result cache entries")
+    except Exception as e:
+        logger.error(f"Error writing result cache: {e}")
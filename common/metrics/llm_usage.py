@@ -0,0 +1,54 @@
+"""LLM calls and tokens attributed to the block of work that spent them.
+
+``track_llm_usage`` opens a scope that counts every LLM call recorded inside
+it, including calls made in nested scopes. Scopes live in a context variable,
+so they follow asyncio tasks automatically; work handed to a thread pool is
+only counted when submitted through ``in_current_context``.
+"""
+import contextvars
+import functools
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+@dataclass
+class LLMUsage:
+    llm_calls: int = 0
+    cached_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    parent: Optional["LLMUsage"] = field(default=None, repr=False, compare=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, outcome: str, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+        usage = self
+        while usage is not None:
+            with usage.lock:
+                if outcome == "cached":
+                    usage.cached_calls += 1
+                else:
+                    usage.llm_calls += 1
+                usage.prompt_tokens += prompt_tokens
+                usage.completion_tokens += completion_tokens
+            usage = usage.parent
+
+_current_usage: contextvars.ContextVar[Optional[LLMUsage]] = contextvars.ContextVar("llm_usage", default=None)
+
+@contextmanager
+def track_llm_usage() -> Iterator[LLMUsage]:
+    usage = LLMUsage(parent=_current_usage.get())
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+def add_llm_usage(outcome: str, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.add(outcome, prompt_tokens, completion_tokens)
+
+def in_current_context(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Callable[[], Any]:
+    """Bind ``func`` to a copy of the current context, for ``run_in_executor``."""
+    return functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
@@ -0,0 +1,112 @@
+"""Prometheus metrics shared by the pipeline, extraction and transformation services.
+
+The pipeline serves them on its own ``/metrics`` route; the workers start a
+separate HTTP server (see ``start_metrics_server``). Every metric carries the
+provider and model of the job it was recorded for, so stage timings can be
+broken down the same way as LLM usage.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from enum import Enum
+from typing import Iterator, Optional, Tuple, Union
+from prometheus_client import Counter, Histogram, start_http_server
+from common.metrics.llm_usage import add_llm_usage
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_LABEL = "unknown"
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+LAG_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+class Stage(str, Enum):
+    INGESTION = "ingestion"
+    PAGE_EXTRACTION = "page_extraction"
+    PAGE_FINDING = "page_finding"
+    AGENT_LOOP = "agent_loop"
+    VALIDATION = "validation"
+    TRANSFORMATION = "transformation"
+    DESTINATION_WRITE = "destination_write"
+
+STAGE_SECONDS = Histogram(
+    "marly_stage_seconds",
+    "Time spent in a pipeline stage, per unit of work (workload, page, page check, agent batch, schema, metric)",
+    ["stage", "provider", "model"],
+    buckets=STAGE_BUCKETS
+)
+LLM_CALLS = Counter(
+    "marly_llm_calls",
+    "LLM completions by outcome: success, error, cached or batched",
+    ["provider", "model", "outcome"]
+)
+LLM_TOKENS = Counter(
+    "marly_llm_tokens",
+    "Tokens sent to (prompt) and received from (completion) LLMs",
+    ["provider", "model", "direction"]
+)
+CACHE_LOOKUPS = Counter(
+    "marly_cache_lookups",
+    "Cache lookups by cache and result (hit or miss)",
+    ["cache", "result", "provider", "model"]
+)
+STREAM_LAG = Histogram(
+    "marly_stream_lag_seconds",
+    "Time between a message being added to a Redis stream and a worker reading it",
+    ["stream", "provider", "model"],
+    buckets=LAG_BUCKETS
+)
+
+def label_value(value) -> str:
+    value = getattr(value, "value", value)
+    return str(value) if value else UNKNOWN_LABEL
+
+def model_labels(client) -> Tuple[str, str]:
+    """Provider and model labels of a model client (or anything with model_type and model_name)."""
+    return label_value(getattr(client, "model_type", None)), label_value(getattr(client, "model_name", None))
+
+@contextmanager
+def observe_stage(stage: Stage, provider, model) -> Iterator[None]:
+    """Time the enclosed block as one observation of ``stage``, whether or not it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(label_value(stage), label_value(provider), label_value(model)).observe(time.perf_counter() - start)
+
+def stage_timer(stage: Stage, client):
+    return observe_stage(stage, *model_labels(client))
+
+def record_llm_call(provider, model, outcome: str, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+    provider, model = label_value(provider), label_value(model)
+    LLM_CALLS.labels(provider, model, outcome).inc()
+    if prompt_tokens:
+        LLM_TOKENS.labels(provider, model, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(provider, model, "completion").inc(completion_tokens)
+    add_llm_usage(outcome, prompt_tokens, completion_tokens)
+
+def record_cache_lookup(cache: str, hit: bool, provider=None, model=None) -> None:
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss", label_value(provider), label_value(model)).inc()
+
+def record_stream_lag(stream: Union[str, bytes], message_id: Union[str, bytes], provider=None, model=None) -> None:
+    """Observe how long a message waited, from the millisecond timestamp in its stream ID."""
+    if isinstance(stream, bytes):
+        stream = stream.decode("utf-8")
+    if isinstance(message_id, bytes):
+        message_id = message_id.decode("utf-8")
+    try:
+        added_ms = int(message_id.split("-", 1)[0])
+    except ValueError:
+        return
+    lag = max(0.0, time.time() - added_ms / 1000)
+    STREAM_LAG.labels(stream, label_value(provider), label_value(model)).observe(lag)
+
+def start_metrics_server(default_port: int) -> Optional[int]:
+    """Serve /metrics for a worker on METRICS_PORT (``default_port`` when unset, disabled when 0)."""
+    port = int(os.getenv("METRICS_PORT", default_port))
+    if not port:
+        return None
+    start_http_server(port)
+    logger.info(f"Serving metrics on port {port}")
+    return port
@@ -1,10 +1,13 @@
 from typing import Dict, List, Optional, Union, Any
 from common.models.base.base_model import BaseModel
+from common.models.resilience import SDK_MAX_RETRIES
 from openai import AzureOpenAI
-from common.models.enums.model_enums import AzureModelName
+from common.models.enums.model_enums import ModelType, AzureModelName
 from langsmith import traceable
 
 class AzureModel(BaseModel):
+    model_type = ModelType.AZURE
+
     def __init__(self, api_key: str, model_name: str, additional_params: Dict[str, Any] = None):
         if not api_key:
             raise ValueError("API key must be provided.")
@@ -12,6 +15,7 @@ class AzureModel(BaseModel):
         
         if not additional_params:
             additional_params = {}
+        self.additional_params = additional_params
         
         self.api_version = additional_params.get("api_version")
         if not self.api_version:
@@ -31,7 +35,8 @@ class AzureModel(BaseModel):
             api_key=self.api_key,
             api_version=self.api_version,
             azure_endpoint=self.azure_endpoint,
-            azure_deployment=self.azure_deployment
+            azure_deployment=self.azure_deployment,
+            max_retries=SDK_MAX_RETRIES
         )
 
     @staticmethod
@@ -72,6 +77,7 @@ class AzureModel(BaseModel):
         if response_format is not None:
             params["response_format"] = response_format
         
-        response = self.client.chat.completions.create(**params)
-        
-        return response.choices[0].message.content
+        return self.execute_completion(
+            params,
+            lambda: self.client.chat.completions.create(**params, **self.request_options()).choices[0].message.content
+        )
@@ -1,5 +1,136 @@
-from typing import Dict
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+from common.cache.completion_cache import get_completion_cache, is_cacheable, make_cache_key
+from common.metrics.pipeline_metrics import record_cache_lookup, record_llm_call
+from common.models.rate_limiter import get_rate_limiter
+from common.models.resilience import RetryPolicy, check_abandoned, get_latency_tracker, request_timeout, resilient_call
+from common.text_extraction.token_counter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT_TOKEN_ESTIMATE = 1000
 
 class BaseModel:
+    model_type = None
+
     def do_completion(self, data: Dict):
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def open_stream(self, params: Dict[str, Any]) -> Iterator[str]:
+        """Yield content deltas of a streamed completion. Closing the generator
+        closes the underlying connection, which cancels generation server-side.
+        The default covers the OpenAI-compatible SDKs."""
+        stream = self.client.chat.completions.create(**params, **self.request_options())
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                # Some SDKs (Cerebras) hand back deltas as plain dicts.
+                delta = chunk.choices[0].delta
+                content = delta.get("content") if isinstance(delta, dict) else delta.content
+                if content:
+                    yield content
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+
+    def stream_completion(self,
+                          messages: List[Dict[str, str]],
+                          stop_predicate: Optional[Callable[[str], bool]] = None,
+                          model_name: Optional[str] = None,
+                          max_tokens: Optional[int] = None,
+                          temperature: Optional[float] = None,
+                          stop: Optional[Union[str, List[str]]] = None) -> str:
+        """Stream a completion and return the text received so far as soon as
+        ``stop_predicate`` accepts it, or the full text when the stream ends."""
+        if not messages:
+            raise ValueError("'messages' must be provided.")
+
+        params = {
+            "model": self.validate_model_name(model_name) if model_name else self.model_name,
+            "messages": messages,
+            "stream": True,
+        }
+
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        if temperature is not None:
+            params["temperature"] = temperature
+        if stop is not None:
+            params["stop"] = stop
+
+        def request() -> str:
+            text = ""
+            stream = self.open_stream(params)
+            try:
+                for delta in stream:
+                    check_abandoned()
+                    text += delta
+                    if stop_predicate and stop_predicate(text):
+                        break
+            finally:
+                stream.close()
+            return text
+
+        return self.execute_completion(params, request)
+
+    def request_options(self) -> Dict[str, Any]:
+        """Per-request SDK options: a timeout that ends at the attempt's deadline."""
+        timeout = request_timeout()
+        return {} if timeout is None else {"timeout": timeout}
+
+    def count_prompt_tokens(self, params: Dict[str, Any]) -> int:
+        prompt_text = "\n".join(str(message.get("content", "")) for message in params.get("messages", []))
+        return count_tokens(prompt_text, self.model_type, params.get("model"))
+
+    def execute_completion(self, params: Dict[str, Any], request: Callable[[], str]) -> str:
+        """Run a provider request with retries and deadlines, each attempt under the
+        process-wide limiter for this provider and model. Deterministic calls are
+        served from the completion cache when one is configured."""
+        model_name = params.get("model", self.model_name)
+        additional_params = getattr(self, "additional_params", None)
+        cache = get_completion_cache(additional_params)
+        cache_key = None
+        if cache is not None and is_cacheable(params):
+            try:
+                cache_key = make_cache_key(self.model_type.value, params)
+                cached = cache.get(cache_key)
+                record_cache_lookup("completion", cached is not None, self.model_type, model_name)
+                if cached is not None:
+                    record_llm_call(self.model_type, model_name, "cached")
+                    return cached
+            except Exception as e:
+                logger.error(f"Completion cache lookup failed: {e}")
+
+        limiter = get_rate_limiter(self.model_type, model_name, additional_params, getattr(self, "api_key", None))
+        prompt_tokens = self.count_prompt_tokens(params)
+        # Rate limiting budgets for the expected completion size as well.
+        estimated_tokens = prompt_tokens + (params.get("max_tokens") or DEFAULT_OUTPUT_TOKEN_ESTIMATE)
+
+        def limited_request() -> str:
+            with limiter.limit(estimated_tokens):
+                # A hedge that lost while waiting for capacity is dropped unsent.
+                check_abandoned()
+                return request()
+
+        try:
+            result = resilient_call(
+                limited_request,
+                RetryPolicy.from_params(additional_params),
+                get_latency_tracker(self.model_type.value, model_name)
+            )
+        except Exception:
+            record_llm_call(self.model_type, model_name, "error", prompt_tokens)
+            raise
+        record_llm_call(
+            self.model_type, model_name, "success", prompt_tokens,
+            count_tokens(result, self.model_type, model_name) if result else 0
+        )
+
+        if cache_key is not None and result:
+            try:
+                cache.set(cache_key, result)
+            except Exception as e:
+                logger.error(f"Completion cache write failed: {e}")
+        return result
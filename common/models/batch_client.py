@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+from openai import AzureOpenAI, OpenAI
+from common.models.enums.model_enums import AzureModelName, ModelType, OpenAIModelName
+from common.metrics.pipeline_metrics import record_llm_call
+
+logger = logging.getLogger(__name__)
+
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", str(25 * 60 * 60)))
+BATCH_COMPLETION_WINDOW = "24h"
+MAX_BATCH_REQUESTS = 50000
+TERMINAL_BATCH_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+@dataclass
+class BatchRequest:
+    custom_id: str
+    messages: List[Dict[str, str]]
+    params: Dict[str, Any] = field(default_factory=dict)
+
+class BatchJobError(Exception):
+    pass
+
+class OpenAIBatchClient:
+    """Runs chat completions through the provider's asynchronous batch API.
+
+    Requests are written to a JSONL file, uploaded, submitted as a batch and
+    polled until the provider finishes; results come back keyed by custom_id.
+    Requests that fail inside a finished batch are left out of the results so
+    callers can retry them interactively.
+    """
+    model_type = ModelType.OPENAI
+    endpoint = "/v1/chat/completions"
+
+    def __init__(self, api_key: str, model_name: str, additional_params: Dict[str, Any] = None):
+        if not api_key:
+            raise ValueError("API key must be provided.")
+        self.api_key = api_key
+        self.additional_params = additional_params or {}
+        self.model_name = OpenAIModelName(model_name).value
+        self.poll_interval = float(self.additional_params.get("batch_poll_interval", BATCH_POLL_INTERVAL))
+        self.timeout = float(self.additional_params.get("batch_timeout", BATCH_TIMEOUT))
+        self.client = self.create_client()
+
+    def create_client(self):
+        client_params = {'api_key': self.api_key}
+        if self.additional_params.get('base_url'):
+            client_params['base_url'] = self.additional_params['base_url']
+        return OpenAI(**client_params)
+
+    @property
+    def body_model(self) -> str:
+        return self.model_name
+
+    def build_batch_file(self, requests: List[BatchRequest]) -> bytes:
+        lines = []
+        for request in requests:
+            body = {"model": self.body_model, "messages": request.messages, **request.params}
+            lines.append(json.dumps({"custom_id": request.custom_id, "method": "POST", "url": self.endpoint, "body": body}))
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        batch_file = self.client.files.create(file=("batch.jsonl", self.build_batch_file(requests)), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=self.endpoint,
+            completion_window=BATCH_COMPLETION_WINDOW
+        )
+        logger.info(f"Submitted batch {batch.id} with {len(requests)} requests")
+        return batch.id
+
+    def wait(self, batch_id: str):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in TERMINAL_BATCH_STATUSES:
+                break
+            if time.monotonic() > deadline:
+                self.client.batches.cancel(batch_id)
+                raise BatchJobError(f"Batch {batch_id} did not finish within {self.timeout}s")
+            time.sleep(self.poll_interval)
+
+        logger.info(f"Batch {batch_id} finished with status {batch.status}")
+        if batch.status in ("failed", "cancelled"):
+            raise BatchJobError(f"Batch {batch_id} {batch.status}: {getattr(batch, 'errors', None)}")
+        return batch
+
+    def fetch_results(self, batch) -> Dict[str, str]:
+        results = {}
+        if batch.output_file_id:
+            for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                if response.get("status_code") != 200:
+                    logger.error(f"Batch request {entry.get('custom_id')} failed: {entry.get('error') or response}")
+                    record_llm_call(self.model_type, self.model_name, "error")
+                    continue
+                usage = response["body"].get("usage") or {}
+                record_llm_call(
+                    self.model_type, self.model_name, "batched",
+                    usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+                )
+                results[entry["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+        if batch.error_file_id:
+            error_count = sum(1 for line in self.client.files.content(batch.error_file_id).text.splitlines() if line.strip())
+            logger.error(f"Batch {batch.id} reported {error_count} failed requests")
+        return results
+
+    def run(self, requests: List[BatchRequest]) -> Dict[str, str]:
+        """Submit every request, split into as many batches as the provider allows, and wait for all of them."""
+        if not requests:
+            return {}
+        batch_ids = [
+            self.submit(requests[i:i + MAX_BATCH_REQUESTS])
+            for i in range(0, len(requests), MAX_BATCH_REQUESTS)
+        ]
+        results = {}
+        for batch_id in batch_ids:
+            results.update(self.fetch_results(self.wait(batch_id)))
+        logger.info(f"Batch run returned {len(results)} of {len(requests)} results")
+        return results
+
+class AzureBatchClient(OpenAIBatchClient):
+    """Azure OpenAI batches address a global-batch deployment instead of a model."""
+    model_type = ModelType.AZURE
+    endpoint = "/chat/completions"
+
+    def __init__(self, api_key: str, model_name: str, additional_params: Dict[str, Any] = None):
+        additional_params = additional_params or {}
+        for param in ("api_version", "azure_endpoint", "azure_deployment"):
+            if not additional_params.get(param):
+                raise ValueError(f"{param} must be provided in additional_params.")
+        if not api_key:
+            raise ValueError("API key must be provided.")
+        self.api_key = api_key
+        self.additional_params = additional_params
+        self.model_name = AzureModelName(model_name).value
+        self.poll_interval = float(additional_params.get("batch_poll_interval", BATCH_POLL_INTERVAL))
+        self.timeout = float(additional_params.get("batch_timeout", BATCH_TIMEOUT))
+        self.client = self.create_client()
+
+    def create_client(self):
+        return AzureOpenAI(
+            api_key=self.api_key,
+            api_version=self.additional_params["api_version"],
+            azure_endpoint=self.additional_params["azure_endpoint"]
+        )
+
+    @property
+    def body_model(self) -> str:
+        return self.additional_params.get("azure_batch_deployment") or self.additional_params["azure_deployment"]
@@ -1,10 +1,13 @@
 from typing import Dict, List, Optional, Union, Any
 from common.models.base.base_model import BaseModel
-from common.models.enums.model_enums import GroqModelName
+from common.models.resilience import SDK_MAX_RETRIES
+from common.models.enums.model_enums import ModelType, GroqModelName
 from groq import Groq
 from langsmith import traceable
 
 class GroqModel(BaseModel):
+    model_type = ModelType.GROQ
+
     def __init__(self, api_key: str, model_name: str, additional_params: Dict[str, Any] = None):
         if not api_key:
             raise ValueError("API key must be provided.")
@@ -12,9 +15,10 @@ class GroqModel(BaseModel):
         
         if not additional_params:
             additional_params = {}
+        self.additional_params = additional_params
         
         self.model_name = self.validate_model_name(model_name)
-        self.client = Groq(api_key=self.api_key)
+        self.client = Groq(api_key=self.api_key, max_retries=SDK_MAX_RETRIES)
 
     @staticmethod
     def validate_model_name(model_name: str) -> str:
@@ -51,6 +55,7 @@ class GroqModel(BaseModel):
         if response_format is not None:
             params["response_format"] = response_format
 
-        response = self.client.chat.completions.create(**params)
-
-        return response.choices[0].message.content
+        return self.execute_completion(
+            params,
+            lambda: self.client.chat.completions.create(**params, **self.request_options()).choices[0].message.content
+        )
@@ -1,10 +1,14 @@
-from typing import Dict, List, Optional, Union, Any
+from typing import Dict, Iterator, List, Optional, Union, Any
 from common.models.base.base_model import BaseModel
-from common.models.enums.model_enums import MistralModelName, MistralAPIURL
+from common.models.resilience import request_timeout
+from common.models.enums.model_enums import ModelType, MistralModelName, MistralAPIURL
 from langsmith import traceable
 import requests
+import json
 
 class MistralModel(BaseModel):
+    model_type = ModelType.MISTRAL
+
     def __init__(self, api_key: str, model_name: str, additional_params: Dict[str, Any] = None):
         if not api_key:
             raise ValueError("API key must be provided.")
@@ -12,6 +16,7 @@ class MistralModel(BaseModel):
         
         if not additional_params:
             additional_params = {}
+        self.additional_params = additional_params
         
         self.model_name = self.validate_model_name(model_name)
         self.api_url = MistralAPIURL.CHAT_COMPLETIONS.value
@@ -23,6 +28,31 @@ class MistralModel(BaseModel):
         except ValueError:
             raise ValueError(f"Invalid model name. Allowed values are: {', '.join([m.value for m in MistralModelName])}")
 
+    def open_stream(self, params: Dict[str, Any]) -> Iterator[str]:
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+        response = requests.post(self.api_url, headers=headers, json=params, stream=True, timeout=request_timeout())
+        try:
+            if response.status_code != 200:
+                raise requests.HTTPError(f"Error: {response.status_code}\n{response.text}", response=response)
+
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                choices = json.loads(payload).get("choices") or []
+                content = choices[0].get("delta", {}).get("content") if choices else None
+                if content:
+                    yield content
+        finally:
+            response.close()
+
     @traceable(run_type="llm")
     def do_completion(self,
                       messages: List[Dict[str, str]],
@@ -57,10 +87,13 @@ class MistralModel(BaseModel):
         if response_format is not None:
             data["response_format"] = response_format
         
-        response = requests.post(self.api_url, headers=headers, json=data)
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result['choices'][0]['message']['content']
-        else:
-            raise Exception(f"Error: {response.status_code}\n{response.text}")
+        def request() -> str:
+            response = requests.post(self.api_url, headers=headers, json=data, timeout=request_timeout())
+            
+            if response.status_code == 200:
+                result = response.json()
+                return result['choices'][0]['message']['content']
+            else:
+                raise requests.HTTPError(f"Error: {response.status_code}\n{response.text}", response=response)
+
+        return self.execute_completion(data, request)
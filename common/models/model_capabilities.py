@@ -0,0 +1,74 @@
+from dataclasses import dataclass
+from typing import Optional, Union
+from common.models.enums.model_enums import (
+    ModelType,
+    OpenAIModelName,
+    AzureModelName,
+    GroqModelName,
+    CerebrasModelName,
+    MistralModelName
+)
+
+@dataclass(frozen=True)
+class ModelCapabilities:
+    context_window: int
+    max_output_tokens: int
+    input_fill_ratio: float
+
+    @property
+    def input_token_budget(self) -> int:
+        """Tokens of source content a single request should carry."""
+        return min(
+            int(self.context_window * self.input_fill_ratio),
+            self.context_window - self.max_output_tokens
+        )
+
+DEFAULT_CAPABILITIES = ModelCapabilities(context_window=8192, max_output_tokens=2048, input_fill_ratio=0.5)
+
+MODEL_CAPABILITIES = {
+    (ModelType.OPENAI, OpenAIModelName.GPT_3_5_TURBO): ModelCapabilities(16385, 4096, 0.5),
+    (ModelType.OPENAI, OpenAIModelName.GPT_4): ModelCapabilities(8192, 2048, 0.5),
+    (ModelType.OPENAI, OpenAIModelName.GPT_4O): ModelCapabilities(128000, 16384, 0.4),
+    (ModelType.OPENAI, OpenAIModelName.CLAUDE_3_HAIKU): ModelCapabilities(200000, 4096, 0.4),
+
+    (ModelType.AZURE, AzureModelName.GPT_35_TURBO): ModelCapabilities(16385, 4096, 0.5),
+    (ModelType.AZURE, AzureModelName.GPT_4): ModelCapabilities(8192, 2048, 0.5),
+    (ModelType.AZURE, AzureModelName.GPT_4_32K): ModelCapabilities(32768, 4096, 0.5),
+    (ModelType.AZURE, AzureModelName.GPT_4O): ModelCapabilities(128000, 16384, 0.4),
+
+    (ModelType.GROQ, GroqModelName.GEMMA2_9B): ModelCapabilities(8192, 2048, 0.5),
+    (ModelType.GROQ, GroqModelName.GEMMA_7B): ModelCapabilities(8192, 2048, 0.5),
+    (ModelType.GROQ, GroqModelName.LLAMA3_GROQ_70B_TOOL_USE): ModelCapabilities(8192, 2048, 0.5),
+    (ModelType.GROQ, GroqModelName.LLAMA3_GROQ_8B_TOOL_USE): ModelCapabilities(8192, 2048, 0.5),
+    (ModelType.GROQ, GroqModelName.LLAMA_3_1_70B): ModelCapabilities(131072, 8000, 0.4),
+    (ModelType.GROQ, GroqModelName.LLAMA_3_1_8B): ModelCapabilities(131072, 8000, 0.4),
+    (ModelType.GROQ, GroqModelName.LLAMA_GUARD_3_8B): ModelCapabilities(8192, 2048, 0.5),
+    (ModelType.GROQ, GroqModelName.LLAVA_1_5_7B): ModelCapabilities(4096, 1024, 0.5),
+    (ModelType.GROQ, GroqModelName.META_LLAMA3_70B): ModelCapabilities(8192, 2048, 0.5),
+    (ModelType.GROQ, GroqModelName.META_LLAMA3_8B): ModelCapabilities(8192, 2048, 0.5),
+    (ModelType.GROQ, GroqModelName.MIXTRAL_8X7B): ModelCapabilities(32768, 4096, 0.5),
+
+    (ModelType.CEREBRAS, CerebrasModelName.LLAMA_3_1_70B): ModelCapabilities(8192, 2048, 0.5),
+    (ModelType.CEREBRAS, CerebrasModelName.LLAMA_3_3_70B): ModelCapabilities(8192, 2048, 0.5),
+    (ModelType.CEREBRAS, CerebrasModelName.LLAMA_3_1_8B): ModelCapabilities(8192, 2048, 0.5),
+
+    (ModelType.MISTRAL, MistralModelName.MISTRAL_LARGE_LATEST): ModelCapabilities(128000, 4096, 0.4),
+}
+
+MODEL_NAME_ENUMS = {
+    ModelType.OPENAI: OpenAIModelName,
+    ModelType.AZURE: AzureModelName,
+    ModelType.GROQ: GroqModelName,
+    ModelType.CEREBRAS: CerebrasModelName,
+    ModelType.MISTRAL: MistralModelName,
+}
+
+def get_model_capabilities(model_type: Optional[Union[str, ModelType]], model_name: Optional[str]) -> ModelCapabilities:
+    """Look up a model's capabilities, falling back to conservative defaults."""
+    try:
+        model_type_enum = ModelType(model_type.lower()) if isinstance(model_type, str) else model_type
+        model_name_enum = MODEL_NAME_ENUMS[model_type_enum](model_name)
+    except (KeyError, ValueError, AttributeError):
+        return DEFAULT_CAPABILITIES
+
+    return MODEL_CAPABILITIES.get((model_type_enum, model_name_enum), DEFAULT_CAPABILITIES)
@@ -1,15 +1,34 @@
+import hashlib
+import json
 import logging
-from typing import Dict, Any
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, Any
 from common.models.enums.model_enums import ModelType, OpenAIModelName, AzureModelName, GroqModelName, CerebrasModelName, MistralModelName
 from common.models.openai_model import OpenaiModel
 from common.models.azure_model import AzureModel
 from common.models.groq_model import GroqModel
 from common.models.cerebras_model import CerebrasModel
 from common.models.mistral_model import MistralModel
+from common.models.batch_client import OpenAIBatchClient, AzureBatchClient
 
 logger = logging.getLogger(__name__)
 
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "32"))
+
+_client_cache: "OrderedDict[str, Any]" = OrderedDict()
+
 class ModelFactory:
+    @staticmethod
+    def get_model(model_type: str, model_name: str, api_key: str, additional_params: Dict[str, Any] = None):
+        """Like ``create_model``, but reuses the instance already built for the same configuration."""
+        return get_cached_client(ModelFactory.create_model, model_type, model_name, api_key, additional_params)
+
+    @staticmethod
+    def get_batch_client(model_type: str, model_name: str, api_key: str, additional_params: Dict[str, Any] = None):
+        """Like ``create_batch_client``, but reuses the client already built for the same configuration."""
+        return get_cached_client(ModelFactory.create_batch_client, model_type, model_name, api_key, additional_params)
+
     @staticmethod
     def create_model(model_type: str, model_name: str, api_key: str, additional_params: Dict[str, Any] = None):
         if not model_type:
@@ -64,4 +83,47 @@ class ModelFactory:
             raise ValueError(f"Unsupported model type: {model_type_enum}")
         
         logger.info(f"Returning model instance of type: {model_type_enum.value}")
-        return model_instance
\ No newline at end of file
+        return model_instance
+
+    @staticmethod
+    def create_batch_client(model_type: str, model_name: str, api_key: str, additional_params: Dict[str, Any] = None):
+        """Client for the provider's offline batch API, used by the batch execution mode."""
+        if not model_type:
+            raise ValueError("model_type must be provided.")
+        if not model_name:
+            raise ValueError("model_name must be provided.")
+        if not api_key:
+            raise ValueError("API key must be provided.")
+
+        try:
+            model_type_enum = ModelType(model_type.lower())
+        except ValueError:
+            raise ValueError(f"Invalid model type. Allowed values are: {', '.join([m.value for m in ModelType])}")
+
+        batch_clients = {
+            ModelType.OPENAI: OpenAIBatchClient,
+            ModelType.AZURE: AzureBatchClient
+        }
+
+        if model_type_enum not in batch_clients:
+            raise ValueError(
+                f"Batch execution is not supported for {model_type_enum.value}. "
+                f"Supported providers: {', '.join(m.value for m in batch_clients)}"
+            )
+
+        logger.info(f"Returning batch client of type: {model_type_enum.value}")
+        return batch_clients[model_type_enum](api_key=api_key, model_name=model_name, additional_params=additional_params or {})
+
+def get_cached_client(create: Callable[..., Any], model_type: str, model_name: str, api_key: str, additional_params: Dict[str, Any] = None):
+    config = json.dumps([create.__name__, model_type, model_name, api_key, additional_params or {}], sort_keys=True, default=str)
+    key = hashlib.sha256(config.encode()).hexdigest()
+    client = _client_cache.get(key)
+    if client is not None:
+        _client_cache.move_to_end(key)
+        return client
+
+    client = create(model_type=model_type, model_name=model_name, api_key=api_key, additional_params=additional_params)
+    _client_cache[key] = client
+    if len(_client_cache) > MODEL_CACHE_SIZE:
+        _client_cache.popitem(last=False)
+    return client
@@ -1,10 +1,13 @@
 from typing import Dict, List, Optional, Union, Any
 from common.models.base.base_model import BaseModel
-from common.models.enums.model_enums import OpenAIModelName
+from common.models.resilience import SDK_MAX_RETRIES
+from common.models.enums.model_enums import ModelType, OpenAIModelName
 from openai import OpenAI
 from langsmith import traceable
 
 class OpenaiModel(BaseModel):
+    model_type = ModelType.OPENAI
+
     def __init__(self, api_key: str, model_name: str, additional_params: Dict[str, Any] = None):
         if not api_key:
             raise ValueError("API key must be provided.")
@@ -12,11 +15,12 @@ class OpenaiModel(BaseModel):
         
         if not additional_params:
             additional_params = {}
+        self.additional_params = additional_params
         
         self.model_name = self.validate_model_name(model_name)
         self.base_url = additional_params.get('base_url')
         
-        client_params = {'api_key': self.api_key}
+        client_params = {'api_key': self.api_key, 'max_retries': SDK_MAX_RETRIES}
         if self.base_url:
             client_params['base_url'] = self.base_url
         
@@ -60,6 +64,7 @@ class OpenaiModel(BaseModel):
         if response_format is not None:
             params["response_format"] = response_format
         
-        response = self.client.chat.completions.create(**params)
-        
-        return response.choices[0].message.content
+        return self.execute_completion(
+            params,
+            lambda: self.client.chat.completions.create(**params, **self.request_options()).choices[0].message.content
+        )
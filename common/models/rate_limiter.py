@@ -0,0 +1,263 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple, Union
+from common.models.enums.model_enums import ModelType
+from common.redis.redis_config import get_sync_redis_connection
+
+logger = logging.getLogger(__name__)
+
+# Requests and tokens per minute used when neither the environment nor the
+# job's additional_params configure a limit. They sit at typical paid-tier
+# quotas; the adaptive concurrency controller absorbs the difference.
+DEFAULT_RATE_LIMITS = {
+    ModelType.OPENAI: (5000, 800000),
+    ModelType.AZURE: (1000, 150000),
+    ModelType.GROQ: (1000, 200000),
+    ModelType.CEREBRAS: (600, 500000),
+    ModelType.MISTRAL: (300, 500000),
+}
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "32"))
+MIN_CONCURRENCY = 1
+LATENCY_TARGET_SECONDS = float(os.getenv("RATE_LIMIT_LATENCY_TARGET", "30"))
+SHARED_RATE_LIMITS = os.getenv("RATE_LIMIT_SHARED", "false").lower() == "true"
+THROTTLE_COOLDOWN_SECONDS = 5.0
+
+def get_status_code(error: Exception) -> Optional[int]:
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return get_status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, from the Retry-After header if present."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header in ("retry-after-ms", "retry-after"):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            continue
+        return seconds / 1000 if header == "retry-after-ms" else seconds
+    return None
+
+class TokenBucket:
+    """Thread-safe bucket refilled continuously at ``capacity`` units per minute."""
+    def __init__(self, capacity: int):
+        self.capacity = float(capacity)
+        self.available = float(capacity)
+        self.refill_rate = capacity / 60.0
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_capacity(self, capacity: int) -> None:
+        with self.lock:
+            self.capacity = float(capacity)
+            self.available = min(self.available, self.capacity)
+            self.refill_rate = capacity / 60.0
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` units and return how long the caller must wait before using them."""
+        amount = min(amount, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self.available = min(self.capacity, self.available + (now - self.updated_at) * self.refill_rate)
+            self.updated_at = now
+            self.available -= amount
+            if self.available >= 0:
+                return 0.0
+            return -self.available / self.refill_rate
+
+class RedisWindowCounter:
+    """Per-minute request and token counters shared by every worker through Redis."""
+    def __init__(self, key_prefix: str, limit: int):
+        self.key_prefix = key_prefix
+        self.limit = limit
+
+    def reserve(self, amount: int) -> float:
+        redis = get_sync_redis_connection()
+        now = time.time()
+        window = int(now // 60)
+        key = f"{self.key_prefix}:{window}"
+        used = redis.incrby(key, amount)
+        if used == amount:
+            redis.expire(key, 120)
+        if used <= self.limit or used == amount:
+            return 0.0
+        redis.decrby(key, amount)
+        return (window + 1) * 60 - now
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit: grow by one per window of successes, halve on throttling."""
+    def __init__(self, max_limit: int, latency_target: float):
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.limit = float(max(MIN_CONCURRENCY, max_limit // 4))
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        with self.condition:
+            if latency > self.latency_target:
+                self.limit = max(MIN_CONCURRENCY, self.limit * 0.9)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+            self.condition.notify_all()
+
+    def on_throttle(self) -> None:
+        with self.condition:
+            self.limit = max(MIN_CONCURRENCY, self.limit / 2)
+            logger.warning(f"Provider throttled, concurrency limit reduced to {int(self.limit)}")
+
+    def set_max_limit(self, max_limit: int) -> None:
+        with self.condition:
+            self.max_limit = max_limit
+            self.limit = min(self.limit, float(max_limit))
+            self.condition.notify_all()
+
+class ProviderRateLimiter:
+    def __init__(self, provider: str, model_name: str, requests_per_minute: int, tokens_per_minute: int,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, shared: bool = SHARED_RATE_LIMITS,
+                 key_hash: str = ""):
+        self.provider = provider
+        self.model_name = model_name
+        self.shared = shared
+        self.limits = (requests_per_minute, tokens_per_minute, max_concurrency)
+        self.key_prefix = f"rate-limit:{provider}:{model_name}:{key_hash}" if key_hash else f"rate-limit:{provider}:{model_name}"
+        if shared:
+            self.requests = RedisWindowCounter(f"{self.key_prefix}:requests", requests_per_minute)
+            self.tokens = RedisWindowCounter(f"{self.key_prefix}:tokens", tokens_per_minute)
+        else:
+            self.requests = TokenBucket(requests_per_minute)
+            self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(max_concurrency, LATENCY_TARGET_SECONDS)
+        self.cooldown_until = 0.0
+
+    def set_limits(self, requests_per_minute: int, tokens_per_minute: int, max_concurrency: int) -> None:
+        if self.shared:
+            self.requests.limit = requests_per_minute
+            self.tokens.limit = tokens_per_minute
+        else:
+            self.requests.set_capacity(requests_per_minute)
+            self.tokens.set_capacity(tokens_per_minute)
+        self.concurrency.set_max_limit(max_concurrency)
+        self.limits = (requests_per_minute, tokens_per_minute, max_concurrency)
+
+    def wait_for_capacity(self, estimated_tokens: int) -> None:
+        self.wait_for_cooldown()
+        if self.shared:
+            # Shared counters only hold a reservation once it fits in the current window.
+            for counter, amount in ((self.requests, 1), (self.tokens, estimated_tokens)):
+                wait = counter.reserve(amount)
+                while wait > 0:
+                    logger.info(f"Shared rate limit reached for {self.provider}/{self.model_name}, waiting {wait:.2f}s")
+                    time.sleep(wait)
+                    wait = counter.reserve(amount)
+            return
+
+        wait = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+        if wait > 0:
+            logger.info(f"Rate limit reached for {self.provider}/{self.model_name}, waiting {wait:.2f}s")
+            time.sleep(wait)
+
+    def wait_for_cooldown(self) -> None:
+        remaining = self.cooldown_until - time.monotonic()
+        if self.shared:
+            try:
+                ttl_ms = get_sync_redis_connection().pttl(f"{self.key_prefix}:cooldown")
+                if ttl_ms and ttl_ms > 0:
+                    remaining = max(remaining, ttl_ms / 1000)
+            except Exception as e:
+                logger.error(f"Failed to read shared rate limit cooldown: {e}")
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def start_cooldown(self, seconds: float) -> None:
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + seconds)
+        if self.shared:
+            try:
+                get_sync_redis_connection().set(f"{self.key_prefix}:cooldown", 1, px=int(seconds * 1000))
+            except Exception as e:
+                logger.error(f"Failed to publish shared rate limit cooldown: {e}")
+
+    @contextmanager
+    def limit(self, estimated_tokens: int):
+        self.wait_for_capacity(estimated_tokens)
+        self.concurrency.acquire()
+        start_time = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.concurrency.on_throttle()
+                self.start_cooldown(get_retry_after(e) or THROTTLE_COOLDOWN_SECONDS)
+            raise
+        else:
+            self.concurrency.on_success(time.monotonic() - start_time)
+        finally:
+            self.concurrency.release()
+
+RATE_LIMIT_PARAMS = ("requests_per_minute", "tokens_per_minute", "max_concurrency")
+
+_limiters: Dict[Tuple[str, str, str], ProviderRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def resolve_rate_limits(model_type: ModelType, additional_params: Optional[Dict[str, Any]] = None) -> Tuple[int, int, int]:
+    """Limits from additional_params, then the environment, then the provider defaults."""
+    additional_params = additional_params or {}
+    default_rpm, default_tpm = DEFAULT_RATE_LIMITS.get(model_type, (1000, 200000))
+    rpm = additional_params.get("requests_per_minute") or os.getenv("RATE_LIMIT_RPM") or default_rpm
+    tpm = additional_params.get("tokens_per_minute") or os.getenv("RATE_LIMIT_TPM") or default_tpm
+    max_concurrency = additional_params.get("max_concurrency") or DEFAULT_MAX_CONCURRENCY
+    return int(rpm), int(tpm), int(max_concurrency)
+
+def get_api_key_hash(api_key: Optional[str]) -> str:
+    """Short digest identifying an API key, so limiters and their Redis keys never hold the key itself."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16] if api_key else ""
+
+def get_rate_limiter(
+    model_type: Union[str, ModelType], model_name: str,
+    additional_params: Optional[Dict[str, Any]] = None, api_key: Optional[str] = None
+) -> ProviderRateLimiter:
+    """Process-wide limiter for a provider, model and API key, created on first use.
+
+    Provider quotas belong to the key, so jobs with different keys never share
+    a limiter. Limits set in a job's additional_params replace the limiter's
+    current ones; jobs that set none leave them as they are.
+    """
+    model_type_enum = ModelType(model_type.lower()) if isinstance(model_type, str) else model_type
+    key_hash = get_api_key_hash(api_key)
+    key = (model_type_enum.value, model_name, key_hash)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            rpm, tpm, max_concurrency = resolve_rate_limits(model_type_enum, additional_params)
+            limiter = ProviderRateLimiter(model_type_enum.value, model_name, rpm, tpm, max_concurrency, key_hash=key_hash)
+            _limiters[key] = limiter
+            logger.info(f"Created rate limiter for {key}: {rpm} RPM, {tpm} TPM, max concurrency {max_concurrency}")
+        elif any((additional_params or {}).get(name) for name in RATE_LIMIT_PARAMS):
+            limits = resolve_rate_limits(model_type_enum, additional_params)
+            if limits != limiter.limits:
+                limiter.set_limits(*limits)
+                logger.info(f"Updated rate limiter for {key}: {limits[0]} RPM, {limits[1]} TPM, max concurrency {limits[2]}")
+        return limiter
@@ -0,0 +1,200 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+from common.models.rate_limiter import get_retry_after, get_status_code
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = ("Timeout", "Connection", "RateLimit", "InternalServer", "ServiceUnavailable")
+
+# Provider SDK clients are built with retries off: ``resilient_call`` retries
+# under the rate limiter, while SDK retries would send requests it never charged.
+SDK_MAX_RETRIES = 0
+
+completion_executor = ThreadPoolExecutor(max_workers=int(os.getenv("COMPLETION_THREADS", "64")), thread_name_prefix="completion")
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+class AttemptAbandoned(Exception):
+    """Raised inside a request whose result is no longer wanted."""
+
+class Attempt:
+    """State shared with the requests of one attempt running on the completion pool.
+
+    Once the attempt has a result, or has run out of time, the requests still
+    running are abandoned: ``check_abandoned`` stops them before they take a
+    limiter slot or between streamed deltas, and ``request_timeout`` bounds the
+    provider call they are blocked in by the attempt's deadline.
+    """
+    def __init__(self, deadline_at: Optional[float]):
+        self.deadline_at = deadline_at
+        self.abandoned = threading.Event()
+
+_current = threading.local()
+
+def current_attempt() -> Optional[Attempt]:
+    return getattr(_current, "attempt", None)
+
+def check_abandoned() -> None:
+    attempt = current_attempt()
+    if attempt is not None and attempt.abandoned.is_set():
+        raise AttemptAbandoned("Completion attempt abandoned")
+
+def request_timeout() -> Optional[float]:
+    """Seconds left for the current request before its attempt's deadline, if it has one."""
+    attempt = current_attempt()
+    if attempt is None or attempt.deadline_at is None:
+        return None
+    return max(attempt.deadline_at - time.monotonic(), 0.001)
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = int(os.getenv("COMPLETION_MAX_ATTEMPTS", "4"))
+    base_delay: float = float(os.getenv("COMPLETION_RETRY_BASE_DELAY", "1.0"))
+    max_delay: float = float(os.getenv("COMPLETION_RETRY_MAX_DELAY", "30.0"))
+    deadline: Optional[float] = float(os.getenv("COMPLETION_DEADLINE_SECONDS", "300"))
+    hedge: bool = os.getenv("COMPLETION_HEDGING", "false").lower() == "true"
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20
+
+    @classmethod
+    def from_params(cls, additional_params: Optional[Dict[str, Any]] = None) -> "RetryPolicy":
+        """Build a policy from a job's additional_params, whose values may arrive as strings."""
+        additional_params = additional_params or {}
+        policy = cls()
+        if additional_params.get("max_attempts") is not None:
+            policy.max_attempts = max(1, int(additional_params["max_attempts"]))
+        if additional_params.get("completion_deadline") is not None:
+            policy.deadline = float(additional_params["completion_deadline"])
+        if additional_params.get("hedge_requests") is not None:
+            policy.hedge = str(additional_params["hedge_requests"]).lower() == "true"
+        return policy
+
+class LatencyTracker:
+    """Rolling window of successful request latencies for one provider and model."""
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        with self.lock:
+            self.samples.append(latency)
+
+    def quantile(self, q: float, min_samples: int) -> Optional[float]:
+        with self.lock:
+            if len(self.samples) < min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+_trackers: Dict[Tuple[str, str], LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+
+def get_latency_tracker(provider: str, model_name: str) -> LatencyTracker:
+    with _trackers_lock:
+        return _trackers.setdefault((provider, model_name), LatencyTracker())
+
+def is_retryable_error(error: Exception) -> bool:
+    if isinstance(error, DeadlineExceeded):
+        return False
+    status_code = get_status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (TimeoutError, ConnectionError)) or any(
+        name in type(error).__name__ for name in RETRYABLE_ERROR_NAMES
+    )
+
+def backoff_delay(attempt: int, policy: RetryPolicy, error: Exception) -> float:
+    """Full-jitter exponential backoff, unless the provider told us how long to wait."""
+    retry_after = get_retry_after(error)
+    if retry_after is not None:
+        return min(retry_after, policy.max_delay)
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * (2 ** attempt)))
+
+def remaining_time(deadline_at: Optional[float]) -> Optional[float]:
+    if deadline_at is None:
+        return None
+    remaining = deadline_at - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("Completion deadline exceeded")
+    return remaining
+
+def timed_request(request: Callable[[], str], tracker: LatencyTracker, attempt: Optional[Attempt] = None) -> str:
+    _current.attempt = attempt
+    try:
+        check_abandoned()
+        start_time = time.monotonic()
+        result = request()
+        tracker.record(time.monotonic() - start_time)
+        return result
+    finally:
+        _current.attempt = None
+
+def abandon(attempt: Attempt, futures) -> None:
+    """Drop the requests of an attempt that are no longer wanted.
+
+    Queued requests are cancelled outright; running ones stop at their next
+    ``check_abandoned`` or when their request timeout runs out.
+    """
+    attempt.abandoned.set()
+    for future in futures:
+        future.cancel()
+
+def run_attempt(request: Callable[[], str], policy: RetryPolicy, tracker: LatencyTracker, deadline_at: Optional[float]) -> str:
+    """One attempt, hedged with a duplicate request if the first outlives the p95 latency."""
+    hedge_after = tracker.quantile(policy.hedge_quantile, policy.hedge_min_samples) if policy.hedge else None
+
+    if hedge_after is None and deadline_at is None:
+        return timed_request(request, tracker)
+
+    attempt = Attempt(deadline_at)
+    pending = {completion_executor.submit(timed_request, request, tracker, attempt)}
+    try:
+        if hedge_after is not None:
+            timeout = hedge_after if deadline_at is None else min(hedge_after, remaining_time(deadline_at))
+            done, _ = wait(pending, timeout=timeout)
+            if not done:
+                logger.info(f"Request exceeded p95 latency of {hedge_after:.2f}s, sending hedged request")
+                pending.add(completion_executor.submit(timed_request, request, tracker, attempt))
+
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=remaining_time(deadline_at), return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded("Completion deadline exceeded")
+            for future in done:
+                try:
+                    return future.result()
+                except FutureTimeoutError:
+                    raise DeadlineExceeded("Completion deadline exceeded")
+                except Exception as e:
+                    last_error = e
+        raise last_error
+    finally:
+        # The losing hedge, or every request once the deadline has passed.
+        abandon(attempt, pending)
+
+def resilient_call(request: Callable[[], str], policy: RetryPolicy, tracker: LatencyTracker) -> str:
+    """Call ``request`` with retries, optional hedging and an overall deadline."""
+    deadline_at = time.monotonic() + policy.deadline if policy.deadline else None
+
+    for attempt in range(policy.max_attempts):
+        try:
+            return run_attempt(request, policy, tracker, deadline_at)
+        except Exception as e:
+            if attempt == policy.max_attempts - 1 or not is_retryable_error(e):
+                raise
+            delay = backoff_delay(attempt, policy, e)
+            if deadline_at is not None and time.monotonic() + delay >= deadline_at:
+                raise
+            logger.warning(f"Completion attempt {attempt + 1} failed ({type(e).__name__}: {e}), retrying in {delay:.2f}s")
+            time.sleep(delay)
@@ -0,0 +1,76 @@
+import os
+import time
+from typing import List, Tuple, Union
+from redis.asyncio import Redis
+
+BATCH_COLLECT_TIMEOUT = float(os.getenv("BATCH_COLLECT_TIMEOUT", "300"))
+BATCH_COLLECT_POLL_MS = 1000
+BATCH_GROUP_TTL = 86400
+
+def get_batch_workload_count_key(batch_group: str) -> str:
+    return f"batch-workload-count:{batch_group}"
+
+def decode(value: Union[str, bytes]) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+class BatchCollector:
+    """Groups batch-mode stream messages by batch group until all of the group's workloads have arrived.
+
+    A batch group is a job, or every job of a bulk submission. The pipeline
+    records how many workloads it queued in batch mode for the group; a group
+    is released once that many messages are collected, or ``timeout`` seconds
+    after its first one so that workloads which failed upstream cannot hold
+    it back forever.
+
+    Collected payloads are kept in Redis under ``batch-group:{name}:{group}``
+    rather than in memory, since the worker has already moved its stream
+    position past them: a restarted worker picks up the groups its
+    predecessor was collecting.
+    """
+    def __init__(self, name: str, timeout: float = BATCH_COLLECT_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        # Groups left behind by an earlier run are found on the first poll.
+        self.pending = True
+
+    @property
+    def index_key(self) -> str:
+        return f"batch-groups:{self.name}"
+
+    def get_group_key(self, batch_group: str) -> str:
+        return f"batch-group:{self.name}:{batch_group}"
+
+    async def add(self, redis: Redis, batch_group: str, payload: str) -> None:
+        pipe = redis.pipeline(transaction=True)
+        pipe.rpush(self.get_group_key(batch_group), payload)
+        pipe.expire(self.get_group_key(batch_group), BATCH_GROUP_TTL)
+        pipe.zadd(self.index_key, {batch_group: time.time()}, nx=True)
+        await pipe.execute()
+        self.pending = True
+
+    @property
+    def block_ms(self) -> int:
+        """XREAD block time: wake up periodically while groups are pending."""
+        return BATCH_COLLECT_POLL_MS if self.pending else 0
+
+    async def pop_ready(self, redis: Redis) -> List[Tuple[str, List[str]]]:
+        """Remove and return the groups that are complete or timed out, with their payloads in arrival order."""
+        groups = await redis.zrange(self.index_key, 0, -1, withscores=True)
+        ready = []
+        released = 0
+        for batch_group, first_seen in groups:
+            batch_group = decode(batch_group)
+            expected = await redis.get(get_batch_workload_count_key(batch_group))
+            collected = await redis.llen(self.get_group_key(batch_group))
+            if (expected is not None and collected >= int(expected)) or time.time() - first_seen > self.timeout:
+                pipe = redis.pipeline(transaction=True)
+                pipe.lrange(self.get_group_key(batch_group), 0, -1)
+                pipe.delete(self.get_group_key(batch_group))
+                pipe.zrem(self.index_key, batch_group)
+                payloads, _, _ = await pipe.execute()
+                released += 1
+                # A group whose payloads expired leaves only its index entry behind.
+                if payloads:
+                    ready.append((batch_group, [decode(payload) for payload in payloads]))
+        self.pending = len(groups) > released
+        return ready
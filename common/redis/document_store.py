@@ -0,0 +1,67 @@
+"""Document content, stored once per distinct content under ``blob:{sha256}``.
+
+Blobs hold the base64 encoding of the document bytes, which is what the
+extraction worker reads. Every job that ingests the same bytes points its
+workload at the same blob and refreshes its TTL; none of them copies it.
+
+Documents uploaded ahead of a pipeline run are written to a temporary key in
+fixed-size chunks and renamed to their blob once complete, so readers never
+see part of a document. ``document-info:{document_id}`` maps the upload's ID
+to the blob's SHA-256 and records its size and page count.
+"""
+import base64
+import hashlib
+import os
+from typing import IO, Dict, Optional
+from redis.asyncio import Redis
+
+DOCUMENT_TTL = int(os.getenv("DOCUMENT_TTL", "86400"))
+# Long enough to outlive a batch-mode job, which waits on two provider batches.
+BLOB_TTL = int(os.getenv("BLOB_TTL", "259200"))
+# A multiple of 3 bytes, so the base64 chunks concatenate into one valid encoding.
+DOCUMENT_CHUNK_SIZE = 3 * 256 * 1024
+
+def get_document_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+def get_blob_key(document_hash: str) -> str:
+    return f"blob:{document_hash}"
+
+def get_document_info_key(document_id: str) -> str:
+    return f"document-info:{document_id}"
+
+async def store_blob(redis: Redis, document_hash: str, encoded_content: str) -> str:
+    """Store base64 content under its hash unless it is already there; returns the blob key.
+
+    Works on a pipeline too, where the commands are only queued.
+    """
+    key = get_blob_key(document_hash)
+    await redis.set(key, encoded_content, nx=True, ex=BLOB_TTL)
+    await redis.expire(key, BLOB_TTL)
+    return key
+
+async def write_document(redis: Redis, document_id: str, stream: IO[bytes], info: Dict[str, str]) -> None:
+    """Append ``stream`` to its blob chunk by chunk, unless the blob exists, and record ``info``."""
+    blob_key = get_blob_key(info["sha256"])
+    if not await redis.exists(blob_key):
+        upload_key = f"document-upload:{document_id}"
+        try:
+            while chunk := stream.read(DOCUMENT_CHUNK_SIZE):
+                await redis.append(upload_key, base64.b64encode(chunk))
+                await redis.expire(upload_key, DOCUMENT_TTL)
+            # Another upload of the same bytes may have finished first; its blob is identical.
+            if not await redis.renamenx(upload_key, blob_key):
+                await redis.delete(upload_key)
+        except BaseException:
+            await redis.delete(upload_key)
+            raise
+
+    pipe = redis.pipeline(transaction=True)
+    pipe.expire(blob_key, BLOB_TTL)
+    pipe.hset(get_document_info_key(document_id), mapping=info)
+    pipe.expire(get_document_info_key(document_id), DOCUMENT_TTL)
+    await pipe.execute()
+
+async def load_document_info(redis: Redis, document_id: str) -> Optional[Dict[str, str]]:
+    info = await redis.hgetall(get_document_info_key(document_id))
+    return info or None
@@ -0,0 +1,54 @@
+"""Where a job's final result lives once the transformation worker completes it.
+
+Each workload's result is kept as one field of ``job-workload-results:{task_id}``
+until the last workload reports; they are then merged, in workload order, and
+written once to ``job-result:{task_id}``. ``job-status`` entries only carry
+the status and, per workload, that workload's own result.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from redis.asyncio import Redis
+from common.redis.job_timeline import workload_index
+
+WORKLOAD_RESULTS_TTL = int(os.getenv("WORKLOAD_RESULTS_TTL", "86400"))
+
+def get_job_result_key(task_id: str) -> str:
+    return f"job-result:{task_id}"
+
+async def store_job_result(redis: Redis, task_id: str, serialized_result: str) -> None:
+    await redis.set(get_job_result_key(task_id), serialized_result)
+
+async def load_job_result(redis: Redis, task_id: str) -> Optional[Dict[str, Any]]:
+    serialized_result = await redis.get(get_job_result_key(task_id))
+    return json.loads(serialized_result) if serialized_result else None
+
+def get_workload_results_key(task_id: str) -> str:
+    return f"job-workload-results:{task_id}"
+
+async def add_workload_result(redis: Redis, task_id: str, workload_key: str, serialized_result: str) -> Tuple[bool, int]:
+    """Store one workload's result; returns whether it was new and how many workloads have reported."""
+    key = get_workload_results_key(task_id)
+    pipe = redis.pipeline(transaction=True)
+    pipe.hsetnx(key, workload_key, serialized_result)
+    pipe.hlen(key)
+    pipe.expire(key, WORKLOAD_RESULTS_TTL)
+    added, completed, _ = await pipe.execute()
+    return bool(added), completed
+
+async def pop_workload_results(redis: Redis, task_id: str) -> List[Dict[str, Any]]:
+    """All workload results of a job in workload order, removing them from Redis."""
+    key = get_workload_results_key(task_id)
+    pipe = redis.pipeline(transaction=True)
+    pipe.hgetall(key)
+    pipe.delete(key)
+    entries, _ = await pipe.execute()
+    results = {
+        (workload_key.decode("utf-8") if isinstance(workload_key, bytes) else workload_key): serialized_result
+        for workload_key, serialized_result in entries.items()
+    }
+    return [json.loads(results[workload_key]) for workload_key in sorted(results, key=workload_order)]
+
+def workload_order(workload_key: str) -> Tuple[int, str]:
+    index = workload_index(workload_key)
+    return (index if index is not None else -1, workload_key)
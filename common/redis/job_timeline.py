@@ -0,0 +1,180 @@
+"""Per-job event timeline kept in the ``job-timeline:{task_id}`` stream.
+
+Workers buffer a job's spans in a ``JobTimeline`` and append them to the
+stream whenever the job reports progress and when it finishes; the pipeline
+serves them at ``/pipelines/{task_id}/timeline``. Each event records the
+service and stage, the page or batch it covered, its start and end in epoch
+milliseconds, and the LLM calls and tokens spent inside it.
+
+Code that has no timeline in scope (tests, benchmarks, the Celery path) can
+call ``timeline_span`` freely; it does nothing there.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import RedisError
+from common.metrics.llm_usage import LLMUsage, track_llm_usage
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_TTL = int(os.getenv("JOB_TIMELINE_TTL", "86400"))
+TIMELINE_MAXLEN = 20000
+INTEGER_FIELDS = (
+    "index", "start_ms", "end_ms", "duration_ms",
+    "llm_calls", "cached_llm_calls", "prompt_tokens", "completion_tokens"
+)
+
+def get_job_timeline_key(task_id: str) -> str:
+    return f"job-timeline:{task_id}"
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+def workload_index(document_key: str) -> Optional[int]:
+    """Workload index of a ``{kind}:{task_id}:{index}`` document key written by the pipeline."""
+    match = re.search(r":(\d+)$", document_key or "")
+    return int(match.group(1)) if match else None
+
+class JobTimeline:
+    def __init__(self, task_id: str, service: str):
+        self.task_id = task_id
+        self.service = service
+        self.events: List[Dict[str, str]] = []
+        self.lock = threading.Lock()
+
+    def add_event(
+        self, stage, start_ms: int, end_ms: int, index: Optional[int] = None,
+        status: str = "completed", usage: Optional[LLMUsage] = None, **detail: Any
+    ) -> None:
+        event = {
+            "service": self.service,
+            "stage": str(getattr(stage, "value", stage)),
+            "status": status,
+            "start_ms": str(start_ms),
+            "end_ms": str(end_ms),
+            "duration_ms": str(end_ms - start_ms),
+        }
+        if index is not None:
+            event["index"] = str(index)
+        if usage is not None:
+            event.update({
+                "llm_calls": str(usage.llm_calls),
+                "cached_llm_calls": str(usage.cached_calls),
+                "prompt_tokens": str(usage.prompt_tokens),
+                "completion_tokens": str(usage.completion_tokens),
+            })
+        if detail:
+            event["detail"] = json.dumps(detail, default=str)
+        with self.lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, stage, index: Optional[int] = None, **detail: Any) -> Iterator[LLMUsage]:
+        """Record the enclosed block as one event, with the LLM usage it caused."""
+        start_ms = now_ms()
+        status = "completed"
+        with track_llm_usage() as usage:
+            try:
+                yield usage
+            except BaseException:
+                status = "failed"
+                raise
+            finally:
+                self.add_event(stage, start_ms, now_ms(), index, status, usage, **detail)
+
+    def queue_events(self, pipe: Pipeline) -> int:
+        """Move the buffered events onto ``pipe``; returns how many were queued."""
+        with self.lock:
+            events, self.events = self.events, []
+        if not events:
+            return 0
+        key = get_job_timeline_key(self.task_id)
+        for event in events:
+            pipe.xadd(key, event, maxlen=TIMELINE_MAXLEN, approximate=True)
+        pipe.expire(key, TIMELINE_TTL)
+        return len(events)
+
+    async def flush(self, redis: Redis) -> None:
+        pipe = redis.pipeline(transaction=False)
+        count = self.queue_events(pipe)
+        if not count:
+            return
+        try:
+            await pipe.execute()
+        except RedisError as e:
+            logger.error(f"Failed to write {count} timeline events for task {self.task_id}: {e}")
+
+_current_timeline: ContextVar[Optional[JobTimeline]] = ContextVar("job_timeline", default=None)
+
+@contextmanager
+def use_timeline(timeline: JobTimeline) -> Iterator[JobTimeline]:
+    token = _current_timeline.set(timeline)
+    try:
+        yield timeline
+    finally:
+        _current_timeline.reset(token)
+
+def current_timeline() -> Optional[JobTimeline]:
+    return _current_timeline.get()
+
+def timeline_span(stage, index: Optional[int] = None, **detail: Any):
+    timeline = _current_timeline.get()
+    return timeline.span(stage, index, **detail) if timeline else nullcontext()
+
+async def flush_timeline(redis: Redis) -> None:
+    timeline = _current_timeline.get()
+    if timeline:
+        await timeline.flush(redis)
+
+async def record_span(
+    redis: Redis, task_ids: List[str], service: str, stage, start_ms: int, status: str = "completed", **detail: Any
+) -> None:
+    """Add one span, ending now, to the timeline of each of ``task_ids``."""
+    end_ms = now_ms()
+    for task_id in task_ids:
+        timeline = JobTimeline(task_id, service)
+        timeline.add_event(stage, start_ms, end_ms, status=status, **detail)
+        await timeline.flush(redis)
+
+def parse_timeline_event(event_id, fields: Dict) -> Dict[str, Any]:
+    event: Dict[str, Any] = {
+        (key.decode("utf-8") if isinstance(key, bytes) else key): (value.decode("utf-8") if isinstance(value, bytes) else value)
+        for key, value in fields.items()
+    }
+    event["id"] = event_id.decode("utf-8") if isinstance(event_id, bytes) else event_id
+    for key in INTEGER_FIELDS:
+        if key in event:
+            event[key] = int(event[key])
+    if "detail" in event:
+        event["detail"] = json.loads(event["detail"])
+    return event
+
+async def read_timeline(redis: Redis, task_id: str) -> List[Dict[str, Any]]:
+    """All events of a job, ordered by start time."""
+    entries = await redis.xrange(get_job_timeline_key(task_id))
+    events = [parse_timeline_event(event_id, fields) for event_id, fields in entries]
+    return sorted(events, key=lambda event: (event["start_ms"], event["end_ms"]))
+
+def summarize_timeline(events: List[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+    """Per-stage totals: event count, summed and longest duration, LLM calls and tokens."""
+    stages: Dict[str, Dict[str, int]] = {}
+    for event in events:
+        summary = stages.setdefault(event["stage"], {
+            "events": 0, "failed": 0, "total_ms": 0, "max_ms": 0,
+            "llm_calls": 0, "cached_llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+        })
+        summary["events"] += 1
+        summary["failed"] += event.get("status") == "failed"
+        summary["total_ms"] += event.get("duration_ms", 0)
+        summary["max_ms"] = max(summary["max_ms"], event.get("duration_ms", 0))
+        for key in ("llm_calls", "cached_llm_calls", "prompt_tokens", "completion_tokens"):
+            summary[key] += event.get(key, 0)
+    return stages
@@ -0,0 +1,39 @@
+"""Model configuration of each job, kept under ``model-details:{task_id}``.
+
+The pipeline stores it when a job is submitted; every stream message carries
+its job's task ID, so workers look the configuration up by that. It never
+changes during a job, so each process keeps the configurations it has read
+and only goes to Redis for jobs it has not seen yet.
+"""
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from redis.asyncio import Redis
+
+# Long enough to outlive a batch-mode job, which waits on two provider batches.
+MODEL_DETAILS_TTL = int(os.getenv("MODEL_DETAILS_TTL", "259200"))
+MODEL_DETAILS_CACHE_SIZE = 1024
+
+_model_details_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+def get_model_details_key(task_id: str) -> str:
+    return f"model-details:{task_id}"
+
+async def store_model_details(redis: Redis, task_id: str, model_details: Dict[str, Any]) -> None:
+    await redis.set(get_model_details_key(task_id), json.dumps(model_details), ex=MODEL_DETAILS_TTL)
+
+async def load_model_details(redis: Redis, task_id: str) -> Optional[Dict[str, Any]]:
+    model_details = _model_details_cache.get(task_id)
+    if model_details is not None:
+        _model_details_cache.move_to_end(task_id)
+        return model_details
+
+    model_details_json = await redis.get(get_model_details_key(task_id))
+    if not model_details_json:
+        return None
+    model_details = json.loads(model_details_json)
+    _model_details_cache[task_id] = model_details
+    if len(_model_details_cache) > MODEL_DETAILS_CACHE_SIZE:
+        _model_details_cache.popitem(last=False)
+    return model_details
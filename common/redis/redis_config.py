@@ -1,3 +1,4 @@
+import redis as sync_redis
 import redis.asyncio as redis
 from redis.asyncio import ConnectionPool
 import os
@@ -13,7 +14,20 @@ class RedisClient:
     def pipeline(self):
         return self.client.pipeline()
 
+class SyncRedisClient:
+    """Blocking client for code that runs outside the event loop (Celery tasks, worker threads)."""
+    def __init__(self):
+        self.host = os.getenv('REDIS_HOST', '127.0.0.1')
+        self.port = os.getenv('REDIS_PORT', 6379)
+        self.db = os.getenv('REDIS_DB', 0)
+        self.pool = sync_redis.ConnectionPool(host=self.host, port=self.port, db=self.db)
+        self.client = sync_redis.Redis(connection_pool=self.pool)
+
 redis_client = RedisClient().client
+sync_redis_client = SyncRedisClient().client
 
 async def get_redis_connection():
     return redis_client
+
+def get_sync_redis_connection():
+    return sync_redis_client
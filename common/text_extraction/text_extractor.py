@@ -1,5 +1,6 @@
 import PyPDF2
-from typing import List
+import tempfile
+from typing import AsyncIterator, List, Dict, NamedTuple, Tuple
 from io import BytesIO
 import logging
 from dotenv import load_dotenv
@@ -12,11 +13,29 @@ from common.prompts.prompt_enums import PromptType
 import json
 from datetime import datetime
 from common.redis.redis_config import get_redis_connection
+from common.models.batch_client import BatchRequest
+from common.metrics.pipeline_metrics import Stage, stage_timer
+from common.metrics.llm_usage import in_current_context
+from common.redis.job_timeline import timeline_span
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# The relevance verdict is read from the start of the response, so generation
+# can stop once that window is filled or already contains the answer.
+RELEVANCE_WINDOW = 20
+RELEVANCE_MAX_TOKENS = 16
+
+def relevance_decided(text: str) -> bool:
+    return len(text) >= RELEVANCE_WINDOW or "yes" in text.lower()
+
+class PageVerdict(NamedTuple):
+    page_number: int
+    page_text: str
+    schema_indices: List[int]
+    total_pages: int
+
 def get_pdf_page_count(pdf_stream):
     try:
         pdf_reader = PyPDF2.PdfReader(pdf_stream)
@@ -24,18 +43,18 @@ def get_pdf_page_count(pdf_stream):
     except PyPDF2.errors.PdfReadError as e:
         raise PyPDF2.errors.PdfReadError(f"Error reading PDF file: {str(e)}")
     
-def extract_page_as_markdown(file_stream: BytesIO, page_number: int) -> str:
+def extract_page_as_markdown(file_stream: BytesIO, page_number: int, reader=None) -> str:
     import os
     from PyPDF2 import PdfReader, PdfWriter
     from markitdown import MarkItDown
     
-    temp_file = "temp.pdf"
+    temp_file = None
     
     try:
         if not isinstance(page_number, int) or page_number < 0:
             raise ValueError(f"Invalid page number: {page_number}")
 
-        reader = PdfReader(file_stream)
+        reader = reader or PdfReader(file_stream)
         
         if page_number >= len(reader.pages):
             raise ValueError(f"Page number {page_number} exceeds document length of {len(reader.pages)} pages")
@@ -44,7 +63,8 @@ def extract_page_as_markdown(file_stream: BytesIO, page_number: int) -> str:
         writer.add_page(reader.pages[page_number])
         
         try:
-            with open(temp_file, 'wb') as output_file:
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as output_file:
+                temp_file = output_file.name
                 writer.write(output_file)
         except IOError as e:
             raise IOError(f"Failed to write temporary PDF file: {str(e)}")
@@ -68,7 +88,7 @@ def extract_page_as_markdown(file_stream: BytesIO, page_number: int) -> str:
 
     finally:
         try:
-            if os.path.exists(temp_file):
+            if temp_file and os.path.exists(temp_file):
                 os.remove(temp_file)
         except Exception as e:
             logger.error(f"Failed to remove temporary file {temp_file}: {str(e)}")
@@ -96,17 +116,31 @@ def process_page(client, prompt, page_number: int, page_text: str, formatted_key
         
         processed_messages = preprocess_messages(raw_payload)
         if processed_messages:
-            response = client.do_completion(processed_messages)
+            with stage_timer(Stage.PAGE_FINDING, client), timeline_span(Stage.PAGE_FINDING, page_number):
+                response = client.stream_completion(
+                    processed_messages,
+                    stop_predicate=relevance_decided,
+                    max_tokens=RELEVANCE_MAX_TOKENS
+                )
             logger.info(f"Response for page {page_number}: {response}")
+            is_relevant = "yes" in response[:RELEVANCE_WINDOW].lower()
             
             response_data = {
                 'response': response,
                 'keywords': formatted_keywords,
                 'timestamp': datetime.now().isoformat(),
-                'is_relevant': "yes" in response[:20].lower()
+                'is_relevant': is_relevant
             }
             
-            return (page_number if "yes" in response[:20].lower() else -1), response_data
+            return (page_number if is_relevant else -1), response_data
+
+        logger.warning(f"No messages to process for page {page_number}")
+        return -1, {
+            'response': "",
+            'keywords': formatted_keywords,
+            'timestamp': datetime.now().isoformat(),
+            'is_relevant': False
+        }
             
     except Exception as e:
         logger.error(f"Error processing page {page_number}: {e}")
@@ -119,75 +153,217 @@ def process_page(client, prompt, page_number: int, page_text: str, formatted_key
             'error': True
         }
 
-async def find_common_pages(client, file_stream: BytesIO, formatted_keywords: str) -> List[int]:
+def extract_pages_as_markdown(file_stream: BytesIO, client=None) -> List[str]:
+    """Extract every page once so it can be shared by all schemas of a document.
+
+    ``client`` is only used to label the page extraction metrics.
+    """
+    pdf_reader = PyPDF2.PdfReader(file_stream)
+    page_texts = []
+    for page_number in range(len(pdf_reader.pages)):
+        try:
+            with stage_timer(Stage.PAGE_EXTRACTION, client), timeline_span(Stage.PAGE_EXTRACTION, page_number):
+                page_texts.append(extract_page_as_markdown(file_stream, page_number, pdf_reader))
+        except Exception as e:
+            logger.error(f"Error extracting page {page_number}: {e}")
+            page_texts.append("")
+    return page_texts
+
+async def stream_relevant_pages(client, file_stream: BytesIO, keyword_sets: List[str]) -> AsyncIterator[PageVerdict]:
+    """Yield each page as soon as its relevance checks finish.
+
+    Pages are converted one at a time off the event loop and checked against
+    every schema on a shared thread pool, so callers can start working on the
+    first relevant pages while later ones are still being classified. Verdicts
+    arrive in completion order, not page order.
+    """
+    start_time = time.time()
+    langsmith_client = Client()
+    prompt = langsmith_client.pull_prompt(PromptType.RELEVANT_PAGE_FINDER_V2.value)
+    run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    pdf_reader = PyPDF2.PdfReader(file_stream)
+    total_pages = len(pdf_reader.pages)
+    loop = asyncio.get_running_loop()
+    conversion_executor = ThreadPoolExecutor(max_workers=1)
+    check_executor = ThreadPoolExecutor(max_workers=10)
+    page_responses = {}
+
+    def convert_page(page_number: int) -> str:
+        try:
+            with stage_timer(Stage.PAGE_EXTRACTION, client), timeline_span(Stage.PAGE_EXTRACTION, page_number):
+                return extract_page_as_markdown(file_stream, page_number, pdf_reader)
+        except Exception as e:
+            logger.error(f"Error extracting page {page_number}: {e}")
+            return ""
+
+    async def classify_page(page_number: int) -> PageVerdict:
+        page_text = await loop.run_in_executor(conversion_executor, in_current_context(convert_page, page_number))
+        results = await asyncio.gather(*[
+            loop.run_in_executor(check_executor, in_current_context(process_page, client, prompt, page_number, page_text, keywords))
+            for keywords in keyword_sets
+        ])
+        schema_indices = []
+        for schema_index, (relevant_page, response_data) in enumerate(results):
+            page_responses[f"{page_number}:{schema_index}"] = response_data
+            if relevant_page != -1:
+                schema_indices.append(schema_index)
+        return PageVerdict(page_number, page_text, schema_indices, total_pages)
+
+    tasks = [asyncio.create_task(classify_page(page_number)) for page_number in range(total_pages)]
     try:
-        start_time = time.time()
-        pdf_reader = PyPDF2.PdfReader(file_stream)
-        langsmith_client = Client()
-        prompt = langsmith_client.pull_prompt(PromptType.RELEVANT_PAGE_FINDER_V2.value)
-        logger.info(f"MODEL TYPE: {type(client)}")
+        for next_verdict in asyncio.as_completed(tasks):
+            yield await next_verdict
+    finally:
+        for task in tasks:
+            task.cancel()
+        conversion_executor.shutdown(wait=False)
+        check_executor.shutdown(wait=False)
 
-        run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+    await store_page_responses(run_id, page_responses)
+    logger.info(f"Streamed {total_pages} pages against {len(keyword_sets)} schemas in {time.time() - start_time:.2f} seconds")
 
-        loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            tasks = []
-            for page_number in range(len(pdf_reader.pages)):
-                page_text = extract_page_as_markdown(file_stream, page_number)
-                task = loop.run_in_executor(
-                    executor, 
-                    process_page, 
-                    client, 
-                    prompt, 
-                    page_number, 
-                    page_text, 
-                    formatted_keywords
+async def store_page_responses(run_id: str, page_responses: Dict[str, dict]) -> None:
+    if not page_responses:
+        logger.warning("No page responses to store in Redis")
+        return
+    try:
+        redis_client = await get_redis_connection()
+        redis_key = f"page_responses:{run_id}"
+        await redis_client.set(redis_key, json.dumps(page_responses), ex=86400)  # 1 day TTL
+        logger.info(f"Successfully stored page responses in Redis for run_id: {run_id}")
+    except Exception as e:
+        logger.error(f"Redis storage error: {str(e)}")
+
+async def tag_relevant_pages(client, page_texts: List[str], keyword_sets: List[str]) -> Dict[int, List[int]]:
+    """Run one page-finding pass and tag each page with the schemas it is relevant to.
+
+    Returns a mapping of page number to the indices of the relevant schemas in
+    ``keyword_sets``. Pages relevant to no schema are left out.
+    """
+    start_time = time.time()
+    langsmith_client = Client()
+    prompt = langsmith_client.pull_prompt(PromptType.RELEVANT_PAGE_FINDER_V2.value)
+    logger.info(f"MODEL TYPE: {type(client)}")
+
+    run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    loop = asyncio.get_event_loop()
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        checks = [
+            (page_number, schema_index)
+            for page_number in range(len(page_texts))
+            for schema_index in range(len(keyword_sets))
+        ]
+        tasks = [
+            loop.run_in_executor(
+                executor,
+                in_current_context(
+                    process_page,
+                    client,
+                    prompt,
+                    page_number,
+                    page_texts[page_number],
+                    keyword_sets[schema_index]
                 )
-                tasks.append(task)
+            )
+            for page_number, schema_index in checks
+        ]
+        results = await asyncio.gather(*tasks)
 
-            results = await asyncio.gather(*tasks)
+    page_responses = {}
+    page_tags: Dict[int, List[int]] = {}
 
-        # Process results and store in Redis
-        page_responses = {}
-        relevant_pages = []
-        
-        logger.info(f"Processing {len(results)} results")
-        
-        for page_number, response_data in results:
-            page_responses[str(page_number if page_number != -1 else results.index((page_number, response_data)))] = response_data
-            
-            if page_number != -1:
-                relevant_pages.append(page_number)
+    logger.info(f"Processing {len(results)} results")
+
+    for (page_number, schema_index), (relevant_page, response_data) in zip(checks, results):
+        page_responses[f"{page_number}:{schema_index}"] = response_data
+        if relevant_page != -1:
+            page_tags.setdefault(page_number, []).append(schema_index)
+
+    logger.info(f"Collected responses for {len(page_responses)} page checks")
+
+    await store_page_responses(run_id, page_responses)
 
-        logger.info(f"Collected responses for {len(page_responses)} pages")
+    total_time = time.time() - start_time
+    logger.info(f"Checked {len(page_texts)} pages against {len(keyword_sets)} schemas in {total_time:.2f} seconds")
+    logger.info(f"Relevant Pages: {page_tags}")
 
-        if page_responses:
+    return page_tags
+
+async def tag_relevant_pages_batch(client, batch_client, documents: List[Tuple[List[str], List[str]]]) -> List[Dict[int, List[int]]]:
+    """Page finding for a whole job set through the provider's batch API.
+
+    ``documents`` holds each document's page texts and keyword sets. Every
+    page and schema check goes into one batch run; checks the batch could not
+    answer are retried interactively with ``client``. Returns one page-tag
+    mapping per document, shaped like the result of ``tag_relevant_pages``.
+    """
+    start_time = time.time()
+    langsmith_client = Client()
+    prompt = langsmith_client.pull_prompt(PromptType.RELEVANT_PAGE_FINDER_V2.value)
+    run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    requests = []
+    for document_index, (page_texts, keyword_sets) in enumerate(documents):
+        for page_number, page_text in enumerate(page_texts):
+            for schema_index, keywords in enumerate(keyword_sets):
+                messages = preprocess_messages(prompt.invoke({
+                    "first_value": page_text,
+                    "second_value": keywords
+                }))
+                if messages:
+                    requests.append(BatchRequest(
+                        custom_id=f"{document_index}:{page_number}:{schema_index}",
+                        messages=messages,
+                        params={"max_tokens": RELEVANCE_MAX_TOKENS}
+                    ))
+
+    loop = asyncio.get_running_loop()
+    with timeline_span(Stage.PAGE_FINDING, checks=len(requests), documents=len(documents), mode="batch"):
+        responses = await loop.run_in_executor(None, in_current_context(batch_client.run, requests))
+
+    missing = [request for request in requests if request.custom_id not in responses]
+    if missing:
+        logger.warning(f"Batch returned no result for {len(missing)} page checks, retrying them interactively")
+
+        def complete(request: BatchRequest) -> str:
             try:
-                redis_client = await get_redis_connection()
-                redis_key = f"page_responses:{run_id}"
-                data_to_store = json.dumps(page_responses)
-                
-                await redis_client.set(redis_key, data_to_store)
-                await redis_client.expire(redis_key, 86400)  # 1 day TTL
-                
-                stored_data = await redis_client.get(redis_key)
-                if stored_data:
-                    logger.info(f"Successfully stored and verified data in Redis for run_id: {run_id}")
-                else:
-                    logger.error("Failed to verify data storage in Redis")
-                    
+                return client.do_completion(request.messages, **request.params)
             except Exception as e:
-                logger.error(f"Redis storage error: {str(e)}")
-        else:
-            logger.warning("No page responses to store in Redis")
-
-        end_time = time.time()
-        total_time = end_time - start_time
-        logger.info(f"Processed {len(pdf_reader.pages)} pages in {total_time:.2f} seconds")
-        logger.info(f"Relevant Pages: {relevant_pages}")
-        
-        return relevant_pages
-        
+                logger.error(f"Error processing page check {request.custom_id}: {e}")
+                return ""
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            retried = await asyncio.gather(*[
+                loop.run_in_executor(executor, in_current_context(complete, request)) for request in missing
+            ])
+        responses.update((request.custom_id, response) for request, response in zip(missing, retried))
+
+    page_tags: List[Dict[int, List[int]]] = [{} for _ in documents]
+    page_responses = {}
+    for request in requests:
+        document_index, page_number, schema_index = map(int, request.custom_id.split(":"))
+        response = responses.get(request.custom_id) or ""
+        is_relevant = "yes" in response[:RELEVANCE_WINDOW].lower()
+        page_responses[request.custom_id] = {
+            'response': response,
+            'keywords': documents[document_index][1][schema_index],
+            'timestamp': datetime.now().isoformat(),
+            'is_relevant': is_relevant
+        }
+        if is_relevant:
+            page_tags[document_index].setdefault(page_number, []).append(schema_index)
+
+    await store_page_responses(run_id, page_responses)
+    logger.info(f"Batch-checked {len(requests)} pages and schemas across {len(documents)} documents in {time.time() - start_time:.2f} seconds")
+    return page_tags
+
+async def find_common_pages(client, file_stream: BytesIO, formatted_keywords: str) -> List[int]:
+    try:
+        page_texts = extract_pages_as_markdown(file_stream, client)
+        page_tags = await tag_relevant_pages(client, page_texts, [formatted_keywords])
+        return sorted(page_tags.keys())
     except Exception as e:
         logger.error(f"Error finding common pages: {e}")
-        return []
\ No newline at end of file
+        return []
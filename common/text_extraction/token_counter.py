@@ -0,0 +1,159 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+from common.models.enums.model_enums import (
+    ModelType,
+    OpenAIModelName,
+    AzureModelName,
+    GroqModelName,
+    MistralModelName
+)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+if tiktoken is None:
+    logger.warning("tiktoken is not installed, token counts use character estimates")
+
+DEFAULT_ENCODING = "cl100k_base"
+MAX_CACHED_COUNTS = 50000
+ENCODING_RETRY_SECONDS = 60.0
+
+ENCODING_BY_MODEL = {
+    (ModelType.OPENAI, OpenAIModelName.GPT_4O.value): "o200k_base",
+    (ModelType.AZURE, AzureModelName.GPT_4O.value): "o200k_base",
+}
+
+# Non-OpenAI providers have no tiktoken encoding, so cl100k_base counts are
+# scaled by how many tokens their own tokenizers produce for the same text.
+TOKEN_RATIO_BY_PROVIDER = {
+    ModelType.GROQ: 1.0,
+    ModelType.CEREBRAS: 1.0,
+    ModelType.MISTRAL: 1.15,
+}
+
+TOKEN_RATIO_BY_MODEL = {
+    (ModelType.GROQ, GroqModelName.MIXTRAL_8X7B.value): 1.2,
+    (ModelType.GROQ, GroqModelName.LLAVA_1_5_7B.value): 1.2,
+    (ModelType.GROQ, GroqModelName.GEMMA_7B.value): 1.05,
+    (ModelType.GROQ, GroqModelName.GEMMA2_9B.value): 1.05,
+    (ModelType.MISTRAL, MistralModelName.MISTRAL_LARGE_LATEST.value): 1.15,
+}
+
+_count_cache: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+_count_cache_lock = threading.Lock()
+
+_encodings: Dict[str, Any] = {}
+# Encodings that failed to load, with when to try loading them again.
+_encoding_retry_at: Dict[str, float] = {}
+_encodings_lock = threading.Lock()
+
+def get_encoding(encoding_name: str = DEFAULT_ENCODING):
+    """Load a tiktoken encoding once per process.
+
+    Loading may download the encoding, so a failure is only retried every
+    ``ENCODING_RETRY_SECONDS``; until then counts fall back to a character
+    estimate, which is logged once.
+    """
+    encoding = _encodings.get(encoding_name)
+    if encoding is not None or tiktoken is None:
+        return encoding
+
+    with _encodings_lock:
+        if encoding_name in _encodings:
+            return _encodings[encoding_name]
+        retry_at = _encoding_retry_at.get(encoding_name)
+        if retry_at is not None and time.monotonic() < retry_at:
+            return None
+        try:
+            encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            if retry_at is None:
+                logger.error(f"Failed to load tiktoken encoding {encoding_name}, using character estimates: {e}")
+            _encoding_retry_at[encoding_name] = time.monotonic() + ENCODING_RETRY_SECONDS
+            return None
+        if retry_at is not None:
+            logger.info(f"Loaded tiktoken encoding {encoding_name}, token counts are exact again")
+            del _encoding_retry_at[encoding_name]
+        _encodings[encoding_name] = encoding
+        return encoding
+
+def resolve_encoding(model_type: Optional[Union[str, ModelType]] = None, model_name: Optional[str] = None) -> Tuple[str, float]:
+    """Return the encoding name and the count ratio to use for a provider/model."""
+    try:
+        model_type_enum = ModelType(model_type.lower()) if isinstance(model_type, str) else model_type
+    except ValueError:
+        model_type_enum = None
+
+    if model_type_enum is None:
+        return DEFAULT_ENCODING, 1.0
+
+    encoding_name = ENCODING_BY_MODEL.get((model_type_enum, model_name), DEFAULT_ENCODING)
+    ratio = TOKEN_RATIO_BY_MODEL.get(
+        (model_type_enum, model_name),
+        TOKEN_RATIO_BY_PROVIDER.get(model_type_enum, 1.0)
+    )
+    return encoding_name, ratio
+
+def _cache_key(encoding_name: str, text: str) -> Tuple[str, str]:
+    return encoding_name, hashlib.sha1(text.encode("utf-8", errors="ignore")).hexdigest()
+
+def _get_cached(key: Tuple[str, str]) -> Optional[int]:
+    with _count_cache_lock:
+        count = _count_cache.get(key)
+        if count is not None:
+            _count_cache.move_to_end(key)
+        return count
+
+def _set_cached(key: Tuple[str, str], count: int) -> None:
+    with _count_cache_lock:
+        _count_cache[key] = count
+        _count_cache.move_to_end(key)
+        while len(_count_cache) > MAX_CACHED_COUNTS:
+            _count_cache.popitem(last=False)
+
+def count_tokens_batch(texts: List[str], model_type: Optional[Union[str, ModelType]] = None, model_name: Optional[str] = None) -> List[int]:
+    """Count tokens for many texts, encoding only the ones not seen before."""
+    encoding_name, ratio = resolve_encoding(model_type, model_name)
+    encoding = get_encoding(encoding_name)
+
+    counts: List[Optional[int]] = []
+    missing = {}
+    for index, text in enumerate(texts):
+        key = _cache_key(encoding_name, text or "")
+        count = _get_cached(key)
+        counts.append(count)
+        if count is None:
+            missing.setdefault(key, []).append(index)
+
+    if missing:
+        keys = list(missing.keys())
+        pending_texts = [texts[missing[key][0]] or "" for key in keys]
+        raw_counts = None
+        if encoding is not None:
+            try:
+                raw_counts = [len(tokens) for tokens in encoding.encode_ordinary_batch(pending_texts)]
+            except Exception as e:
+                logger.error(f"Token encoding failed, falling back to character estimate: {e}")
+        # Estimates are not cached, so texts are counted exactly once the encoding works.
+        exact = raw_counts is not None
+        if not exact:
+            raw_counts = [len(text) // 4 for text in pending_texts]
+
+        for key, raw_count in zip(keys, raw_counts):
+            if exact:
+                _set_cached(key, raw_count)
+            for index in missing[key]:
+                counts[index] = raw_count
+
+    return [int(count * ratio) for count in counts]
+
+def count_tokens(text: str, model_type: Optional[Union[str, ModelType]] = None, model_name: Optional[str] = None) -> int:
+    return count_tokens_batch([text], model_type, model_name)[0]
@@ -2,7 +2,6 @@ import base64
 import json
 import zlib
 import logging
-import time
 import requests
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,6 +21,33 @@ def get_pipeline_results(task_id):
     response = requests.get(f"{BASE_URL}/pipelines/{task_id}", headers={"marly-api-key": API_KEY})
     return response.json()
 
+def wait_for_results(task_id):
+    """Follow the job's server-sent events until it completes or fails."""
+    with requests.get(
+        f"{BASE_URL}/pipelines/{task_id}/events", headers={"marly-api-key": API_KEY}, stream=True, timeout=(10, 60)
+    ) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "stage":
+                    logging.debug(f"Stage {data['stage']} ({data['service']}): {data.get('detail', {})}")
+                elif event == "workload_result":
+                    logging.debug(f"Workload result: {data}")
+                elif event == "status":
+                    logging.debug(f"Status - {data['status']}")
+                    if data['status'] == 'FAILED':
+                        logging.error(f"Error: {data.get('error_message', 'Unknown error')}")
+                        return None
+                elif event == "result":
+                    return get_pipeline_results(task_id)
+
+    logging.warning("Event stream ended before the pipeline completed.")
+    return None
+
 def process_pdf(pdf_file):
     pdf_content = read_and_encode_pdf(pdf_file)
 
@@ -54,24 +80,7 @@ def process_pdf(pdf_file):
         raise ValueError("Invalid task_id: task_id is None or empty")
     logging.debug(f"Task ID: {task_id}")
 
-    max_attempts = 5
-    attempt = 0
-    while attempt < max_attempts:
-        time.sleep(35)
-
-        results = get_pipeline_results(task_id)
-        logging.debug(f"Poll attempt {attempt + 1}: Status - {results['status']}")
-
-        if results['status'] == 'Completed':
-            return results
-        elif results['status'] == 'Failed':
-            logging.error(f"Error: {results.get('error_message', 'Unknown error')}")
-            return None
-
-        attempt += 1
-
-    logging.warning("Timeout: Pipeline execution took too long.")
-    return None
+    return wait_for_results(task_id)
 
 def main():
     results = process_pdf(PDF_FILE)
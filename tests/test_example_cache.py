@@ -0,0 +1,33 @@
+import asyncio
+
+import fakeredis.aioredis
+from langchain_core.prompts import ChatPromptTemplate
+
+from common.cache.example_cache import get_or_generate_example_format, get_prompt_version
+
+def test_prompt_version_is_the_langsmith_commit():
+    prompt = ChatPromptTemplate.from_messages([("system", "Example for {first_value}")])
+    prompt.metadata = {"lc_hub_commit_hash": "abc123"}
+    assert get_prompt_version(prompt) == "abc123"
+
+def test_prompt_version_follows_prompt_content():
+    first = ChatPromptTemplate.from_messages([("system", "Example for {first_value}")])
+    second = ChatPromptTemplate.from_messages([("system", "Examples for {first_value}")])
+    assert get_prompt_version(first) == get_prompt_version(ChatPromptTemplate.from_messages([("system", "Example for {first_value}")]))
+    assert get_prompt_version(first) != get_prompt_version(second)
+
+def test_new_prompt_version_regenerates_example_format():
+    async def run():
+        redis = fakeredis.aioredis.FakeRedis()
+        generated = []
+
+        async def generate() -> str:
+            generated.append(None)
+            return f"format {len(generated)}"
+
+        first = await get_or_generate_example_format(redis, "Firm: name", "v1", generate)
+        again = await get_or_generate_example_format(redis, "Firm:   name", "v1", generate)
+        updated = await get_or_generate_example_format(redis, "Firm: name", "v2", generate)
+        return first, again, updated
+
+    assert asyncio.run(run()) == ("format 1", "format 1", "format 2")
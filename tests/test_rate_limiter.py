@@ -0,0 +1,21 @@
+from common.models.rate_limiter import get_rate_limiter
+
+def test_limiters_are_kept_per_api_key():
+    first = get_rate_limiter("openai", "gpt-4o", {}, "key-one")
+    second = get_rate_limiter("openai", "gpt-4o", {}, "key-two")
+    assert first is not second
+    assert first is get_rate_limiter("openai", "gpt-4o", {}, "key-one")
+    assert "key-one" not in first.key_prefix
+
+def test_configured_limits_replace_current_ones():
+    limiter = get_rate_limiter("groq", "llama3-8b-8192", {}, "key-limits")
+    updated = get_rate_limiter(
+        "groq", "llama3-8b-8192", {"requests_per_minute": "100", "max_concurrency": 4}, "key-limits"
+    )
+    assert updated is limiter
+    assert limiter.limits[0] == 100 and limiter.limits[2] == 4
+    assert limiter.requests.capacity == 100
+    assert limiter.concurrency.max_limit == 4
+
+    get_rate_limiter("groq", "llama3-8b-8192", {}, "key-limits")
+    assert limiter.limits[0] == 100
@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+
+from common.models.resilience import (
+    AttemptAbandoned,
+    DeadlineExceeded,
+    LatencyTracker,
+    RetryPolicy,
+    check_abandoned,
+    request_timeout,
+    resilient_call
+)
+
+def wait_until_abandoned(stopped: threading.Event) -> str:
+    for _ in range(250):
+        time.sleep(0.02)
+        try:
+            check_abandoned()
+        except AttemptAbandoned:
+            stopped.set()
+            raise
+    return "unreachable"
+
+def test_losing_hedge_is_abandoned():
+    tracker = LatencyTracker()
+    for _ in range(20):
+        tracker.record(0.05)
+    stopped = threading.Event()
+    calls = []
+
+    def request() -> str:
+        calls.append(None)
+        return wait_until_abandoned(stopped) if len(calls) == 1 else "hedged"
+
+    policy = RetryPolicy(max_attempts=1, deadline=5, hedge=True)
+    assert resilient_call(request, policy, tracker) == "hedged"
+    assert stopped.wait(1)
+
+def test_request_past_the_deadline_is_abandoned():
+    stopped = threading.Event()
+    timeouts = []
+
+    def request() -> str:
+        timeouts.append(request_timeout())
+        return wait_until_abandoned(stopped)
+
+    with pytest.raises(DeadlineExceeded):
+        resilient_call(request, RetryPolicy(max_attempts=1, deadline=0.2), LatencyTracker())
+    assert 0 < timeouts[0] <= 0.2
+    assert stopped.wait(1)
@@ -0,0 +1,39 @@
+import asyncio
+import json
+
+import fakeredis.aioredis
+
+from common.cache.result_cache import (
+    RESULT_CACHE_INDEX,
+    cache_results,
+    get_cached_results,
+    serialize_result
+)
+
+SCHEMAS = [{"Firm": "The name of the firm"}, {"Fees": "Management fees"}]
+
+def test_serialize_result_keeps_complete_results():
+    transformed = {"schema_0": '{"Firm": "Acme"}'}
+    assert serialize_result({"schema_0": "Firm: Acme"}, transformed) == json.dumps(transformed)
+
+def test_serialize_result_skips_failed_transformation():
+    assert serialize_result({"schema_0": "Firm: Acme"}, {"schema_0": ""}) == ""
+    assert serialize_result({"schema_0": "Firm: Acme"}, {}) == ""
+
+def test_serialize_result_skips_failed_extraction():
+    assert serialize_result({"schema_0": ""}, {"schema_0": '{"Firm": null}'}) == ""
+    assert serialize_result({}, {"schema_0": '{"Firm": null}'}) == ""
+
+def test_failed_results_are_not_cached():
+    async def run():
+        redis = fakeredis.aioredis.FakeRedis()
+        results = [
+            serialize_result({"schema_0": "Firm: Acme"}, {"schema_0": '{"Firm": "Acme"}'}),
+            serialize_result({"schema_1": "Fees: 2%"}, {"schema_1": ""})
+        ]
+        await cache_results(redis, "doc", SCHEMAS, results, "openai", "gpt-4o", False)
+        assert await redis.zcard(RESULT_CACHE_INDEX) == 1
+        assert await get_cached_results(redis, "doc", SCHEMAS, "openai", "gpt-4o", False) is None
+        assert await get_cached_results(redis, "doc", SCHEMAS[:1], "openai", "gpt-4o", False) == [results[0]]
+
+    asyncio.run(run())
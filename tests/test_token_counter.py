@@ -0,0 +1,30 @@
+from common.text_extraction import token_counter
+from common.text_extraction.token_counter import count_tokens, get_encoding
+
+class WordEncoding:
+    def encode_ordinary_batch(self, texts):
+        return [text.split() for text in texts]
+
+def test_failed_encoding_load_is_retried(monkeypatch):
+    loads = []
+
+    def flaky_get_encoding(name):
+        loads.append(name)
+        if len(loads) == 1:
+            raise OSError("download failed")
+        return WordEncoding()
+
+    monkeypatch.setattr(token_counter, "_encodings", {})
+    monkeypatch.setattr(token_counter, "_encoding_retry_at", {})
+    monkeypatch.setattr(token_counter, "_count_cache", token_counter.OrderedDict())
+    monkeypatch.setattr(token_counter.tiktoken, "get_encoding", flaky_get_encoding)
+
+    text = "Management fees " * 20
+    assert get_encoding() is None
+    assert count_tokens(text) == len(text) // 4
+    assert len(loads) == 1
+
+    token_counter._encoding_retry_at[token_counter.DEFAULT_ENCODING] = 0.0
+    assert isinstance(get_encoding(), WordEncoding)
+    assert count_tokens(text) == 40
+    assert len(loads) == 2
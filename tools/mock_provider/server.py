@@ -0,0 +1,387 @@
+"""Local OpenAI-compatible provider for load tests and batch-mode runs.
+
+Serves chat completions (plain and streamed), the files and batches endpoints
+used by the batch execution mode, and the LangSmith prompt endpoints, so the
+whole pipeline runs offline:
+
+    python -m tools.mock_provider.server --port 8089 --config tools/mock_provider/mock_config.json
+
+Latency, error and 429 rates and the canned response for each PromptType are
+set in the config file. Every served prompt's system message carries a
+``[prompt:<name>]`` marker, which is how completions are matched to their
+PromptType; the PRS agent's own prompts are recognised by their text. Point
+the services at it with docker-compose.mock.yml, or pass
+``"base_url": "http://localhost:8089/v1"`` in a request's additional_params.
+GET /mock/stats reports request counts per prompt type.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import time
+import uuid
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+from common.agents.agent_prompt_enums import ExtractionPrompts, PageFinderPrompts
+from common.prompts.prompt_enums import PromptType
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_config.json")
+API_PREFIXES = ("/v1", "/openai")
+CHAT_COMPLETION_PATHS = (
+    "/v1/chat/completions",
+    "/openai/v1/chat/completions",
+    "/openai/deployments/{deployment}/chat/completions",
+)
+PROMPT_MARKER = re.compile(r"\[prompt:([^\]]+)\]")
+CHARS_PER_TOKEN = 4
+
+# Input variables of each LangSmith prompt, as the services invoke them.
+PROMPT_VARIABLES = {
+    PromptType.EXAMPLE_GENERATION.value: ["first_value"],
+    PromptType.TRANSFORMATION_ONLY.value: ["first_value", "second_value", "third_value"],
+}
+DEFAULT_PROMPT_VARIABLES = ["first_value", "second_value"]
+
+AGENT_PROMPTS = {
+    prompt.value.strip(): f"AGENT_{prompt.name}"
+    for prompts in (ExtractionPrompts, PageFinderPrompts)
+    for prompt in prompts
+}
+PROMPT_TYPE_NAMES = {prompt.value: prompt.name for prompt in PromptType}
+
+def load_config(path: str) -> Dict[str, Any]:
+    with open(path) as config_file:
+        return json.load(config_file)
+
+def prompt_manifest(identifier: str) -> Dict[str, Any]:
+    """LangChain-serialized ChatPromptTemplate whose system message names the prompt."""
+    variables = PROMPT_VARIABLES.get(identifier, DEFAULT_PROMPT_VARIABLES)
+
+    def message(message_class: str, template: str, input_variables: List[str]) -> Dict[str, Any]:
+        return {
+            "lc": 1, "type": "constructor",
+            "id": ["langchain", "prompts", "chat", message_class],
+            "kwargs": {"prompt": {
+                "lc": 1, "type": "constructor",
+                "id": ["langchain", "prompts", "prompt", "PromptTemplate"],
+                "kwargs": {"input_variables": input_variables, "template": template, "template_format": "f-string"}
+            }}
+        }
+
+    return {
+        "lc": 1, "type": "constructor",
+        "id": ["langchain", "prompts", "chat", "ChatPromptTemplate"],
+        "kwargs": {
+            "input_variables": variables,
+            "messages": [
+                message("SystemMessagePromptTemplate", f"[prompt:{identifier}] Mock prompt for local load testing.", []),
+                message("HumanMessagePromptTemplate", "\n\n".join(f"{{{variable}}}" for variable in variables), variables),
+            ]
+        }
+    }
+
+def classify_messages(messages: List[Dict[str, Any]]) -> str:
+    """PromptType name, AGENT_<prompt> for the PRS agent's own prompts, or 'default'."""
+    for message in messages:
+        content = str(message.get("content", ""))
+        marker = PROMPT_MARKER.search(content)
+        if marker:
+            return PROMPT_TYPE_NAMES.get(marker.group(1), marker.group(1))
+        if message.get("role") == "system" and content.strip() in AGENT_PROMPTS:
+            return AGENT_PROMPTS[content.strip()]
+    return "default"
+
+def chat_completion_body(model: str, content: str, finish_reason: str = "stop") -> Dict[str, Any]:
+    completion_tokens = math.ceil(len(content) / CHARS_PER_TOKEN)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": finish_reason
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": completion_tokens, "total_tokens": completion_tokens}
+    }
+
+def chunk_body(completion_id: str, model: str, content: Optional[str], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+
+class MockProvider:
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.random = random.Random(config.get("seed"))
+        self.responses = config.get("responses", {})
+        self.recent_requests = deque()
+        self.stats = Counter()
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+
+    def sample_latency(self) -> float:
+        latency = self.config.get("latency", {})
+        distribution = latency.get("distribution", "fixed")
+        if distribution == "lognormal":
+            value = self.random.lognormvariate(math.log(latency.get("median", 0.5)), latency.get("sigma", 0.5))
+        elif distribution == "exponential":
+            value = self.random.expovariate(1 / latency.get("mean", 0.5))
+        elif distribution == "uniform":
+            value = self.random.uniform(latency.get("low", 0.1), latency.get("high", 1.0))
+        else:
+            value = latency.get("value", 0.5)
+        return min(max(value, latency.get("min", 0.0)), latency.get("max", float("inf")))
+
+    def select_response(self, prompt_type: str, messages: List[Dict[str, Any]], max_tokens: Optional[int]) -> str:
+        """Canned response for the prompt type; lists are indexed by a hash of the request, so reruns match."""
+        response = self.responses.get(prompt_type, self.responses.get("default", ""))
+        if isinstance(response, list):
+            digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).digest()
+            response = response[int.from_bytes(digest[:4], "big") % len(response)]
+        if max_tokens:
+            response = response[:max_tokens * CHARS_PER_TOKEN]
+        return response
+
+    def over_rate_limit(self) -> bool:
+        limit = self.config.get("requests_per_minute", 0)
+        if not limit:
+            return False
+        now = time.monotonic()
+        while self.recent_requests and now - self.recent_requests[0] > 60:
+            self.recent_requests.popleft()
+        if len(self.recent_requests) >= limit:
+            return True
+        self.recent_requests.append(now)
+        return False
+
+    def error_response(self) -> Optional[web.Response]:
+        retry_after = str(self.config.get("retry_after", 1.0))
+        if self.over_rate_limit() or self.random.random() < self.config.get("rate_limit_rate", 0.0):
+            self.stats["rate_limited"] += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+                status=429, headers={"retry-after": retry_after}
+            )
+        if self.random.random() < self.config.get("error_rate", 0.0):
+            self.stats["errors"] += 1
+            return web.json_response({"error": {"message": "Mock server error", "type": "server_error"}}, status=500)
+        return None
+
+    async def complete(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Completion body without latency or injected errors, as returned inside batches."""
+        messages = body.get("messages", [])
+        prompt_type = classify_messages(messages)
+        self.stats[f"batch:{prompt_type}"] += 1
+        return chat_completion_body(body.get("model", "mock"), self.select_response(prompt_type, messages, body.get("max_tokens")))
+
+    async def chat_completion(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        messages = body.get("messages", [])
+        prompt_type = classify_messages(messages)
+        self.stats["requests"] += 1
+        self.stats[prompt_type] += 1
+
+        await asyncio.sleep(self.sample_latency())
+        error = self.error_response()
+        if error is not None:
+            return error
+
+        model = body.get("model") or request.match_info.get("deployment", "mock")
+        content = self.select_response(prompt_type, messages, body.get("max_tokens"))
+        seconds_per_char = 1 / (self.config.get("tokens_per_second", 100) * CHARS_PER_TOKEN)
+
+        if not body.get("stream"):
+            await asyncio.sleep(len(content) * seconds_per_char)
+            return web.json_response(chat_completion_body(model, content))
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        chunk_chars = max(1, self.config.get("stream_chunk_chars", 8))
+        try:
+            for start in range(0, len(content), chunk_chars):
+                piece = content[start:start + chunk_chars]
+                await asyncio.sleep(len(piece) * seconds_per_char)
+                await response.write(f"data: {json.dumps(chunk_body(completion_id, model, piece))}\n\n".encode("utf-8"))
+            await response.write(f"data: {json.dumps(chunk_body(completion_id, model, None, 'stop'))}\n\n".encode("utf-8"))
+            await response.write(b"data: [DONE]\n\n")
+        except (ConnectionResetError, asyncio.CancelledError):
+            # The client stopped reading early, which is what early termination looks like from here.
+            self.stats["streams_cancelled"] += 1
+            raise
+        return response
+
+    async def langsmith_info(self, request: web.Request) -> web.Response:
+        return web.json_response({"version": "0.8.0", "instance_flags": {}})
+
+    async def langsmith_commit(self, request: web.Request) -> web.Response:
+        identifier = f"{request.match_info['owner']}/{request.match_info['repo']}"
+        return web.json_response({"commit_hash": "mock", "manifest": prompt_manifest(identifier), "examples": []})
+
+    async def langsmith_accept(self, request: web.Request) -> web.Response:
+        return web.json_response({}, status=202)
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.stats))
+
+    async def reset_stats(self, request: web.Request) -> web.Response:
+        self.stats.clear()
+        return web.json_response({})
+
+    def store_file(self, filename: str, purpose: str, content: bytes) -> Dict[str, Any]:
+        file_id = f"file-{uuid.uuid4().hex}"
+        self.files[file_id] = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+            "content": content
+        }
+        return self.files[file_id]
+
+    @staticmethod
+    def file_object(file: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in file.items() if key != "content"}
+
+    async def upload_file(self, request: web.Request) -> web.Response:
+        fields = {}
+        content, filename = b"", "upload"
+        async for part in await request.multipart():
+            if part.name == "file":
+                filename = part.filename or filename
+                content = await part.read()
+            else:
+                fields[part.name] = await part.text()
+        file = self.store_file(filename, fields.get("purpose", "batch"), content)
+        return web.json_response(self.file_object(file))
+
+    async def file_content(self, request: web.Request) -> web.Response:
+        file = self.files.get(request.match_info["file_id"])
+        if file is None:
+            return web.json_response({"error": {"message": "No such file"}}, status=404)
+        return web.Response(body=file["content"], content_type="application/octet-stream")
+
+    async def create_batch(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        if payload.get("input_file_id") not in self.files:
+            return web.json_response({"error": {"message": "No such input file"}}, status=400)
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": payload.get("endpoint"),
+            "input_file_id": payload["input_file_id"],
+            "completion_window": payload.get("completion_window", "24h"),
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0}
+        }
+        asyncio.create_task(self.process_batch(batch_id))
+        return web.json_response(self.batches[batch_id])
+
+    async def get_batch(self, request: web.Request) -> web.Response:
+        batch = self.batches.get(request.match_info["batch_id"])
+        if batch is None:
+            return web.json_response({"error": {"message": "No such batch"}}, status=404)
+        return web.json_response(batch)
+
+    async def cancel_batch(self, request: web.Request) -> web.Response:
+        batch = self.batches.get(request.match_info["batch_id"])
+        if batch is None:
+            return web.json_response({"error": {"message": "No such batch"}}, status=404)
+        if batch["status"] not in ("completed", "failed", "expired"):
+            batch["status"] = "cancelled"
+        return web.json_response(batch)
+
+    async def process_batch(self, batch_id: str) -> None:
+        batch = self.batches[batch_id]
+        lines = [line for line in self.files[batch["input_file_id"]]["content"].decode("utf-8").splitlines() if line.strip()]
+        batch["status"] = "in_progress"
+        batch["request_counts"]["total"] = len(lines)
+        await asyncio.sleep(self.config.get("batch_delay", 5.0))
+        if batch["status"] == "cancelled":
+            return
+
+        outputs, errors = [], []
+        for line in lines:
+            entry = json.loads(line)
+            if self.random.random() < self.config.get("batch_failure_rate", 0.0):
+                errors.append({
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": entry["custom_id"],
+                    "response": {"status_code": 500, "request_id": uuid.uuid4().hex, "body": {"error": {"message": "Mock failure"}}},
+                    "error": None
+                })
+                continue
+            outputs.append({
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": entry["custom_id"],
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": await self.complete(entry["body"])},
+                "error": None
+            })
+
+        batch["output_file_id"] = self.store_file(f"{batch_id}_output.jsonl", "batch_output", "\n".join(json.dumps(o) for o in outputs).encode("utf-8"))["id"]
+        if errors:
+            batch["error_file_id"] = self.store_file(f"{batch_id}_errors.jsonl", "batch_output", "\n".join(json.dumps(e) for e in errors).encode("utf-8"))["id"]
+        batch["request_counts"].update(completed=len(outputs), failed=len(errors))
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+        logger.info(f"Batch {batch_id} completed: {len(outputs)} succeeded, {len(errors)} failed")
+
+    def add_routes(self, app: web.Application) -> None:
+        for path in CHAT_COMPLETION_PATHS:
+            app.router.add_post(path, self.chat_completion)
+        for prefix in API_PREFIXES:
+            app.router.add_post(f"{prefix}/files", self.upload_file)
+            app.router.add_get(f"{prefix}/files/{{file_id}}/content", self.file_content)
+            app.router.add_post(f"{prefix}/batches", self.create_batch)
+            app.router.add_get(f"{prefix}/batches/{{batch_id}}", self.get_batch)
+            app.router.add_post(f"{prefix}/batches/{{batch_id}}/cancel", self.cancel_batch)
+        app.router.add_get("/langsmith/info", self.langsmith_info)
+        app.router.add_get("/langsmith/commits/{owner}/{repo}/{commit}", self.langsmith_commit)
+        app.router.add_post("/langsmith/runs/batch", self.langsmith_accept)
+        app.router.add_post("/langsmith/runs/multipart", self.langsmith_accept)
+        app.router.add_get("/mock/stats", self.get_stats)
+        app.router.add_post("/mock/stats/reset", self.reset_stats)
+
+def create_app(provider: MockProvider) -> web.Application:
+    app = web.Application(client_max_size=200 * 1024 * 1024)
+    provider.add_routes(app)
+    return app
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible provider for load testing")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="JSON file with latency, error and response settings")
+    parser.add_argument("--seed", type=int, help="Overrides the config's random seed")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.seed is not None:
+        config["seed"] = args.seed
+    web.run_app(create_app(MockProvider(config)), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()